@@ -0,0 +1,336 @@
+import os
+import re
+import sys
+import hmac
+import json
+import math
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import store
+import db
+import auth
+import export
+import metrics
+import backend
+import pubsub
+from scenes import get_scene_module
+
+# JSON bid-submission API next to the Streamlit UI, for scripted bidders and load tests. It
+# reads and writes the same storage as main.py (store.py scenarios, db.py classroom sessions).
+# One asyncio loop parses HTTP/1.1 (keep-alive) and answers in JSON; storage calls run on a
+# small thread pool. Bids for the same scenario/session that arrive while a write is in flight
+# are queued and written together (one transaction, one log append, one notification), so
+# throughput grows with load instead of paying one commit per bid.
+#
+#   GET  /health
+#   POST /scenarios/<id>/join        {"username": ...}
+#   POST /scenarios/<id>/bids        {"username", "price", "quantity", "bid_type"} or {"bids": [...]}
+#   GET  /scenarios/<id>/clearing
+#   POST /sessions/<code>/join       {"username": ...}
+#   POST /sessions/<code>/bids       {"username", "price"} or {"bids": [...]}
+#   GET  /sessions/<code>/clearing
+#
+# Set API_TOKEN to require "Authorization: Bearer <token>" on every call except /health.
+DEFAULT_PORT = 8600
+API_TOKEN = os.environ.get('API_TOKEN')
+MAX_BODY = 8 * 1024 * 1024  # bytes
+MAX_BATCH = 10000           # bids per request
+WORKERS = 4
+
+_executor = ThreadPoolExecutor(WORKERS, thread_name_prefix='api')
+_routes = []   # (method, compiled path pattern, handler)
+_pending = {}  # (kind, id) -> [(items, future)] waiting for the next group write
+_write_locks = {}
+_thread = None
+_start_lock = threading.Lock()
+
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+           405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+def route(method, pattern):
+    def register(handler):
+        _routes.append((method, re.compile(pattern + '$'), handler))
+        return handler
+    return register
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+# ------------------ 合并写入 ------------------
+async def _group_write(key, items, write):
+    """Queue items for key; one write(all queued items) serves every request waiting on it"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    queue = _pending.setdefault(key, [])
+    queue.append((items, future))
+    if len(queue) == 1:
+        loop.create_task(_flush(key, write))
+    return await future
+
+async def _flush(key, write):
+    # while the previous write of this key runs, new requests keep joining the queue
+    async with _write_locks.setdefault(key, asyncio.Lock()):
+        batch = _pending.pop(key)
+        try:
+            result = await _run(write, [item for items, _ in batch for item in items])
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        metrics.count('api.group_write')
+        for _, future in batch:
+            future.set_result(result)
+
+# ------------------ 请求校验 ------------------
+def _bid_list(data):
+    """Bids of a request body: a single bid object or {"bids": [...]}"""
+    bids = data.get('bids', [data]) if isinstance(data, dict) else None
+    return bids if isinstance(bids, list) else None
+
+def _positive(value):
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    try:
+        return math.isfinite(value) and value > 0  # JSON 1e999 parses as inf
+    except OverflowError:  # an integer too large for a float
+        return False
+
+def _username(data):
+    username = data.get('username') if isinstance(data, dict) else None
+    return username if isinstance(username, str) and username else None
+
+def _check_scenario_bids(sid, bids):
+    """(scenario, valid bids, rejected [{'index', 'error'}]); scenario is None if it does not exist"""
+    scenario = store.get_scenario(sid)
+    if scenario is None:
+        return None, [], []
+    valid, rejected = [], []
+    for i, bid in enumerate(bids):
+        username = _username(bid)
+        if username is None:
+            error = 'username is required'
+        elif scenario['status'] != 'active':
+            error = 'scenario is not open for bids'
+        elif not store.is_participant(sid, username):
+            error = 'user has not joined the scenario'
+        elif not _positive(bid.get('price')) or not _positive(bid.get('quantity')):
+            error = 'price and quantity must both be greater than 0'
+        elif bid['quantity'] > scenario['demand']:
+            error = 'quantity exceeds the scenario demand'
+        elif bid.get('bid_type', 'supply') not in ('supply', 'demand'):
+            error = "bid_type must be 'supply' or 'demand'"
+        else:
+            valid.append({'username': username, 'price': bid['price'], 'quantity': bid['quantity'],
+                          'bid_type': bid.get('bid_type', 'supply')})
+            continue
+        rejected.append({'index': i, 'error': error})
+    return scenario, valid, rejected
+
+# ------------------ 场景 (store.py) ------------------
+@route('GET', r'/health')
+async def health(data):
+    return 200, {'status': 'ok'}
+
+@route('POST', r'/scenarios/(\d+)/join')
+async def join_scenario(sid, data):
+    sid, username = int(sid), _username(data)
+    if username is None:
+        return 400, {'error': 'username is required'}
+
+    def join():
+        if store.get_scenario(sid) is None:
+            return None
+        full_name, role = auth.profile(username)
+        return store.add_participant(sid, username, full_name, role)
+    joined = await _run(join)
+    if joined is None:
+        return 404, {'error': f'scenario {sid} not found'}
+    return 200, {'scenario': sid, 'username': username, 'joined': joined}
+
+@route('POST', r'/scenarios/(\d+)/bids')
+async def submit_scenario_bids(sid, data):
+    sid, bids = int(sid), _bid_list(data)
+    if bids is None or len(bids) > MAX_BATCH:
+        return 400, {'error': f'expected a bid object or {{"bids": [...]}} with at most {MAX_BATCH} bids'}
+    scenario, valid, rejected = await _run(_check_scenario_bids, sid, bids)
+    if scenario is None:
+        return 404, {'error': f'scenario {sid} not found'}
+    if valid:
+        await _group_write(('scenario', sid), valid, lambda items: store.add_bids(sid, items))
+    return 200, {'scenario': sid, 'accepted': len(valid), 'rejected': rejected}
+
+@route('GET', r'/scenarios/(\d+)/clearing')
+async def scenario_clearing(sid, data):
+    sid = int(sid)
+
+    def clear():
+        scenario = store.get_scenario(sid)
+        if scenario is None:
+            return None
+        latest = store.get_latest_bids(sid)
+        offers = [b for b in latest if b['bid_type'] == 'supply']
+        demand_bids = [b for b in latest if b['bid_type'] == 'demand']
+        return export.clearing_rows({'scenario': sid}, offers, scenario['demand'], demand_bids)
+    out = await _run(clear)
+    if out is None:
+        return 404, {'error': f'scenario {sid} not found'}
+    clearing, outcomes = out
+    return 200, {'scenario': sid, 'clearing': clearing[0] if clearing else None, 'outcomes': outcomes}
+
+# ------------------ 课堂会话 (db.py) ------------------
+@route('POST', r'/sessions/([A-Z0-9]+)/join')
+async def join_session(code, data):
+    username = _username(data)
+    if username is None:
+        return 400, {'error': 'username is required'}
+
+    def join():
+        if not db.session_exists(code):
+            return None
+        info = db.join_session(code, username)
+        return info if info is not None else db.get_user_info(code, username)  # None: already joined
+    info = await _run(join)
+    if info is None:
+        return 404, {'error': f'session {code} not found'}
+    return 200, {'session': code, 'username': username} | info
+
+@route('POST', r'/sessions/([A-Z0-9]+)/bids')
+async def submit_session_bids(code, data):
+    bids = _bid_list(data)
+    if bids is None or len(bids) > MAX_BATCH:
+        return 400, {'error': f'expected a bid object or {{"bids": [...]}} with at most {MAX_BATCH} bids'}
+    if not await _run(db.session_exists, code):
+        return 404, {'error': f'session {code} not found'}
+    mine, rejected = [], []
+    for i, bid in enumerate(bids):
+        username = _username(bid)
+        if username is None or not _positive(bid.get('price')):
+            rejected.append({'index': i, 'error': 'username and a price greater than 0 are required'})
+        else:
+            mine.append((i, username, bid['price']))
+    if mine:
+        # a user bidding twice in one batch keeps the later price
+        taken = await _group_write(('session', code), [(u, p) for _, u, p in mine],
+                                   lambda items: set(db.submit_bids(code, dict(items))))
+        rejected += [{'index': i, 'error': 'user has not joined the session or it is closed'}
+                     for i, username, _ in mine if username not in taken]
+        rejected.sort(key=lambda r: r['index'])
+    return 200, {'session': code, 'accepted': len(bids) - len(rejected), 'rejected': rejected}
+
+@route('GET', r'/sessions/([A-Z0-9]+)/clearing')
+async def session_clearing(code, data):
+    def clear():
+        params = db.get_session_params(code)
+        if params is None:
+            return None
+        bids = db.get_bids(code)
+        offers = [{'username': b['username'], 'price': b['price'], 'quantity': b.get('quantity', 1), 'MC': b['MC']}
+                  for b in bids if b.get('bid_submitted')]
+        # same coverage as the export: single-price scenes clear against a scalar demand
+        if 'demand' in params and hasattr(get_scene_module(params['scene_id']), 'clear_bids'):
+            return params, export.clearing_rows({'session': code}, offers, params['demand'])
+        return params, ([], [])
+    out = await _run(clear)
+    if out is None:
+        return 404, {'error': f'session {code} not found'}
+    params, (clearing, outcomes) = out
+    return 200, {'session': code, 'scene_id': params['scene_id'],
+                 'clearing': clearing[0] if clearing else None, 'outcomes': outcomes}
+
+# ------------------ HTTP ------------------
+def _jsonable(value):
+    return value.item() if hasattr(value, 'item') else str(value)  # numpy scalars
+
+def _authorized(header):
+    # constant-time comparison, so response timing does not reveal how much of the token matched
+    return hmac.compare_digest(header.encode(), f'Bearer {API_TOKEN}'.encode())
+
+async def _dispatch(method, path, headers, body):
+    allowed = False
+    for route_method, pattern, handler in _routes:
+        match = pattern.match(path)
+        if match is None:
+            continue
+        if route_method != method:
+            allowed = True
+            continue
+        if API_TOKEN and handler is not health and not _authorized(headers.get('authorization', '')):
+            return 401, {'error': 'missing or wrong API token'}
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {'error': 'request body is not valid JSON'}
+        with metrics.timer(f'api.{handler.__name__}'):
+            try:
+                return await handler(*match.groups(), data)
+            except Exception as exc:
+                metrics.count('api.error')
+                return 500, {'error': f'{type(exc).__name__}: {exc}'}
+    return (405, {'error': 'method not allowed'}) if allowed else (404, {'error': 'no such endpoint'})
+
+async def _respond(writer, status, payload, keep_alive):
+    body = json.dumps(payload, default=_jsonable).encode()
+    head = (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+async def _handle(reader, writer):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break  # connection closed
+            method, target, version = line.decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            if length > MAX_BODY:
+                await _respond(writer, 413, {'error': 'request body too large'}, False)
+                break
+            body = await reader.readexactly(length) if length else b''
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            status, payload = await _dispatch(method, target.split('?', 1)[0], headers, body)
+            await _respond(writer, status, payload, keep_alive)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass  # client went away or sent something that is not HTTP
+    finally:
+        writer.close()
+
+def _open(port, host):
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(asyncio.start_server(_handle, host, port, backlog=1024))
+    return loop
+
+def start(port=DEFAULT_PORT, host='127.0.0.1'):
+    """Serve the API from a daemon thread of this process (next to the Streamlit app); idempotent"""
+    global _thread
+    with _start_lock:
+        if _thread is None:
+            loop = _open(port, host)  # OSError here if the port is taken
+            _thread = threading.Thread(target=loop.run_forever, name='bid-api', daemon=True)
+            _thread.start()
+        return _thread
+
+def serve(port=DEFAULT_PORT, host='127.0.0.1'):
+    """Run the API in the foreground"""
+    _open(port, host).run_forever()
+
+if __name__ == '__main__':
+    # standalone process: point at the same data directory and state backend as main.py
+    data_dir = os.environ.get('DATA_DIR', 'data')
+    store.DB_FILE = os.path.join(data_dir, 'market.db')
+    auth.USER_DB_FILE = os.path.join(data_dir, 'users.json')
+    pubsub.connect(backend.configure(os.environ.get('STATE_BACKEND')))
+    db.migrate_legacy_db()
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.environ.get('API_PORT', DEFAULT_PORT))
+    print(f'bid API listening on http://127.0.0.1:{port}')
+    serve(port, os.environ.get('API_HOST', '127.0.0.1'))
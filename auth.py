@@ -1,53 +1,273 @@
 import streamlit as st
+import atexit
+import base64
 import hashlib
+import hmac
 import json
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import metrics
+import backend
 
-# File-based user database
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to process-local locking only
+    fcntl = None
+
+# File-based user database, served from an in-memory index that is reloaded only when the
+# file changes. Passwords are stored as salted scrypt hashes ("scrypt$n$r$p$salt$hash");
+# legacy unsalted SHA-256 hashes and plain-text passwords are upgraded on the next login.
+# With a shared state backend (backend.py) users are kept there instead (user:<name> records,
+# the set 'users', and a 'users:version' counter that tells every worker to reload its index).
 USER_DB_FILE = "users_db.json"
+SCRYPT_N = int(os.environ.get('AUTH_SCRYPT_N', 2 ** 14))  # cost: memory = 128 * n * r bytes
+SCRYPT_R = 8
+SCRYPT_P = 1
+HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', 0)) or min(8, os.cpu_count() or 1)
+FLUSH_DELAY = 0.5  # seconds; new students entering together are written in one go
+
+_index = {'path': None, 'stamp': None, 'users': {}}
+_pending = {}  # username -> record not yet written (see ensure_user)
+_lock = threading.RLock()
+_flush_timer = None
+# scrypt releases the GIL, so a burst of logins hashes in parallel, bounded by the pool size
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='auth-hash')
+
+@contextmanager
+def _file_lock():
+    if backend.get_backend() is not None:  # shared backend: writes below are per user record
+        with _lock:
+            yield
+        return
+    with _lock:
+        os.makedirs(os.path.dirname(USER_DB_FILE) or '.', exist_ok=True)
+        with open(USER_DB_FILE + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _stamp():
+    shared = backend.get_backend()
+    if shared is not None:
+        return ('backend', shared.get('users:version'))
+    try:
+        st_ = os.stat(USER_DB_FILE)
+    except FileNotFoundError:
+        return None
+    return (st_.st_ino, st_.st_mtime_ns, st_.st_size)
+
+def _users():
+    """The user index, reloaded if the file changed (another process, or a manual edit)"""
+    with _lock:
+        stamp = _stamp()
+        if _index['path'] != USER_DB_FILE or _index['stamp'] != stamp:
+            users = {}
+            shared = backend.get_backend()
+            if shared is not None:
+                with metrics.timer('auth.load_users'):
+                    names = sorted(shared.members('users'))
+                    values = shared.get_many([f'user:{name}' for name in names])
+                users = {name: json.loads(value) for name, value in zip(names, values) if value is not None}
+            elif stamp is not None:
+                try:
+                    with metrics.timer('auth.load_users'), open(USER_DB_FILE, 'r') as f:
+                        users = json.load(f)
+                except (OSError, ValueError):
+                    users = {}
+            _index.update(path=USER_DB_FILE, stamp=stamp, users=users)
+        return _index['users']
 
 def load_users():
     """Load users from file"""
-    if os.path.exists(USER_DB_FILE):
-        try:
-            with open(USER_DB_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_users(users):
-    """Save users to file"""
-    with open(USER_DB_FILE, 'w') as f:
-        json.dump(users, f, indent=2)
+    with _lock:
+        return dict(_users()) | _pending
+
+@metrics.timed('auth.save_users')
+def save_users(users, base=None):
+    """Save users to file (atomically); base: the snapshot users was built from (default: the index)"""
+    shared = backend.get_backend()
+    if shared is not None:
+        _save_shared(shared, users, _users() if base is None else base)
+        return
+    with _lock:
+        os.makedirs(os.path.dirname(USER_DB_FILE) or '.', exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(USER_DB_FILE) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(users, f, indent=2)
+        os.replace(tmp_path, USER_DB_FILE)
+        _index.update(path=USER_DB_FILE, stamp=_stamp(), users=users)
+
+def _save_shared(shared, users, base):
+    """Write only the users that changed from the snapshot base; a new user never overwrites one
+    added by another worker, and only users removed from that same snapshot are deleted (users
+    other workers added since are in neither, so they are left alone)"""
+    with _lock:
+        changed = False
+        for name, record in users.items():
+            if base.get(name) == record:
+                continue
+            if name in base:
+                shared.set(f'user:{name}', json.dumps(record))
+            elif shared.add(f'user:{name}', json.dumps(record)):
+                shared.add_member('users', name)
+            changed = True
+        for name in base.keys() - users.keys():
+            shared.delete(f'user:{name}')
+            shared.remove_member('users', name)
+            changed = True
+        if changed:
+            shared.incr('users:version')
+
+def _update_users(update):
+    """Read-modify-write the user file under its lock; update(users) mutates a copy"""
+    with _file_lock():
+        base = _users()
+        users = dict(base)
+        result = update(users)
+        save_users(users, base)
+        return result
+
+# ------------------ 密码哈希 ------------------
+def _b64(raw):
+    return base64.b64encode(raw).decode()
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
 
 def hash_password(password):
-    """Hash password for storage"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Salted scrypt hash for storage"""
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+@metrics.timed('auth.check_password')
+def _check(record, password):
+    """Compare a password with a stored record in constant time (whatever format it is in)"""
+    stored = record.get('password_hash')
+    if stored and stored.startswith('scrypt$'):
+        _, n, r, p, salt, digest = stored.split('$')
+        candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(candidate, base64.b64decode(digest))
+    if stored:  # legacy unsalted SHA-256
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    if record.get('password'):  # legacy plain text
+        return hmac.compare_digest(password.encode(), record['password'].encode())
+    return False
+
+def needs_rehash(record):
+    stored = record.get('password_hash') or ''
+    return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+def verify_password(username, password):
+    """Check credentials on the hashing pool; returns the user record or None"""
+    record = load_users().get(username)
+    if record is None:
+        # hash anyway so unknown and known usernames take the same time
+        _hash_pool.submit(hash_password, password).result()
+        return None
+    if not _hash_pool.submit(_check, record, password).result():
+        return None
+    if needs_rehash(record):
+        new_hash = _hash_pool.submit(hash_password, password).result()
 
-def register_user(username, password, role):
+        def upgrade(users):
+            if username in users:
+                record = {k: v for k, v in users[username].items() if k != 'password'}
+                users[username] = record | {'password_hash': new_hash}
+        _update_users(upgrade)
+    return record
+
+# ------------------ 用户管理 ------------------
+def get_user(username):
+    return load_users().get(username)
+
+def profile(username):
+    """(full_name, role) of a user; names that never registered are students"""
+    record = get_user(username)
+    if record is None:
+        return username, 'student'
+    return record.get('full_name') or username, record.get('role', 'student')
+
+def register_user(username, password, role, full_name=None):
     """Register a new user"""
-    users = load_users()
-    if username in users:
+    added, _ = register_users([(username, password, role, full_name)])
+    if not added:
         return False, "Username already exists"
-    
-    users[username] = {
-        'password_hash': hash_password(password),
-        'role': role
-    }
-    save_users(users)
     return True, "Registration successful"
 
+def register_users(roster):
+    """Register a class roster [(username, password, role[, full_name])] with a single write.
+
+    Passwords are hashed in parallel on the hashing pool; an empty password creates a
+    password-less account (students enter by name). Returns (added, skipped) username lists.
+    """
+    rows = [tuple(row) + (None,) * (4 - len(row)) for row in roster]
+    existing = load_users()
+    rows = [row for row in rows if row[0] not in existing]
+    hashes = list(_hash_pool.map(lambda row: hash_password(row[1]) if row[1] else None, rows))
+
+    def add(users):
+        added, skipped = [], []
+        for (username, _, role, full_name), password_hash in zip(rows, hashes):
+            if username in users:
+                skipped.append(username)
+                continue
+            users[username] = {'password_hash': password_hash, 'role': role, 'full_name': full_name or username}
+            added.append(username)
+        return added, skipped
+    added, skipped = _update_users(add)
+    skipped += [row[0] for row in roster if row[0] in existing]
+    return added, skipped
+
+def ensure_user(username, role='student', full_name=None):
+    """Make sure a password-less user exists without rewriting the file on every call.
+
+    Known users cost a dict lookup; new ones are visible at once and written in one batch
+    after FLUSH_DELAY, so a class entering together triggers a single write.
+    """
+    global _flush_timer
+    with _lock:
+        if username in _users() or username in _pending:
+            return
+        _pending[username] = {'password_hash': None, 'role': role, 'full_name': full_name or username}
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(FLUSH_DELAY, flush)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+def flush():
+    """Write users added by ensure_user()"""
+    global _flush_timer
+    with _lock:
+        batch = dict(_pending)
+        _flush_timer = None
+    if batch:
+        def add(users):
+            for username, record in batch.items():
+                users.setdefault(username, record)
+        _update_users(add)
+        with _lock:
+            for username in batch:
+                _pending.pop(username, None)
+
+atexit.register(flush)
+
 def verify_user(username, password):
     """Verify user credentials and return role"""
-    users = load_users()
-    if username in users:
-        user_data = users[username]
-        if user_data['password_hash'] == hash_password(password):
-            return True, user_data['role']
-    return False, None
+    record = verify_password(username, password)
+    if record is None:
+        return False, None
+    return True, record['role']
 
 def login():
+    init_default_users()
     st.title("Electricity Market Simulation Platform")
     
     # Create tabs for login and register
@@ -108,22 +328,12 @@ def logout():
     st.session_state['username'] = None
     st.session_state['session_code'] = None
 
+DEFAULT_USERS = [
+    ('teacher1', 'teachpass', 'teacher'),
+    ('student1', 'studpass1', 'student'),
+]
+
 # Initialize with default users if no users exist
-def init_default_users():
-    users = load_users()
-    if not users:
-        # Create default teacher and student accounts
-        default_users = {
-            'teacher1': {
-                'password_hash': hash_password('teachpass'),
-                'role': 'teacher'
-            },
-            'student1': {
-                'password_hash': hash_password('studpass1'),
-                'role': 'student'
-            },
-        }
-        save_users(default_users)
-
-# Initialize default users on startup
-init_default_users() 
\ No newline at end of file
+def init_default_users(roster=None):
+    if not load_users():
+        register_users(DEFAULT_USERS if roster is None else roster)
@@ -0,0 +1,474 @@
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# Shared state backend, so several app workers (processes or hosts behind a load balancer)
+# see the same users, sessions, scenarios and bids. Two implementations share one interface:
+#   LocalBackend - in-process dictionaries (a single worker, and the store of the stand-in server)
+#   RespBackend  - a client for the Redis protocol (RESP), e.g. a Redis server, or the
+#                  stdlib stand-in server below: python backend.py serve [port]
+# Values are strings (callers store JSON). Without a configured backend db.py, auth.py and
+# store.py keep using their local files. Configure with STATE_BACKEND=redis://host:port or memory.
+
+class Backend:
+    """Common helpers; subclasses provide get/get_many/set/add/delete/incr/cas,
+    members/add_member/remove_member and publish/subscribe"""
+
+    def get_json(self, key):
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def update_json(self, key, update, retries=100):
+        """Atomically replace the JSON at key with update(current) (None = missing) using
+        compare-and-set; update may return None to leave the key alone. Returns the new value."""
+        for _ in range(retries):
+            current = self.get(key)
+            new = update(None if current is None else json.loads(current))
+            if new is None:
+                return None
+            if self.cas(key, current, json.dumps(new)):
+                return new
+        raise RuntimeError(f"too much contention on {key}")
+
+# ------------------ 进程内实现 ------------------
+class LocalBackend(Backend):
+    def __init__(self):
+        self._data = {}  # key -> str, or set of str
+        self._versions = defaultdict(int)  # bumped by every write of a key (for WATCH)
+        self._subscribers = defaultdict(list)
+        self._lock = threading.RLock()
+
+    def _touch(self, key):
+        self._versions[key] += 1
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if isinstance(value, set):
+                raise RuntimeError(f"WRONGTYPE {key} holds a set")
+            return value
+
+    def get_many(self, keys):
+        with self._lock:
+            return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = str(value)
+            self._touch(key)
+
+    def add(self, key, value):
+        """Set key only if it does not exist; True if it was set"""
+        with self._lock:
+            if key in self._data:
+                return False
+            self.set(key, value)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self._touch(key)
+                    removed += 1
+            return removed
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self.get(key) or 0) + amount
+            self.set(key, value)
+            return value
+
+    def cas(self, key, expected, new):
+        """Set key to new (None deletes it) if its value is still expected (None = missing)"""
+        with self._lock:
+            if self.get(key) != expected:
+                return False
+            if new is None:
+                self.delete(key)
+            else:
+                self.set(key, new)
+            return True
+
+    def members(self, key):
+        with self._lock:
+            return set(self._data.get(key, ()))
+
+    def add_member(self, key, member):
+        with self._lock:
+            members = self._data.setdefault(key, set())
+            if member in members:
+                return False
+            members.add(member)
+            self._touch(key)
+            return True
+
+    def remove_member(self, key, member):
+        with self._lock:
+            members = self._data.get(key)
+            if not members or member not in members:
+                return False
+            members.discard(member)
+            if not members:
+                del self._data[key]
+            self._touch(key)
+            return True
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, ()))
+        for callback in callbacks:
+            callback(channel, message)
+        return len(callbacks)
+
+    def subscribe(self, channel, callback):
+        """Call callback(channel, message) for every message; returns an unsubscribe function"""
+        with self._lock:
+            self._subscribers[channel].append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers.get(channel, []):
+                    self._subscribers[channel].remove(callback)
+        return unsubscribe
+
+# ------------------ RESP 客户端 ------------------
+def _encode(*args):
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b''.join(parts)
+
+def _read_reply(f):
+    line = f.readline()
+    if not line:
+        raise ConnectionError("connection closed by the state backend")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        raise RuntimeError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        size = int(rest)
+        if size < 0:
+            return None
+        data = f.read(size + 2)[:-2]
+        return data.decode()
+    if kind == b'*':
+        size = int(rest)
+        if size < 0:
+            return None
+        return [_read_reply(f) for _ in range(size)]
+    raise ConnectionError(f"bad reply from the state backend: {line!r}")
+
+class RespBackend(Backend):
+    """Redis-protocol client; one connection per thread (WATCH is connection state)"""
+
+    def __init__(self, host='127.0.0.1', port=6379, db=0, timeout=5.0):
+        self.address, self.db, self.timeout = (host, port), db, timeout
+        self._local = threading.local()
+        self._subscriber = None
+        self._callbacks = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        f = sock.makefile('rb')
+        if self.db:
+            sock.sendall(_encode('SELECT', self.db))
+            _read_reply(f)
+        return sock, f
+
+    def _call(self, *args):
+        conn = getattr(self._local, 'conn', None)
+        for attempt in (0, 1):
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            try:
+                conn[0].sendall(_encode(*args))
+                return _read_reply(conn[1])
+            except (ConnectionError, OSError):
+                conn[0].close()
+                conn = self._local.conn = None
+                if attempt or getattr(self._local, 'watching', False):
+                    raise  # a lost connection also loses the WATCH: let cas() fail loudly
+        raise ConnectionError("unreachable")
+
+    def get(self, key):
+        return self._call('GET', key)
+
+    def get_many(self, keys):
+        return self._call('MGET', *keys) if keys else []
+
+    def set(self, key, value):
+        self._call('SET', key, value)
+
+    def add(self, key, value):
+        return self._call('SET', key, value, 'NX') is not None
+
+    def delete(self, *keys):
+        return self._call('DEL', *keys) if keys else 0
+
+    def incr(self, key, amount=1):
+        return self._call('INCRBY', key, amount)
+
+    def cas(self, key, expected, new):
+        self._local.watching = True
+        try:
+            self._call('WATCH', key)
+            if self._call('GET', key) != expected:
+                self._call('UNWATCH')
+                return False
+            self._call('MULTI')
+            self._call(*(('DEL', key) if new is None else ('SET', key, new)))
+            return self._call('EXEC') is not None
+        finally:
+            self._local.watching = False
+
+    def members(self, key):
+        return set(self._call('SMEMBERS', key))
+
+    def add_member(self, key, member):
+        return self._call('SADD', key, member) > 0
+
+    def remove_member(self, key, member):
+        return self._call('SREM', key, member) > 0
+
+    def publish(self, channel, message):
+        return self._call('PUBLISH', channel, message)
+
+    def subscribe(self, channel, callback):
+        """Call callback(channel, message) from a listener thread; returns an unsubscribe function"""
+        with self._lock:
+            self._callbacks[channel].append(callback)
+            if self._subscriber is None:
+                self._subscriber = self._connect()
+                self._subscriber[0].settimeout(None)
+                threading.Thread(target=self._listen, args=(self._subscriber,), name='backend-subscriber',
+                                 daemon=True).start()
+            if len(self._callbacks[channel]) == 1:
+                self._subscriber[0].sendall(_encode('SUBSCRIBE', channel))
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._callbacks.get(channel, []):
+                    self._callbacks[channel].remove(callback)
+        return unsubscribe
+
+    def _listen(self, conn):
+        while True:
+            try:
+                reply = _read_reply(conn[1])
+            except (ConnectionError, OSError):
+                with self._lock:
+                    self._subscriber = None
+                    channels = [channel for channel, callbacks in self._callbacks.items() if callbacks]
+                    callbacks = {channel: self._callbacks.pop(channel) for channel in channels}
+                while True:  # reconnect and resubscribe
+                    try:
+                        for channel, channel_callbacks in callbacks.items():
+                            while channel_callbacks:
+                                self.subscribe(channel, channel_callbacks[0])
+                                channel_callbacks.pop(0)
+                        return
+                    except OSError:
+                        with self._lock:
+                            self._subscriber = None
+                        time.sleep(1)
+            if isinstance(reply, list) and len(reply) == 3 and reply[0] == 'message':
+                with self._lock:
+                    callbacks = list(self._callbacks.get(reply[1], ()))
+                for callback in callbacks:
+                    callback(reply[1], reply[2])
+
+# ------------------ 配置 ------------------
+_configured = {'url': None, 'backend': None}
+_configure_lock = threading.Lock()
+
+def configure(url=None):
+    """Select the shared backend: 'redis://host:port[/db]', 'memory', or None for local files.
+    Idempotent for the same url; returns the backend (or None)."""
+    with _configure_lock:
+        if url == _configured['url']:
+            return _configured['backend']
+        if not url:
+            shared = None
+        elif url == 'memory':
+            shared = LocalBackend()
+        elif url.startswith('redis://'):
+            address, _, db = url[len('redis://'):].partition('/')
+            host, _, port = address.rpartition(':') if ':' in address else (address, '', '6379')
+            shared = RespBackend(host or '127.0.0.1', int(port or 6379), int(db or 0))
+        else:
+            raise ValueError(f"unknown state backend {url!r}")
+        _configured.update(url=url, backend=shared)
+        return shared
+
+def get_backend():
+    """The configured shared backend, or None when state lives in local files"""
+    return _configured['backend']
+
+# ------------------ 本地替身服务器 ------------------
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection of the stand-in server: a subset of Redis commands on a LocalBackend"""
+
+    def setup(self):
+        super().setup()
+        self.store = self.server.store
+        self.write_lock = threading.Lock()
+        self.watched = {}      # key -> version when WATCHed
+        self.queued = None     # commands queued after MULTI
+        self.unsubscribe = {}  # channel -> unsubscribe function
+
+    def send(self, value):
+        with self.write_lock:
+            self.wfile.write(_reply(value))
+            self.wfile.flush()
+
+    def handle(self):
+        while True:
+            try:
+                request = _read_reply(self.rfile)
+            except (ConnectionError, OSError):
+                break
+            if not isinstance(request, list) or not request:
+                break
+            name, args = request[0].upper(), request[1:]
+            try:
+                self.send(self.dispatch(name, args))
+            except Exception as e:
+                self.send(RuntimeError(f"ERR {e}"))
+        for unsubscribe in self.unsubscribe.values():
+            unsubscribe()
+
+    def dispatch(self, name, args):
+        if self.queued is not None and name not in ('EXEC', 'DISCARD', 'MULTI', 'WATCH'):
+            self.queued.append((name, args))
+            return _Status('QUEUED')
+        if name == 'WATCH':
+            for key in args:
+                self.watched[key] = self.store.version(key)
+            return _Status('OK')
+        if name == 'UNWATCH':
+            self.watched = {}
+            return _Status('OK')
+        if name == 'MULTI':
+            self.queued = []
+            return _Status('OK')
+        if name == 'DISCARD':
+            self.queued, self.watched = None, {}
+            return _Status('OK')
+        if name == 'EXEC':
+            queued, watched = self.queued or [], self.watched
+            self.queued, self.watched = None, {}
+            with self.store._lock:
+                if any(self.store.version(key) != version for key, version in watched.items()):
+                    return _NullArray()
+                return [self.execute(n, a) for n, a in queued]
+        if name == 'SUBSCRIBE':
+            for channel in args:
+                if channel not in self.unsubscribe:
+                    self.unsubscribe[channel] = self.store.subscribe(
+                        channel, lambda ch, message: self.send(['message', ch, message]))
+                self.send(['subscribe', channel, len(self.unsubscribe)])
+            return _NoReply()
+        if name == 'UNSUBSCRIBE':
+            for channel in args or list(self.unsubscribe):
+                self.unsubscribe.pop(channel, lambda: None)()
+                self.send(['unsubscribe', channel, len(self.unsubscribe)])
+            return _NoReply()
+        return self.execute(name, args)
+
+    def execute(self, name, args):
+        store = self.store
+        if name == 'PING':
+            return _Status('PONG')
+        if name == 'SELECT':
+            return _Status('OK')  # a single database
+        if name == 'GET':
+            return store.get(args[0])
+        if name == 'MGET':
+            return store.get_many(args)
+        if name == 'SET':
+            if [a.upper() for a in args[2:]] == ['NX']:
+                return _Status('OK') if store.add(args[0], args[1]) else None
+            store.set(args[0], args[1])
+            return _Status('OK')
+        if name == 'DEL':
+            return store.delete(*args)
+        if name == 'INCRBY':
+            return store.incr(args[0], int(args[1]))
+        if name == 'INCR':
+            return store.incr(args[0])
+        if name == 'SADD':
+            return sum(store.add_member(args[0], m) for m in args[1:])
+        if name == 'SREM':
+            return sum(store.remove_member(args[0], m) for m in args[1:])
+        if name == 'SMEMBERS':
+            return sorted(store.members(args[0]))
+        if name == 'PUBLISH':
+            return store.publish(args[0], args[1])
+        raise ValueError(f"unknown command '{name}'")
+
+class _Status(str):
+    pass
+
+class _NullArray:
+    pass
+
+class _NoReply:
+    pass
+
+def _reply(value):
+    if isinstance(value, _NoReply):
+        return b''
+    if isinstance(value, _NullArray):
+        return b'*-1\r\n'
+    if isinstance(value, _Status):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, Exception):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, bool):
+        return f":{int(value)}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, list):
+        return f"*{len(value)}\r\n".encode() + b''.join(_reply(v) for v in value)
+    data = str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(host='127.0.0.1', port=6379, background=False):
+    """Run the stand-in server (for development and tests; state is kept in memory only)"""
+    server = _Server((host, port), _Handler)
+    server.store = LocalBackend()
+    if background:
+        threading.Thread(target=server.serve_forever, name='backend-server', daemon=True).start()
+        return server
+    server.serve_forever()
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'serve':
+        sys.exit("usage: python backend.py serve [port]")
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else int(os.environ.get('STATE_BACKEND_PORT', 6379))
+    print(f"State backend stand-in listening on 127.0.0.1:{port}")
+    serve(port=port)
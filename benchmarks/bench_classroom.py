@@ -0,0 +1,151 @@
+"""Classroom load test for the storage and clearing layers.
+
+Simulates a class of students joining and bidding concurrently against db.py (session
+store) and store.py (the SQLite backend behind main.py's join/bid paths), with threads
+and with processes, then times scene 1 clearing from 10 to 100k offers. Writes a JSON
+report that can be compared across commits:
+
+    python benchmarks/bench_classroom.py --students 200 --output bench_report.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def _configure(workdir):
+    """Point the storage layers at a scratch directory (also run in every worker process)"""
+    import db
+    import store
+    import eventlog
+    db.DB_DIR = os.path.join(workdir, 'sessions_db')
+    eventlog.LOG_DIR = os.path.join(workdir, 'event_logs')
+    store.DB_FILE = os.path.join(workdir, 'market.db')
+    return db, store
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def _session_student(args):
+    workdir, code, username, price = args
+    db, _ = _configure(workdir)
+    return {
+        'join_session': _timed(db.join_session, code, username),
+        'submit_bid': _timed(db.submit_bid, code, username, price),
+        'get_bids': _timed(db.get_bids, code),
+    }
+
+def _scenario_student(args):
+    workdir, sid, username, price = args
+    _, store = _configure(workdir)
+    return {
+        'add_participant': _timed(store.add_participant, sid, username, username, 'student'),
+        'add_bid': _timed(store.add_bid, sid, username, price, 1, 'supply'),
+        'get_bids': _timed(store.get_bids, sid, username),
+    }
+
+def _summarize(samples, wall):
+    report = {}
+    for op in samples[0]:
+        lat = np.array([s[op] for s in samples]) * 1000
+        report[op] = {
+            'p50_ms': round(float(np.percentile(lat, 50)), 3),
+            'p99_ms': round(float(np.percentile(lat, 99)), 3),
+            'max_ms': round(float(lat.max()), 3),
+        }
+    report['throughput_students_per_s'] = round(len(samples) / wall, 1)
+    return report
+
+def _run_pool(kind, workers, fn, jobs):
+    pool_cls = ThreadPoolExecutor if kind == 'threads' else ProcessPoolExecutor
+    start = time.perf_counter()
+    with pool_cls(max_workers=workers) as pool:
+        samples = list(pool.map(fn, jobs))
+    return samples, time.perf_counter() - start
+
+def bench_sessions(workdir, students, workers, kind):
+    db, _ = _configure(workdir)
+    code = db.create_session(1, {'demand': 5})
+    prices = {f'student{i}': 20 + i % 60 for i in range(students)}
+    samples, wall = _run_pool(kind, workers, _session_student,
+                              [(workdir, code, u, p) for u, p in prices.items()])
+    bids = {b['username']: b for b in db.get_bids(code)}
+    lost = sum(1 for u, p in prices.items() if bids.get(u, {}).get('price') != p)
+    report = _summarize(samples, wall)
+    report['lost_writes'] = lost
+    return report
+
+def bench_scenarios(workdir, students, workers, kind):
+    _, store = _configure(workdir)
+    sid = store.create_scenario(f'bench-{kind}', '', 5, 'Single-price Clearing Market')
+    prices = {f'student{i}': 20 + i % 60 for i in range(students)}
+    samples, wall = _run_pool(kind, workers, _scenario_student,
+                              [(workdir, sid, u, p) for u, p in prices.items()])
+    bids = {b['username']: b for b in store.get_bids(sid)}
+    joined = {p['username'] for p in store.get_participants(sid)}
+    lost = sum(1 for u, p in prices.items() if bids.get(u, {}).get('price') != p or u not in joined)
+    report = _summarize(samples, wall)
+    report['lost_writes'] = lost
+    return report
+
+def bench_clearing(sizes, repeats=5):
+    from scenes import scene1
+    from scenes.clearing import clear_market
+    rng = np.random.default_rng(0)
+    report = {}
+    for n in sizes:
+        price = rng.integers(20, 100, n).astype(float)
+        mc = price - rng.integers(0, 20, n)
+        bids = [{'username': f's{i}', 'MC': float(mc[i]), 'price': float(price[i])} for i in range(n)]
+        params = {'demand': max(1, n // 2)}
+        engine = min(_timed(clear_market, price, np.ones(n), mc, params['demand']) for _ in range(repeats))
+        view = min(_timed(scene1.clear_bids, params, bids) for _ in range(repeats))
+        report[str(n)] = {'engine_ms': round(engine * 1000, 3), 'clear_bids_ms': round(view * 1000, 3)}
+    return report
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--modes', default='threads,processes')
+    parser.add_argument('--offers', default='10,100,1000,10000,100000')
+    parser.add_argument('--output', default='bench_report.json')
+    args = parser.parse_args()
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'students': args.students,
+        'workers': args.workers,
+        'sessions': {},
+        'scenarios': {},
+    }
+    for kind in args.modes.split(','):
+        with tempfile.TemporaryDirectory() as workdir:
+            report['sessions'][kind] = bench_sessions(workdir, args.students, args.workers, kind)
+            report['scenarios'][kind] = bench_scenarios(workdir, args.students, args.workers, kind)
+    report['clearing'] = bench_clearing([int(n) for n in args.offers.split(',')])
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Cold-start and rerun timing for main.py.
+
+Each page is measured in a fresh interpreter with a scratch data directory: the import time
+of main.py's modules (and whether pandas, plotly or pyarrow were pulled in), the first run of
+main.py (including the one-time bootstrap), and later reruns, which is what every click
+costs. Writes a JSON report stamped with the git commit so per-rerun overhead can be tracked
+across commits:
+
+    python benchmarks/bench_startup.py --reruns 50 --output startup_report.json
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APP_MODULES = ('streamlit', 'store', 'db', 'pubsub', 'auth', 'metrics', 'backend')  # main.py's imports
+HEAVY_MODULES = ('pandas', 'plotly', 'pyarrow', 'scipy')
+PAGES = {
+    'login': {},
+    'teacher_scenarios': {'logged_in': True, 'username': 'teacher1', 'role': 'teacher', 'page': 'scenarios'},
+    'student_scenarios': {'logged_in': True, 'username': 'student1', 'role': 'student', 'page': 'scenarios'},
+}
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+def _child(page, reruns, scenarios):
+    """Runs inside the fresh interpreter (cwd = scratch dir); prints one JSON result"""
+    imports = {name: _ms(_timed(importlib.import_module, name)) for name in APP_MODULES}
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    import store
+    import metrics
+    from streamlit.testing.v1 import AppTest
+    if scenarios:
+        store.DB_FILE = os.path.join(os.environ['DATA_DIR'], 'market.db')
+        for i in range(scenarios):
+            store.create_scenario(f'bench-{i}', '', 5, 'Single-price Clearing Market')
+    app = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=120)
+    for key, value in PAGES[page].items():
+        app.session_state[key] = value
+    first = _timed(app.run)
+    samples = np.array([_timed(app.run) for _ in range(reruns)]) * 1000
+    bootstrap = metrics.raw()['histograms'].get('bootstrap', {})
+    print(json.dumps({
+        'imports_ms': imports,
+        'import_total_ms': round(sum(imports.values()), 3),
+        'heavy_modules_after_import': loaded,
+        'heavy_modules_after_rerun': [name for name in HEAVY_MODULES if name in sys.modules],
+        'first_run_ms': _ms(first),
+        'bootstrap_ms': _ms(bootstrap.get('sum', 0.0)),
+        'bootstrap_runs': bootstrap.get('count', 0),
+        'rerun_p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'rerun_p99_ms': round(float(np.percentile(samples, 99)), 3),
+        'rerun_max_ms': round(float(samples.max()), 3),
+        'exceptions': [str(e.value) for e in app.exception],
+    }))
+
+def bench_page(page, reruns, scenarios):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, DATA_DIR=os.path.join(workdir, 'data'), METRICS='1')
+        env.pop('API_PORT', None)
+        env.pop('METRICS_PORT', None)
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', page,
+                              '--reruns', str(reruns), '--scenarios', str(scenarios)],
+                             cwd=workdir, env=env, capture_output=True, text=True, check=True)
+        report = json.loads(out.stdout.strip().splitlines()[-1])
+        report['process_ms'] = _ms(time.perf_counter() - start)  # interpreter start to exit
+        return report
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', default=','.join(PAGES))
+    parser.add_argument('--reruns', type=int, default=30)
+    parser.add_argument('--scenarios', type=int, default=20, help='scenarios listed on the scenario pages')
+    parser.add_argument('--output', default='startup_report.json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child, args.reruns, args.scenarios)
+        return
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'reruns': args.reruns,
+        'scenarios': args.scenarios,
+        'pages': {page: bench_page(page, args.reruns, args.scenarios) for page in args.pages.split(',')},
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -3,121 +3,433 @@ import random
 import string
 import json
 import os
+import tempfile
+import copy
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from scenes import cache as scene_cache
+from scenes.bidtable import BidTable
+import pubsub
+import eventlog
+import metrics
+import expiry
+import backend
 
-# File-based storage for sharing between browser sessions
-DB_FILE = "sessions_db.json"
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to process-local locking only
+    fcntl = None
 
-def load_db():
-    """Load database from file"""
-    if os.path.exists(DB_FILE):
+# File-based storage for sharing between browser sessions: one JSON record per session code
+# holds the session settings; joins and bids are events in the session's append-only log
+# (eventlog stream 'session-<code>'), whose materialized view is the current bid table.
+# With a shared state backend configured (backend.py) sessions and bids live there instead,
+# so several app workers see the same sessions (see the 共享后端 section).
+DB_DIR = "sessions_db"
+LEGACY_DB_FILE = "sessions_db.json"
+SESSION_TTL = 24 * 3600  # seconds after creation before a session is archived to cold storage
+
+_cache = {}  # record name -> (file stamp, data)
+_cache_lock = threading.Lock()
+_thread_locks = {}
+_bid_tables = {}  # session code -> (session version, BidTable)
+
+def _record_path(name):
+    return os.path.join(DB_DIR, name + '.json')
+
+@contextmanager
+def _locked(name):
+    """Hold the exclusive lock of one record (threads in this process and other processes)"""
+    with _cache_lock:
+        thread_lock = _thread_locks.setdefault(name, threading.Lock())
+    with thread_lock:
+        os.makedirs(DB_DIR, exist_ok=True)
+        with open(os.path.join(DB_DIR, name + '.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read_record(name):
+    """Load one record, reusing the cached copy while the file is unchanged"""
+    path = _record_path(name)
+    try:
+        st_ = os.stat(path)
+    except FileNotFoundError:
+        with _cache_lock:
+            _cache.pop(name, None)
+        return None
+    stamp = (st_.st_ino, st_.st_mtime_ns, st_.st_size)
+    with _cache_lock:
+        cached = _cache.get(name)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    try:
+        with metrics.timer('db.load_record'), open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _cache_lock:
+        _cache[name] = (stamp, data)
+    return data
+
+@metrics.timed('db.save_record')
+def _write_record(name, data):
+    """Atomically replace one record (write to a temp file, then rename over it)"""
+    os.makedirs(DB_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=DB_DIR, prefix='.' + name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, _record_path(name))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    with _cache_lock:
+        _cache.pop(name, None)
+
+def _remove_record(name):
+    try:
+        os.remove(_record_path(name))
+    except FileNotFoundError:
+        pass
+    with _cache_lock:
+        _cache.pop(name, None)
+
+@contextmanager
+def _update_record(name):
+    """Read-modify-write one record under its lock; yields a private copy (None if missing)"""
+    with _locked(name):
+        current = _read_record(name)
+        holder = [copy.deepcopy(current)]
+        yield holder
+        if holder[0] is not None:
+            _write_record(name, holder[0])
+
+def _stream(session_code):
+    return 'session-' + session_code
+
+def _initial_view():
+    return {'bids': {}, 'closed': False}
+
+def _apply_event(view, event):
+    """Fold one session event into the bid table"""
+    kind = event['type']
+    if kind == 'join':
+        view['bids'][event['user']] = {'MC': event['MC'], 'bid_submitted': False}
+    elif kind in ('bid', 'revise'):
+        view['bids'][event['user']].update(price=event['price'], bid_submitted=True)
+    elif kind == 'close':
+        view['closed'] = True
+
+eventlog.register_reducer('session-', _initial_view, _apply_event)
+
+def _session_events(bids):
+    """Events that rebuild a bid table stored inline by older versions"""
+    events = []
+    for username, info in bids.items():
+        events.append({'type': 'join', 'user': username, 'MC': info.get('MC')})
+        if info.get('bid_submitted'):
+            events.append({'type': 'bid', 'user': username, 'price': info.get('price')})
+    return events
+
+def migrate_legacy_db():
+    """Split an old single-file sessions_db.json into per-session records, and move inline bids to event logs"""
+    if os.path.exists(LEGACY_DB_FILE) and not os.path.isdir(DB_DIR):
         try:
-            with open(DB_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {'sessions': {}, 'user_sessions': {}}
-    return {'sessions': {}, 'user_sessions': {}}
+            with open(LEGACY_DB_FILE, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            legacy = None
+        if legacy is not None:
+            for code, session in legacy.get('sessions', {}).items():
+                _write_record(code, session)
+            os.replace(LEGACY_DB_FILE, LEGACY_DB_FILE + '.bak')
+    for code in _session_codes():
+        with _update_record(code) as holder:
+            session = holder[0]
+            if session is None or 'bids' not in session:
+                holder[0] = None
+                continue
+            bids = session.pop('bids')
+            session.pop('version', None)
+            eventlog.transact(_stream(code), lambda view: [] if view['bids'] else _session_events(bids))
 
-def save_db(data):
-    """Save database to file"""
-    with open(DB_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+def _session_codes():
+    shared = backend.get_backend()
+    if shared is not None:
+        return sorted(shared.members('sessions'))
+    if not os.path.isdir(DB_DIR):
+        return []
+    return sorted(f[:-5] for f in os.listdir(DB_DIR)
+                  if f.endswith('.json') and not f.startswith(('.', '_')))
+
+def _session_record(session_code):
+    shared = backend.get_backend()
+    if shared is not None:
+        return shared.get_json(f'session:{session_code}')
+    return _read_record(session_code)
 
 def session_exists(session_code):
     """Check if a session exists"""
-    db = load_db()
-    return session_code in db['sessions']
+    shared = backend.get_backend()
+    if shared is not None:
+        return shared.get(f'session:{session_code}') is not None
+    return os.path.exists(_record_path(session_code))
 
 def create_session(scene_id, params):
-    db = load_db()
-    code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    db['sessions'][code] = {
-        'scene_id': scene_id,
-        'params': params,
-        'bids': {},  # username: {'MC':..., 'price':..., 'bid_submitted':...}
-        'created_at': datetime.now().isoformat()
-    }
-    save_db(db)
-    return code
+    shared = backend.get_backend()
+    if shared is not None:
+        return _shared_create_session(shared, scene_id, params)
+    while True:
+        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        with _locked(code):
+            # codes of archived sessions stay reserved so they can still be replayed
+            if session_exists(code) or eventlog.exists(_stream(code)) or expiry.is_archived('sessions', code):
+                continue
+            session = {
+                'scene_id': scene_id,
+                'params': params,
+                'created_at': datetime.now().isoformat()
+            }
+            _write_record(code, session)
+            _schedule_expiry(code, session)
+            pubsub.publish('sessions')
+            return code
 
 def get_all_sessions():
-    db = load_db()
-    return [{'code': k, 'scene_id': v['scene_id']} for k, v in db['sessions'].items()]
+    sessions = []
+    for code in _session_codes():
+        session = _session_record(code)
+        if session is not None:
+            sessions.append({'code': code, 'scene_id': session['scene_id'], 'created_at': session['created_at']})
+    return sessions
+
+def get_session_version(session_code):
+    """Return the sequence number of the session's last event (bumped by every join/bid), or None if missing"""
+    if not session_exists(session_code):
+        return None
+    shared = backend.get_backend()
+    if shared is not None:
+        return int(shared.get(f'session:{session_code}:version') or 0)
+    return eventlog.version(_stream(session_code))
+
+def _stored_version(channel):
+    return get_session_version(channel.split(':', 1)[1])  # event log: also written by other processes
+
+pubsub.add_source('session:', _stored_version)
 
 def join_session(session_code, username):
-    db = load_db()
-    if session_code in db['sessions']:
+    if not session_exists(session_code):
+        return None
+    shared = backend.get_backend()
+    if shared is not None:
+        return _shared_join_session(shared, session_code, username)
+
+    def decide(view):
+        if view['closed'] or username in view['bids']:
+            return []  # already joined, nothing to write
         # Assign MC for demo (random, in real use from teacher param)
-        if username not in db['sessions'][session_code]['bids']:
-            mc = random.randint(20, 80)
-            db['sessions'][session_code]['bids'][username] = {'MC': mc, 'bid_submitted': False}
-            db['user_sessions'][username] = session_code
-            save_db(db)
-            return db['sessions'][session_code]['bids'][username]
-        else:
-            return None  # already joined
-    return None
+        return [{'type': 'join', 'user': username, 'MC': random.randint(20, 80)}]
+
+    if not eventlog.transact(_stream(session_code), decide):
+        return None
+    scene_cache.invalidate(session_code)
+    pubsub.publish(f'session:{session_code}')
+    return get_user_info(session_code, username)
 
 def get_session_params(session_code):
-    db = load_db()
-    if session_code not in db['sessions']:
+    session_data = _session_record(session_code)
+    if session_data is None:
         return None
-    session_data = db['sessions'][session_code]
     return session_data['params'] | {'scene_id': session_data['scene_id']}
 
 def get_bids(session_code):
-    db = load_db()
-    if session_code not in db['sessions']:
+    if not session_exists(session_code):
         return []
-    return [dict(username=k, **v) for k, v in db['sessions'][session_code]['bids'].items()]
+    shared = backend.get_backend()
+    if shared is not None:
+        return _shared_bids(shared, session_code)
+    view = eventlog.view(_stream(session_code))
+    return [dict(username=k, **v) for k, v in view['bids'].items()]
+
+def get_bid_table(session_code):
+    """get_bids() as a columnar BidTable for the scene views, rebuilt only after a join or bid"""
+    version = get_session_version(session_code)  # read before the bids: a table is never newer than its tag
+    if version is None:
+        return BidTable.from_bids([])
+    cached = _bid_tables.get(session_code)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    table = BidTable.from_bids(get_bids(session_code))
+    _bid_tables[session_code] = (version, table)
+    return table
 
 def submit_bid(session_code, username, price):
-    db = load_db()
-    if session_code not in db['sessions']:
-        return False
-    bids = db['sessions'][session_code]['bids']
-    if username in bids:
-        bids[username]['price'] = price
-        bids[username]['bid_submitted'] = True
-        save_db(db)
-        return True
-    return False
+    """Record a bid; a repeated bid is logged as a revision, so the full history is kept"""
+    return username in submit_bids(session_code, {username: price})
+
+def submit_bids(session_code, bids):
+    """Record many bids {username: price} with a single log append; returns the users whose bid was taken"""
+    if not session_exists(session_code):
+        return []
+    shared = backend.get_backend()
+    if shared is not None:
+        return [user for user, price in bids.items() if _shared_submit_bid(shared, session_code, user, price)]
+
+    def decide(view):
+        if view['closed']:
+            return []
+        events = []
+        for username, price in bids.items():
+            info = view['bids'].get(username)
+            if info is None:
+                continue  # not joined
+            if info['bid_submitted']:
+                events.append({'type': 'revise', 'user': username, 'price': price, 'previous': info.get('price')})
+            else:
+                events.append({'type': 'bid', 'user': username, 'price': price})
+        return events
+
+    events = eventlog.transact(_stream(session_code), decide)
+    if not events:
+        return []
+    scene_cache.invalidate(session_code)
+    pubsub.publish(f'session:{session_code}')
+    return [event['user'] for event in events]
 
 def get_user_info(session_code, username):
-    db = load_db()
-    if session_code not in db['sessions']:
+    if not session_exists(session_code):
         return {}
-    return db['sessions'][session_code]['bids'].get(username, {})
+    shared = backend.get_backend()
+    if shared is not None:
+        return shared.get_json(_bid_key(session_code, username)) or {}
+    return dict(eventlog.view(_stream(session_code))['bids'].get(username, {}))
+
+def replay_session(session_code):
+    """Step through a session's history (including deleted and archived sessions): yields (event, bid table)"""
+    archived = expiry.load_archive('sessions', session_code)
+    events = archived['events'] if archived is not None and not eventlog.exists(_stream(session_code)) else None
+    for event, view in eventlog.replay(_stream(session_code), events):
+        yield event, view['bids']
 
 def delete_session(session_code):
-    """Delete a session and all its bids"""
-    db = load_db()
-    if session_code in db['sessions']:
-        # Remove session
-        del db['sessions'][session_code]
-        # Remove user associations
-        users_to_remove = [user for user, session in db['user_sessions'].items() if session == session_code]
-        for user in users_to_remove:
-            del db['user_sessions'][user]
-        save_db(db)
-        return True
-    return False
+    """Delete a session; its settings and event history are moved to cold storage, and kept for replay"""
+    _bid_tables.pop(session_code, None)
+    shared = backend.get_backend()
+    if shared is not None:
+        return _shared_delete_session(shared, session_code)
+    with _locked(session_code):
+        session = _read_record(session_code)
+        if session is None:
+            return False
+        stream = _stream(session_code)
+        eventlog.transact(stream, lambda view: [] if view['closed'] else [{'type': 'close'}])
+        expiry.archive('sessions', session_code,
+                       session | {'code': session_code, 'events': list(eventlog.read_events(stream))})
+        eventlog.remove(stream)
+        _remove_record(session_code)
+    expiry.cancel(('session', session_code))
+    scene_cache.invalidate(session_code)
+    pubsub.publish('sessions')
+    pubsub.publish(f'session:{session_code}')
+    return True
+
+# ------------------ 共享后端 ------------------
+# Keys: session:<code> (settings JSON), sessions (set of codes), session:<code>:users (set),
+# session:<code>:bid:<user> (bid JSON, changed by compare-and-set), session:<code>:version
+# (counter bumped by every join/bid).
+def _bid_key(session_code, username):
+    return f'session:{session_code}:bid:{username}'
+
+def _shared_create_session(shared, scene_id, params):
+    session = {'scene_id': scene_id, 'params': params, 'created_at': datetime.now().isoformat()}
+    while True:
+        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        if expiry.is_archived('sessions', code) or not shared.add(f'session:{code}', json.dumps(session)):
+            continue
+        shared.add_member('sessions', code)
+        _schedule_expiry(code, session)
+        pubsub.publish('sessions')
+        return code
+
+def _shared_join_session(shared, session_code, username):
+    # Assign MC for demo (random, in real use from teacher param)
+    info = {'MC': random.randint(20, 80), 'bid_submitted': False}
+    if not shared.add(_bid_key(session_code, username), json.dumps(info)):
+        return None  # already joined
+    shared.add_member(f'session:{session_code}:users', username)
+    shared.incr(f'session:{session_code}:version')
+    scene_cache.invalidate(session_code)
+    pubsub.publish(f'session:{session_code}')
+    return info
+
+def _shared_bids(shared, session_code):
+    users = sorted(shared.members(f'session:{session_code}:users'))
+    values = shared.get_many([_bid_key(session_code, user) for user in users])
+    return [dict(username=user, **json.loads(value)) for user, value in zip(users, values) if value is not None]
+
+def _shared_submit_bid(shared, session_code, username, price):
+    updated = shared.update_json(_bid_key(session_code, username),
+                                 lambda info: None if info is None else info | {'price': price, 'bid_submitted': True})
+    if updated is None:
+        return False
+    shared.incr(f'session:{session_code}:version')
+    scene_cache.invalidate(session_code)
+    pubsub.publish(f'session:{session_code}')
+    return True
+
+def _shared_delete_session(shared, session_code):
+    current = shared.get(f'session:{session_code}')
+    # compare-and-set: when several workers expire the session, exactly one archives it
+    if current is None or not shared.cas(f'session:{session_code}', current, None):
+        return False
+    bids = _shared_bids(shared, session_code)
+    table = {bid.pop('username'): bid for bid in bids}
+    expiry.archive('sessions', session_code, json.loads(current) | {
+        'code': session_code, 'events': _session_events(table) + [{'type': 'close'}]})
+    users = list(table)
+    shared.delete(*[_bid_key(session_code, user) for user in users],
+                  f'session:{session_code}:users', f'session:{session_code}:version')
+    shared.remove_member('sessions', session_code)
+    expiry.cancel(('session', session_code))
+    scene_cache.invalidate(session_code)
+    pubsub.publish('sessions')
+    pubsub.publish(f'session:{session_code}')
+    return True
+
+# ------------------ 过期归档 ------------------
+def _deadline(session):
+    return datetime.fromisoformat(session['created_at']).timestamp() + SESSION_TTL
+
+def _schedule_expiry(code, session):
+    expiry.schedule(('session', code), _deadline(session), delete_session, code)
+
+_expiry_started = False
+
+def start_expiry():
+    """Schedule every live session for archival at its deadline (idempotent; overdue ones go at once)"""
+    global _expiry_started
+    with _cache_lock:
+        if _expiry_started:
+            return
+        _expiry_started = True
+    for code in _session_codes():
+        session = _session_record(code)
+        if session is not None:
+            _schedule_expiry(code, session)
 
 def clear_old_sessions():
-    """Clear sessions older than 24 hours"""
-    db = load_db()
-    current_time = datetime.now()
-    to_delete = []
-    for code, session in db['sessions'].items():
-        created_at = datetime.fromisoformat(session['created_at'])
-        if (current_time - created_at).total_seconds() > 86400:  # 24 hours
-            to_delete.append(code)
-    
-    for code in to_delete:
-        del db['sessions'][code]
-    
-    if to_delete:
-        save_db(db)
-
-# Clean old sessions on startup
-clear_old_sessions() 
\ No newline at end of file
+    """Archive sessions older than SESSION_TTL now, without waiting for the scheduler"""
+    now = datetime.now().timestamp()
+    for code in _session_codes():
+        session = _session_record(code)
+        if session is not None and _deadline(session) <= now:
+            delete_session(code)
@@ -0,0 +1,280 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to process-local locking only
+    fcntl = None
+
+# Append-only, line-delimited event logs, one stream per scenario/session
+# ('scenario-<id>', 'session-<code>'). Each process keeps an in-memory materialized view per
+# stream, built from the latest snapshot plus a replay of the live log and then updated by
+# tailing only the bytes appended since. Compaction snapshots the view and moves the live
+# log into a gzip archive, so history is kept for replay but startup stays short.
+LOG_DIR = "event_logs"
+FSYNC_INTERVAL = 0.05  # seconds; appends are visible at once, fsync is batched
+COMPACT_EVERY = 1000   # events in the live log before it is compacted
+
+_reducers = []  # (stream prefix, initial state factory, reducer)
+_streams = {}
+_streams_lock = threading.Lock()
+_dirty = set()
+_dirty_lock = threading.Lock()
+_flusher = None
+
+def register_reducer(prefix, initial, reducer):
+    """reducer(state, event) mutates state; initial() returns an empty state"""
+    _reducers.append((prefix, initial, reducer))
+
+def _reducer_for(stream):
+    for prefix, initial, reducer in _reducers:
+        if stream.startswith(prefix):
+            return initial, reducer
+    return dict, lambda state, event: None
+
+def _paths(stream):
+    base = os.path.join(LOG_DIR, stream)
+    return base + '.log', base + '.snapshot.json', base + '.archive.jsonl.gz', base + '.lock'
+
+def _stream(stream):
+    with _streams_lock:
+        if stream not in _streams:
+            _streams[stream] = {'lock': threading.RLock(), 'fd': None, 'ino': None, 'snapshot': None,
+                                'offset': 0, 'seq': 0, 'state': None, 'since_snapshot': 0}
+        return _streams[stream]
+
+@contextmanager
+def _locked(stream):
+    s = _stream(stream)
+    with s['lock']:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        with open(_paths(stream)[3], 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield s
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _load_snapshot(stream, s):
+    initial, _ = _reducer_for(stream)
+    s['state'], s['seq'], s['offset'], s['since_snapshot'] = initial(), 0, 0, 0
+    try:
+        with open(_paths(stream)[1], 'r') as f:
+            snapshot = json.load(f)
+        s['state'], s['seq'] = snapshot['state'], snapshot['seq']
+    except (OSError, ValueError):
+        pass
+
+def _snapshot_stamp(stream):
+    try:
+        st_ = os.stat(_paths(stream)[1])
+    except FileNotFoundError:
+        return None
+    return st_.st_ino, st_.st_mtime_ns
+
+def _catch_up(stream, s):
+    """Apply events appended (by any process) since this view was last updated"""
+    log_path = _paths(stream)[0]
+    try:
+        st_ = os.stat(log_path)
+    except FileNotFoundError:
+        st_ = None
+    ino = st_.st_ino if st_ else None
+    # a compaction elsewhere always rewrites the snapshot; the new log alone can't tell,
+    # since it may get the inode number of the log it replaced
+    snapshot = _snapshot_stamp(stream)
+    if s['state'] is None or ino != s['ino'] or snapshot != s['snapshot']:
+        _load_snapshot(stream, s)  # first use, or the log was compacted elsewhere
+        s['ino'], s['snapshot'] = ino, snapshot
+    if st_ is None or st_.st_size <= s['offset']:
+        return
+    _, reducer = _reducer_for(stream)
+    with open(log_path, 'rb') as f:
+        f.seek(s['offset'])
+        chunk = f.read(st_.st_size - s['offset'])
+    end = chunk.rfind(b'\n') + 1  # ignore a partially written last line
+    for line in chunk[:end].splitlines():
+        event = json.loads(line)
+        if event['seq'] > s['seq']:
+            reducer(s['state'], event)
+            s['seq'] = event['seq']
+            s['since_snapshot'] += 1
+    s['offset'] += end
+
+def exists(stream):
+    """True if the stream has any events (live, snapshotted or archived)"""
+    return any(os.path.exists(path) for path in _paths(stream)[:3])
+
+def streams():
+    """Names of every stream with events on disk"""
+    if not os.path.isdir(LOG_DIR):
+        return []
+    suffixes = ('.log', '.snapshot.json', '.archive.jsonl.gz')
+    return sorted({f[:-len(sfx)] for f in os.listdir(LOG_DIR) for sfx in suffixes
+                   if f.endswith(sfx) and not f.startswith('.')})
+
+def view(stream):
+    """Current materialized state of a stream (shared object: treat as read-only)"""
+    s = _stream(stream)
+    with s['lock']:
+        _catch_up(stream, s)
+        return s['state']
+
+def version(stream):
+    """Sequence number of the last event applied to the stream's view"""
+    s = _stream(stream)
+    with s['lock']:
+        _catch_up(stream, s)
+        return s['seq']
+
+def _append_locked(stream, s, events):
+    _, reducer = _reducer_for(stream)
+    log_path = _paths(stream)[0]
+    st_fd = os.fstat(s['fd']) if s['fd'] is not None else None
+    if st_fd is None or st_fd.st_nlink == 0 or s['ino'] != st_fd.st_ino:  # unlinked: compacted elsewhere
+        if s['fd'] is not None:
+            _fsync_and_close(s)
+        s['fd'] = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        s['ino'] = os.fstat(s['fd']).st_ino
+    lines = []
+    for event in events:
+        s['seq'] += 1
+        event = {'seq': s['seq'], 'ts': time.time()} | event
+        reducer(s['state'], event)
+        s['since_snapshot'] += 1
+        lines.append(json.dumps(event, separators=(',', ':')))
+    payload = ('\n'.join(lines) + '\n').encode()
+    os.write(s['fd'], payload)
+    s['offset'] += len(payload)
+    _schedule_fsync(stream)
+
+@metrics.timed('eventlog.transact')
+def transact(stream, decide):
+    """Atomically decide and append events.
+
+    decide(state) runs under the stream lock on an up-to-date view and returns a list of
+    event dicts (each with at least 'type'); they are appended and applied in order.
+    Returns the list of appended events.
+    """
+    with _locked(stream) as s:
+        _catch_up(stream, s)
+        events = decide(s['state']) or []
+        if events:
+            _append_locked(stream, s, events)
+            if s['since_snapshot'] >= COMPACT_EVERY:
+                _compact_locked(stream, s)
+        return events
+
+def append(stream, event_type, **fields):
+    return transact(stream, lambda state: [{'type': event_type} | fields])[0]
+
+def _fsync_and_close(s):
+    try:
+        os.fsync(s['fd'])
+    except OSError:
+        pass
+    os.close(s['fd'])
+    s['fd'] = None
+
+def _schedule_fsync(stream):
+    global _flusher
+    with _dirty_lock:
+        _dirty.add(stream)
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name='eventlog-fsync', daemon=True)
+            _flusher.start()
+
+def _flush_loop():
+    while True:
+        time.sleep(FSYNC_INTERVAL)
+        flush()
+
+def flush(stream=None):
+    """fsync pending appends now (all streams, or one)"""
+    with _dirty_lock:
+        pending = [stream] if stream is not None else list(_dirty)
+        _dirty.difference_update(pending)
+    for name in pending:
+        s = _stream(name)
+        with s['lock']:
+            if s['fd'] is not None:
+                try:
+                    os.fsync(s['fd'])
+                except OSError:
+                    pass
+
+@metrics.timed('eventlog.compact')
+def _compact_locked(stream, s):
+    log_path, snapshot_path, archive_path, _ = _paths(stream)
+    if s['fd'] is not None:
+        _fsync_and_close(s)
+    # 1. snapshot the view (atomic rename)
+    fd, tmp_path = tempfile.mkstemp(dir=LOG_DIR, prefix='.' + stream, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'seq': s['seq'], 'state': s['state']}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snapshot_path)
+    # 2. move the live log into the archive and start a new one
+    if os.path.exists(log_path):
+        with open(log_path, 'rb') as src, gzip.open(archive_path, 'ab') as dst:
+            dst.write(src.read())
+        os.remove(log_path)
+    s['ino'], s['snapshot'], s['offset'], s['since_snapshot'] = None, _snapshot_stamp(stream), 0, 0
+
+def compact(stream):
+    """Snapshot the current view and archive the live log"""
+    with _locked(stream) as s:
+        _catch_up(stream, s)
+        _compact_locked(stream, s)
+
+def remove(stream):
+    """Delete every file of a stream (after it has been archived elsewhere)"""
+    with _locked(stream) as s:
+        if s['fd'] is not None:
+            _fsync_and_close(s)
+        for path in _paths(stream)[:3]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        s['state'], s['ino'], s['snapshot'], s['offset'], s['seq'], s['since_snapshot'] = None, None, None, 0, 0, 0
+    with _dirty_lock:
+        _dirty.discard(stream)
+    with _streams_lock:
+        _streams.pop(stream, None)
+
+def read_events(stream):
+    """Every event of a stream in order, archived ones included"""
+    log_path, _, archive_path, _ = _paths(stream)
+    flush(stream)
+    if os.path.exists(archive_path):
+        with gzip.open(archive_path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    if os.path.exists(log_path):
+        with open(log_path, 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n'):
+                    yield json.loads(line)
+
+def replay(stream, events=None):
+    """Re-run a stream from the beginning, yielding (event, state after the event).
+
+    events defaults to the stream's own history (pass archived events for a removed stream).
+    The same state object is updated in place; copy it if you keep it.
+    """
+    initial, reducer = _reducer_for(stream)
+    state = initial()
+    for event in read_events(stream) if events is None else events:
+        reducer(state, event)
+        yield event, state
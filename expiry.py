@@ -0,0 +1,120 @@
+import gzip
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+import metrics
+
+# Deadline-driven expiry: sessions and scenarios register their expiry time here, and one
+# daemon thread sleeps until the earliest deadline (a heap) and runs the callback, which moves
+# the item to cold storage: one gzipped JSON document per item under ARCHIVE_DIR/<kind>/.
+# Rescheduling or cancelling a key leaves its old heap entry behind; it is skipped when popped.
+ARCHIVE_DIR = 'cold_storage'
+RETRY_SECONDS = 60  # a failed callback is retried after this long
+
+_heap = []     # (deadline, seq, key)
+_entries = {}  # key -> (deadline, seq, callback, args): the live schedule
+_cond = threading.Condition()
+_seq = itertools.count()
+_worker = None
+
+def schedule(key, deadline, callback, *args):
+    """Run callback(*args) once the epoch time `deadline` has passed (replaces key's earlier schedule)"""
+    global _worker
+    with _cond:
+        seq = next(_seq)
+        _entries[key] = (deadline, seq, callback, args)
+        heapq.heappush(_heap, (deadline, seq, key))
+        if len(_heap) > 2 * len(_entries) + 64:  # mostly stale entries: rebuild
+            _heap[:] = [(d, s, k) for k, (d, s, _, _) in _entries.items()]
+            heapq.heapify(_heap)
+        if _worker is None:
+            _worker = threading.Thread(target=_loop, name='expiry', daemon=True)
+            _worker.start()
+        _cond.notify()
+
+def cancel(key):
+    with _cond:
+        return _entries.pop(key, None) is not None
+
+def deadline(key):
+    """Scheduled deadline of key, or None"""
+    with _cond:
+        entry = _entries.get(key)
+        return entry[0] if entry else None
+
+def pending():
+    with _cond:
+        return len(_entries)
+
+def _pop_due(now):
+    due = []
+    while _heap and _heap[0][0] <= now:
+        _, seq, key = heapq.heappop(_heap)
+        entry = _entries.get(key)
+        if entry is not None and entry[1] == seq:
+            del _entries[key]
+            due.append((key, entry))
+    return due
+
+def run_due(now=None):
+    """Run every callback whose deadline has passed, in this thread; returns how many ran"""
+    with _cond:
+        due = _pop_due(time.time() if now is None else now)
+    for key, (_, _, callback, args) in due:
+        try:
+            with metrics.timer('expiry.run'):
+                callback(*args)
+            metrics.count('expiry.expired')
+        except Exception:
+            metrics.count('expiry.failed')
+            with _cond:
+                if key not in _entries:
+                    schedule(key, time.time() + RETRY_SECONDS, callback, *args)
+    return len(due)
+
+def _loop():
+    while True:
+        with _cond:
+            while not _heap or _heap[0][0] > time.time():
+                _cond.wait(_heap[0][0] - time.time() if _heap else None)
+        run_due()
+
+# ------------------ 冷存储 ------------------
+def _archive_path(kind, name):
+    return os.path.join(ARCHIVE_DIR, kind, f'{name}.json.gz')
+
+def archive(kind, name, document):
+    """Write a JSON document to cold storage (atomically, replacing an older copy)"""
+    directory = os.path.join(ARCHIVE_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + str(name), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            f.write(json.dumps(document).encode())
+        os.replace(tmp_path, _archive_path(kind, name))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def is_archived(kind, name):
+    return os.path.exists(_archive_path(kind, name))
+
+def load_archive(kind, name):
+    """An archived document, or None"""
+    try:
+        with gzip.open(_archive_path(kind, name), 'rb') as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+def archived(kind):
+    """Names of every archived document of a kind"""
+    directory = os.path.join(ARCHIVE_DIR, kind)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-len('.json.gz')] for f in os.listdir(directory) if f.endswith('.json.gz'))
@@ -0,0 +1,195 @@
+import os
+import sys
+from datetime import datetime
+import numpy as np
+import store
+import eventlog
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:  # export and analytics are optional: pip install pyarrow
+    pa = pc = ds = None
+
+# Bulk export of scenarios (store.py), classroom sessions (db.py), computed clearing outcomes
+# and the bid event history into Parquet datasets, partitioned by scenario and date
+# (<EXPORT_DIR>/<table>/scenario=<id>/date=<YYYY-MM-DD>/part-0.parquet). Rows are streamed one
+# scenario/session at a time, and queries read only the columns and partitions they need.
+EXPORT_DIR = 'exports'
+TABLES = ('scenarios', 'participants', 'bids', 'clearing', 'outcomes', 'events')
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+
+def _schemas():
+    common = [('scenario', pa.string()), ('source', pa.string()), ('date', pa.string())]
+    return {
+        'scenarios': pa.schema(common + [('name', pa.string()), ('market_type', pa.string()),
+                                         ('demand', pa.float64()), ('status', pa.string()),
+                                         ('participants', pa.int64())]),
+        'participants': pa.schema(common + [('username', pa.string()), ('full_name', pa.string()),
+                                            ('role', pa.string()), ('MC', pa.float64())]),
+        'bids': pa.schema(common + [('username', pa.string()), ('price', pa.float64()), ('quantity', pa.float64()),
+                                    ('bid_type', pa.string()), ('MC', pa.float64()), ('created_at', pa.string())]),
+        'clearing': pa.schema(common + [('mcp', pa.float64()), ('cleared_quantity', pa.float64()),
+                                        ('consumer_cost', pa.float64()), ('offers', pa.int64()),
+                                        ('sufficient', pa.bool_())]),
+        'outcomes': pa.schema(common + [('username', pa.string()), ('price', pa.float64()), ('quantity', pa.float64()),
+                                        ('MC', pa.float64()), ('dispatch', pa.float64()), ('revenue', pa.float64()),
+                                        ('profit', pa.float64()), ('mcp', pa.float64())]),
+        'events': pa.schema(common + [('seq', pa.int64()), ('ts', pa.float64()), ('type', pa.string()),
+                                      ('username', pa.string()), ('price', pa.float64())]),
+    }
+
+def _partitioning():
+    # explicit string types: scenario ids are numbers, session codes are not
+    return ds.partitioning(pa.schema([('scenario', pa.string()), ('date', pa.string())]), flavor='hive')
+
+def clearing_rows(tag, offers, demand, demand_bids=()):
+    """Uniform-price clearing of one scenario/session: (clearing row, outcome rows)"""
+    from scenes.clearing import clear_market
+    if not offers:
+        return [], []
+    price = np.array([o['price'] for o in offers], dtype=float)
+    quantity = np.array([o['quantity'] for o in offers], dtype=float)
+    mc = np.array([price[i] if o.get('MC') is None else o['MC'] for i, o in enumerate(offers)], dtype=float)
+    if demand_bids:
+        result = clear_market(price, quantity, mc, [b['quantity'] for b in demand_bids],
+                              [b['price'] for b in demand_bids])
+    else:
+        result = clear_market(price, quantity, mc, demand)
+    mcp = result['mcp']
+    clearing = [tag | {'mcp': mcp, 'cleared_quantity': result['cleared_quantity'],
+                       'consumer_cost': result['consumer_cost'], 'offers': len(offers),
+                       'sufficient': result['sufficient']}]
+    outcomes = [tag | {'username': o['username'], 'price': price[i], 'quantity': quantity[i], 'MC': o.get('MC'),
+                       'dispatch': result['supply_dispatch'][i],
+                       'revenue': result['supply_dispatch'][i] * mcp if mcp is not None else 0.0,
+                       'profit': result['supply_profit'][i], 'mcp': mcp}
+                for i, o in enumerate(offers)]
+    return clearing, outcomes
+
+def _scenario_rows():
+    """One dict of table -> rows per scenario in store.py"""
+    for scenario in store.list_scenarios():
+        sid = scenario['id']
+        tag = {'scenario': str(sid), 'source': 'scenario', 'date': scenario['created_at'] or ''}
+        bids = store.get_bids(sid)
+        latest = store.get_latest_bids(sid)
+        offers = [b for b in latest if b['bid_type'] == 'supply']
+        demand_bids = [b for b in latest if b['bid_type'] == 'demand']
+        clearing, outcomes = clearing_rows(tag, offers, scenario['demand'], demand_bids)
+        yield {
+            'scenarios': [tag | {'name': scenario['name'], 'market_type': scenario['market_type'],
+                                 'demand': scenario['demand'], 'status': scenario['status'],
+                                 'participants': scenario['participants']}],
+            'participants': [tag | {'username': p['username'], 'full_name': p['full_name'], 'role': p['role'],
+                                    'date': p['join_time'] or tag['date']} for p in store.get_participants(sid)],
+            'bids': [tag | {'username': b['username'], 'price': b['price'], 'quantity': b['quantity'],
+                            'bid_type': b['bid_type'], 'created_at': b['created_at'],
+                            'date': (b['created_at'] or tag['date'])[:10]} for b in bids],
+            'clearing': clearing,
+            'outcomes': outcomes,
+        }
+
+def _session_rows():
+    """One dict of table -> rows per classroom session in db.py"""
+    import db
+    from scenes import get_scene_module, SCENE_TITLES
+    for session in db.get_all_sessions():
+        code = session['code']
+        params = db.get_session_params(code)
+        if params is None:
+            continue
+        tag = {'scenario': code, 'source': 'session', 'date': session['created_at'][:10]}
+        bids = db.get_bids(code)
+        offers = [{'username': b['username'], 'price': b['price'], 'quantity': b.get('quantity', 1), 'MC': b['MC']}
+                  for b in bids if b.get('bid_submitted')]
+        clearing, outcomes = [], []
+        # single-price scenes clear against a scalar demand; network and multi-interval scenes are not re-solved here
+        if 'demand' in params and hasattr(get_scene_module(params['scene_id']), 'clear_bids'):
+            clearing, outcomes = clearing_rows(tag, offers, params['demand'])
+        yield {
+            'scenarios': [tag | {'name': SCENE_TITLES.get(params['scene_id'], f"Scene {params['scene_id']}"),
+                                 'market_type': SCENE_TITLES.get(params['scene_id']),
+                                 'demand': params.get('demand'), 'status': 'active', 'participants': len(bids)}],
+            'participants': [tag | {'username': b['username'], 'role': 'student', 'MC': b['MC']} for b in bids],
+            'bids': [tag | {'username': o['username'], 'price': o['price'], 'quantity': o['quantity'],
+                            'bid_type': 'supply', 'MC': o['MC']} for o in offers],
+            'clearing': clearing,
+            'outcomes': outcomes,
+        }
+
+def _event_rows():
+    """Bid history from the event logs (includes deleted sessions and revised bids)"""
+    for stream in eventlog.streams():
+        source, _, scenario = stream.partition('-')
+        rows = []
+        for event in eventlog.read_events(stream):
+            rows.append({'scenario': scenario, 'source': source,
+                         'date': datetime.fromtimestamp(event['ts']).strftime('%Y-%m-%d'),
+                         'seq': event['seq'], 'ts': event['ts'], 'type': event['type'],
+                         'username': event.get('user'), 'price': event.get('price')})
+        yield {'events': rows}
+
+def export_all(export_dir=EXPORT_DIR, tables=TABLES):
+    """Write every table as a partitioned Parquet dataset; returns row counts per table"""
+    _require_pyarrow()
+    schemas = _schemas()
+    counts = {}
+    for table in tables:
+        def batches(table=table):
+            sources = (_event_rows(),) if table == 'events' else (_scenario_rows(), _session_rows())
+            for source in sources:
+                for rows in source:
+                    if rows.get(table):
+                        counts[table] = counts.get(table, 0) + len(rows[table])
+                        yield pa.RecordBatch.from_pylist(rows[table], schema=schemas[table])
+        counts[table] = 0
+        ds.write_dataset(batches(), os.path.join(export_dir, table), schema=schemas[table], format='parquet',
+                         partitioning=_partitioning(), basename_template='part-{i}.parquet',
+                         existing_data_behavior='delete_matching', max_partitions=1 << 16)
+    return counts
+
+# ------------------ 查询 ------------------
+def open_table(table, export_dir=EXPORT_DIR):
+    """A lazy pyarrow dataset over one exported table (nothing is read until scanned)"""
+    _require_pyarrow()
+    return ds.dataset(os.path.join(export_dir, table), format='parquet', partitioning=_partitioning())
+
+def query(table, columns=None, filter=None, export_dir=EXPORT_DIR):
+    """Read selected columns of the rows matching a pyarrow filter expression as a DataFrame,
+    e.g. query('bids', ['username', 'price'], ds.field('scenario') == 'ABC123')"""
+    return open_table(table, export_dir).to_table(columns=columns, filter=filter).to_pandas()
+
+def mcp_distribution(source=None, market_type=None, export_dir=EXPORT_DIR):
+    """Clearing prices across scenarios/sessions, optionally for one source or market type"""
+    clearing = open_table('clearing', export_dir)
+    condition = ds.field('mcp').is_valid()
+    if source is not None:
+        condition &= ds.field('source') == source
+    table = clearing.to_table(columns=['scenario', 'source', 'date', 'mcp', 'cleared_quantity'], filter=condition)
+    if market_type is not None:
+        types = open_table('scenarios', export_dir).to_table(
+            columns=['scenario'], filter=ds.field('market_type') == market_type)
+        table = table.filter(pc.is_in(table['scenario'], value_set=types['scenario']))
+    return table.to_pandas()
+
+def student_profit(username=None, export_dir=EXPORT_DIR):
+    """Profit and dispatch per student and date, summed over every scenario/session of that day"""
+    condition = ds.field('username') == username if username is not None else None
+    table = open_table('outcomes', export_dir).to_table(
+        columns=['username', 'date', 'profit', 'dispatch'], filter=condition)
+    grouped = table.group_by(['username', 'date']).aggregate(
+        [('profit', 'sum'), ('dispatch', 'sum'), ('profit', 'count')])
+    names = {'profit_sum': 'profit', 'dispatch_sum': 'dispatch', 'profit_count': 'rounds'}
+    grouped = grouped.rename_columns([names.get(c, c) for c in grouped.column_names])
+    return grouped.to_pandas().sort_values(['username', 'date'], ignore_index=True)
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else EXPORT_DIR
+    for name, count in export_all(target).items():
+        print(f"{name}: {count} rows")
+    print(f"Exported to {target}/")
@@ -1,346 +1,422 @@
-import streamlit as st
-import os
-import json
-from datetime import datetime
-import pandas as pd
-import re
-
-# ------------------ 数据文件和工具 ------------------
-DATA_DIR = 'data'
-os.makedirs(DATA_DIR, exist_ok=True)
-
-def ensure_json_file(filename, default):
-    path = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(path):
-        with open(path, 'w') as f:
-            json.dump(default, f)
-    return path
-
-SCENARIOS_FILE = ensure_json_file('scenarios.json', [])
-PARTICIPANTS_FILE = ensure_json_file('participants.json', {})
-BIDS_FILE = ensure_json_file('bids.json', {})
-USERS_FILE = ensure_json_file('users.json', {})
-
-def load_json(filename):
-    with open(filename, 'r') as f:
-        return json.load(f)
-
-def save_json(filename, data):
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
-
-# ------------------ 数据文件和工具 ------------------
-
-# 初始化默认用户
-DEFAULT_USERS = {
-    'teacher1': {'password': 'teachpass', 'role': 'teacher', 'full_name': 'Teacher One'},
-    'student1': {'password': 'studpass1', 'role': 'student', 'full_name': 'Student One'},
-    'student2': {'password': 'studpass2', 'role': 'student', 'full_name': 'Student Two'}
-}
-def ensure_default_users():
-    users = load_json(USERS_FILE)
-    if not users:
-        save_json(USERS_FILE, DEFAULT_USERS)
-ensure_default_users()
-
-# ------------------ 用户管理 ------------------
-def register_user(username, password, role):
-    users = load_json(USERS_FILE)
-    if username in users:
-        return False, "Username already exists."
-    users[username] = {
-        'password': password,
-        'role': role,
-        'full_name': username
-    }
-    save_json(USERS_FILE, users)
-    return True, "Registration successful."
-
-def verify_user(username, password):
-    users = load_json(USERS_FILE)
-    if username in users and users[username]['password'] == password:
-        return True, users[username]['role']
-    return False, None
-
-# ------------------ 页面函数 ------------------
-def login_page():
-    st.title("Login")
-    tab2, tab1 = st.tabs(["Student Enter", "Teacher Login"])
-    with tab2:
-        student_name = st.text_input("Your Name", key="student_name")
-        if st.button("Enter as Student"):
-            if not student_name.strip():
-                st.error("Please enter your name.")
-            else:
-                # 自动添加学生到users.json
-                users = load_json(USERS_FILE)
-                if student_name.strip() not in users:
-                    users[student_name.strip()] = {
-                        'password': '',
-                        'role': 'student',
-                        'full_name': student_name.strip()
-                    }
-                    save_json(USERS_FILE, users)
-                st.session_state['logged_in'] = True
-                st.session_state['username'] = student_name.strip()
-                st.session_state['role'] = 'student'
-                st.success(f"Welcome, {student_name.strip()}!")
-                st.rerun()
-    with tab1:
-        password = st.text_input("Teacher Password", type="password", key="login_pw")
-        if st.button("Login as Teacher"):
-            if password == '123456':
-                st.session_state['logged_in'] = True
-                st.session_state['username'] = 'teacher1'
-                st.session_state['role'] = 'teacher'
-                st.success("Login successful!")
-                st.rerun()
-            else:
-                st.error("Invalid teacher password.")
-
-def get_market_types():
-    types = ["Single-price Clearing Market", "Pay-as-Bid", "Transmission Constraints", "CMSC", "Locational Pricing", "Fixed Costs", "Cost Recovery Guarantees", "Multi-Interval Optimization", "Planning Risk", "Day-Ahead Market + Two-Settlement"]
-    return types
-
-def scenarios_list_page():
-    st.title("Experiment Scenarios")
-    scenarios = load_json(SCENARIOS_FILE)
-    if st.button("Refresh"):
-        st.rerun()
-    if st.session_state['role'] == 'teacher':
-        with st.expander("Create New Scenario"):
-            name = st.text_input("Scenario Name")
-            desc = st.text_area("Description")
-            demand = st.number_input("Demand (MW)", min_value=1, value=5, step=1, format="%d")
-            market_types = get_market_types()
-            market_type = st.selectbox("Market Type", market_types)
-            if st.button("Create Scenario"):
-                if not name.strip():
-                    st.error("Scenario Name is required!")
-                else:
-                    scenarios.append({
-                        'id': int(datetime.now().timestamp()),
-                        'name': name,
-                        'description': desc,
-                        'demand': demand,
-                        'status': 'active',
-                        'participants': 0,
-                        'created_at': datetime.now().strftime('%Y-%m-%d'),
-                        'market_type': market_type,
-                        'is_open': True
-                    })
-                    save_json(SCENARIOS_FILE, scenarios)
-                    st.success("Scenario created!")
-                    st.rerun()
-    if not scenarios:
-        st.info("No scenarios available.")
-    else:
-        cols = st.columns(2)
-        for idx, scenario in enumerate(scenarios):
-            with cols[idx % 2]:
-                st.markdown(f"### {scenario['name']}")
-                st.caption(scenario['description'])
-                st.write(f"**Demand:** {scenario['demand']} MW")
-                st.write(f"**Type:** {scenario.get('market_type', 'N/A')}")
-                st.write(f"**Status:** :{'green' if scenario['status']=='active' else 'gray'}[{scenario['status'].capitalize()}]")
-                st.write(f"**Participants:** {scenario.get('participants', 0)}")
-                st.write(f"**Created:** {scenario['created_at']}")
-                # 注入按钮样式，保证等宽等高
-                st.markdown('''
-                <style>
-                .stButton > button {
-                    width: 100% !important;
-                    height: 2.5em !important;
-                    border-radius: 8px !important;
-                    font-weight: 600 !important;
-                    font-size: 1em !important;
-                    margin-bottom: 0.2em !important;
-                }
-                </style>
-                ''', unsafe_allow_html=True)
-                if st.session_state['role'] == 'teacher':
-                    c1, c2, c3 = st.columns(3)
-                else:
-                    c1, c2 = st.columns(2)
-                with c1:
-                    if st.button("Join Scenario", key=f"join_{scenario['id']}"):
-                        st.session_state['page'] = 'bidding'
-                        st.session_state['selected_scenario'] = scenario['id']
-                        join_scenario(scenario['id'])
-                        st.rerun()
-                with c2:
-                    if st.button("View Details", key=f"view_{scenario['id']}"):
-                        st.session_state['page'] = 'detail'
-                        st.session_state['selected_scenario'] = scenario['id']
-                        st.rerun()
-                if st.session_state['role'] == 'teacher':
-                    with c3:
-                        if st.button("Delete", key=f"delete_{scenario['id']}"):
-                            scenarios = [s for s in scenarios if s['id'] != scenario['id']]
-                            save_json(SCENARIOS_FILE, scenarios)
-                            st.success("Scenario deleted!")
-                            st.rerun()
-
-def scenario_detail_page():
-    sid = st.session_state.get('selected_scenario')
-    scenarios = load_json(SCENARIOS_FILE)
-    scenario = next((s for s in scenarios if s['id'] == sid), None)
-    participants = load_json(PARTICIPANTS_FILE).get(str(sid), [])
-    bids = load_json(BIDS_FILE).get(str(sid), [])
-    is_participant = st.session_state['username'] in [p['username'] for p in participants]
-    if st.button("← Back"):
-        set_page('scenarios')
-    if not scenario:
-        st.warning("No scenario selected or data not loaded.")
-        return
-    st.header("Scenario Details")
-    st.subheader(scenario['name'])
-    st.caption(scenario.get('description', 'No description provided'))
-    st.write(f"**Demand:** {scenario['demand']} MW")
-    st.write(f"**Status:** :{'green' if scenario['status']=='active' else 'gray'}[{scenario['status'].capitalize()}]")
-    st.write(f"**Market Type:** {scenario.get('market_type', 'N/A')}")
-    st.write(f"**Created:** {scenario['created_at']}")
-    st.write(f"**Participants:** {len(participants)}")
-    st.write(f"**Experiment Type:** {'Open' if scenario.get('is_open') else 'Class Limited'}")
-    if scenario['status'] == 'active' and not is_participant:
-        if st.button("Join Scenario"):
-            join_scenario(sid)
-    if scenario['status'] == 'active' and is_participant:
-        if st.button("Submit Bids"):
-            set_page('bidding')
-    if scenario['status'] == 'completed':
-        st.button("View Results")
-    st.markdown("#### Participants")
-    if participants:
-        st.dataframe(pd.DataFrame(participants))
-    else:
-        st.info("No participants yet.")
-    st.markdown("#### Bids Summary")
-    if bids:
-        st.write(f"**Total Bids:** {len(bids)}")
-        st.write(f"**Average Price:** ${pd.DataFrame(bids)['price'].mean():.2f}")
-    else:
-        st.info("No bids yet.")
-    st.markdown("#### Recent Bids")
-    if bids:
-        for bid in bids[:5]:
-            st.write(f"{bid['username']} - ${bid['price']} | {bid['quantity']} MW ({bid['bid_type']})")
-    else:
-        st.info("No bids yet.")
-
-def bidding_page():
-    sid = st.session_state.get('selected_scenario')
-    scenarios = load_json(SCENARIOS_FILE)
-    scenario = next((s for s in scenarios if s['id'] == sid), None)
-    my_bids = [b for b in load_json(BIDS_FILE).get(str(sid), []) if b['username'] == st.session_state['username']]
-    if st.button("← Back"):
-        set_page('scenarios')
-    if not scenario:
-        st.warning("Please select a scenario.")
-        return
-    st.header(f"Bidding for: {scenario['name']}")
-    st.caption(scenario['description'])
-    with st.form("bid_form"):
-        price = st.number_input("Bid Price ($/MWh)", min_value=0, value=0, step=1, format="%d")
-        quantity = st.number_input(
-            "Bid Quantity (MW)",
-            min_value=0,
-            max_value=int(scenario['demand']),
-            value=0,
-            step=1,
-            format="%d"
-        )
-        bid_type = st.selectbox("Bid Type", ["supply", "demand"])
-        submitted = st.form_submit_button("Submit Bid")
-        if submitted:
-            if price == 0 or quantity == 0:
-                st.error("Price and Quantity must both be greater than 0!")
-            else:
-                bids = load_json(BIDS_FILE)
-                bids.setdefault(str(sid), []).append({
-                    'username': st.session_state['username'],
-                    'price': price,
-                    'quantity': quantity,
-                    'bid_type': bid_type,
-                    'created_at': datetime.now().strftime('%Y-%m-%d %H:%M')
-                })
-                save_json(BIDS_FILE, bids)
-                st.success(f"Bid submitted: ${price}/MWh, {quantity} MW, {bid_type}")
-                st.rerun()
-    st.markdown("#### Scenario Details")
-    st.write(f"**Demand:** {scenario['demand']} MW")
-    st.write(f"**Status:** {scenario['status']}")
-    st.write(f"**Participants:** {scenario.get('participants', 0)}")
-    st.write(f"**Created:** {scenario['created_at']}")
-    st.markdown("#### My Previous Bids")
-    if my_bids:
-        for bid in my_bids:
-            st.write(f"${bid['price']}/MWh - {bid['quantity']} MW ({bid['bid_type']})")
-    else:
-        st.info("No previous bids.")
-
-# ------------------ 页面切换与主入口 ------------------
-def set_page(page):
-    st.session_state['page'] = page
-    if page == 'scenarios':
-        st.session_state['selected_scenario'] = None
-    st.rerun()
-
-def join_scenario(sid):
-    participants = load_json(PARTICIPANTS_FILE)
-    user = st.session_state['username']
-    users = load_json(USERS_FILE)
-    # 兼容学生未注册的情况
-    if user not in [p['username'] for p in participants.get(str(sid), [])]:
-        if user in users:
-            full_name = users[user].get('full_name', user)
-            role = users[user].get('role', 'student')
-        else:
-            full_name = user
-            role = 'student'
-        participants.setdefault(str(sid), []).append({
-            'username': user,
-            'full_name': full_name,
-            'role': role,
-            'join_time': datetime.now().strftime('%Y-%m-%d')
-        })
-        save_json(PARTICIPANTS_FILE, participants)
-    # 更新场景参与人数
-    scenarios = load_json(SCENARIOS_FILE)
-    for s in scenarios:
-        if s['id'] == sid:
-            s['participants'] = len(participants[str(sid)])
-    save_json(SCENARIOS_FILE, scenarios)
-
-# ------------------ 主入口 ------------------
-if 'logged_in' not in st.session_state:
-    st.session_state['logged_in'] = False
-if 'page' not in st.session_state:
-    st.session_state['page'] = 'scenarios'
-if 'selected_scenario' not in st.session_state:
-    st.session_state['selected_scenario'] = None
-if 'username' not in st.session_state:
-    st.session_state['username'] = ''
-if 'role' not in st.session_state:
-    st.session_state['role'] = ''
-
-if not st.session_state['logged_in']:
-    login_page()
-    st.stop()
-
-st.sidebar.title("Electricity Market Platform")
-st.sidebar.write(f"User: {st.session_state['username']} ({st.session_state['role']})")
-if st.sidebar.button("Logout"):
-    st.session_state['logged_in'] = False
-    st.session_state['username'] = ''
-    st.session_state['role'] = ''
-    st.session_state['page'] = 'scenarios'
-    st.session_state['selected_scenario'] = None
-    st.rerun()
-
-if st.session_state['page'] == 'scenarios':
-    scenarios_list_page()
-elif st.session_state['page'] == 'detail':
-    scenario_detail_page()
-elif st.session_state['page'] == 'bidding':
-    bidding_page() 
\ No newline at end of file
+import streamlit as st
+import os
+import json
+import re
+import store
+import db
+import pubsub
+import auth
+import metrics
+import backend
+from scenes import SCENE_TITLES, available_scenes, get_default_params, live_scene_view
+
+# pandas, plotly and pyarrow (export.py) are imported by the pages and scenes that use them,
+# so a rerun of the login or scenario list page does not pay for them.
+
+# ------------------ 数据文件和工具 ------------------
+DATA_DIR = os.environ.get('DATA_DIR', 'data')
+
+def ensure_json_file(filename, default, data_dir=DATA_DIR):
+    path = os.path.join(data_dir, filename)
+    if not os.path.exists(path):
+        with open(path, 'w') as f:
+            json.dump(default, f)
+    return path
+
+TEACHER_USERNAME = 'teacher1'  # 只支持一个教师账号
+
+# 初始化默认用户
+DEFAULT_USERS = [
+    ('teacher1', 'teachpass', 'teacher', 'Teacher One'),
+    ('student1', 'studpass1', 'student', 'Student One'),
+    ('student2', 'studpass2', 'student', 'Student Two'),
+]
+
+# ------------------ 进程级初始化 ------------------
+# Streamlit 每次交互都会从头执行本文件；以下初始化每个服务进程只执行一次
+BOOTSTRAP_VERSION = 1  # bump when bootstrap() changes what it sets up
+
+def _bootstrap_valid(state):
+    """Redo the bootstrap if the data directory was removed under a running server"""
+    return os.path.exists(state['users_file'])
+
+@st.cache_resource(validate=_bootstrap_valid, show_spinner=False)
+def bootstrap(data_dir, state_backend, version):
+    """One-time process setup: data files, storage paths, default users, expiry and side servers"""
+    with metrics.timer('bootstrap'):
+        os.makedirs(data_dir, exist_ok=True)
+        # 多个应用进程/主机共享状态：STATE_BACKEND=redis://host:port（用户、课堂会话、场景、报价和变更通知）
+        pubsub.connect(backend.configure(state_backend))
+        # 用户由 auth.py 管理（内存索引 + 加盐 scrypt 哈希），数据仍保存在 data/users.json
+        users_file = ensure_json_file('users.json', {}, data_dir)
+        auth.USER_DB_FILE = users_file
+        auth.init_default_users(DEFAULT_USERS)
+        # 场景、参与者和报价存储在 SQLite 中；首次启动时导入旧的 data/*.json
+        store.DB_FILE = os.path.join(data_dir, 'market.db')
+        store.import_json_dir(data_dir)
+        db.migrate_legacy_db()
+        # 过期的场景和课堂会话由后台线程按截止时间归档到 cold_storage/
+        store.start_expiry()
+        db.start_expiry()
+        if os.environ.get('METRICS_PORT') and metrics.ENABLED:
+            try:
+                metrics.start_http_server(int(os.environ['METRICS_PORT']))
+            except OSError:
+                pass  # port taken (e.g. by another app process)
+        # JSON bid API (api.py) for scripted bidders, served from this process next to the UI
+        if os.environ.get('API_PORT'):
+            import api
+            try:
+                api.start(int(os.environ['API_PORT']), os.environ.get('API_HOST', '127.0.0.1'))
+            except OSError:
+                pass
+    return {'version': version, 'data_dir': data_dir, 'users_file': users_file}
+
+# ------------------ 页面函数 ------------------
+def login_page():
+    st.title("Login")
+    tab2, tab1 = st.tabs(["Student Enter", "Teacher Login"])
+    with tab2:
+        student_name = st.text_input("Your Name", key="student_name")
+        if st.button("Enter as Student"):
+            if not student_name.strip():
+                st.error("Please enter your name.")
+            else:
+                # 自动添加学生（已存在时不写文件，新学生批量写入）
+                auth.ensure_user(student_name.strip())
+                st.session_state['logged_in'] = True
+                st.session_state['username'] = student_name.strip()
+                st.session_state['role'] = 'student'
+                st.success(f"Welcome, {student_name.strip()}!")
+                st.rerun()
+    with tab1:
+        password = st.text_input("Teacher Password", type="password", key="login_pw")
+        if st.button("Login as Teacher"):
+            # 教师账号与学生一样存放在用户库中 (密码为加盐 scrypt 哈希)
+            ok, role = auth.verify_user(TEACHER_USERNAME, password)
+            if ok and role == 'teacher':
+                st.session_state['logged_in'] = True
+                st.session_state['username'] = TEACHER_USERNAME
+                st.session_state['role'] = 'teacher'
+                st.success("Login successful!")
+                st.rerun()
+            else:
+                st.error("Invalid teacher password.")
+
+def get_market_types():
+    types = ["Single-price Clearing Market", "Pay-as-Bid", "Transmission Constraints", "CMSC", "Locational Pricing", "Fixed Costs", "Cost Recovery Guarantees", "Multi-Interval Optimization", "Planning Risk", "Day-Ahead Market + Two-Settlement"]
+    return types
+
+def scenarios_list_page():
+    st.title("Experiment Scenarios")
+    if st.session_state['role'] == 'teacher':
+        with st.expander("Create New Scenario"):
+            name = st.text_input("Scenario Name")
+            desc = st.text_area("Description")
+            demand = st.number_input("Demand (MW)", min_value=1, value=5, step=1, format="%d")
+            market_types = get_market_types()
+            market_type = st.selectbox("Market Type", market_types)
+            if st.button("Create Scenario"):
+                if not name.strip():
+                    st.error("Scenario Name is required!")
+                else:
+                    store.create_scenario(name, desc, demand, market_type)
+                    st.success("Scenario created!")
+                    st.rerun()
+        with st.expander("Export Results"):
+            st.caption("Writes scenarios, sessions, bids and clearing outcomes as Parquet datasets.")
+            if st.button("Export to Parquet"):
+                import export  # loads pyarrow
+                if export.pa is None:
+                    st.info("Install pyarrow to enable export.")
+                else:
+                    with st.spinner("Exporting..."):
+                        counts = export.export_all()
+                    st.success("Exported " + ", ".join(f"{n} {name}" for name, n in counts.items())
+                               + f" to `{export.EXPORT_DIR}/`")
+    # 场景列表自动刷新：仅在场景数据版本变化时重新查询
+    pubsub.live_panel('scenario_list', 'scenarios', store.list_scenarios, render_scenario_cards)
+
+def render_scenario_cards(scenarios):
+    if not scenarios:
+        st.info("No scenarios available.")
+    else:
+        cols = st.columns(2)
+        for idx, scenario in enumerate(scenarios):
+            with cols[idx % 2]:
+                st.markdown(f"### {scenario['name']}")
+                st.caption(scenario['description'])
+                st.write(f"**Demand:** {scenario['demand']} MW")
+                st.write(f"**Type:** {scenario.get('market_type', 'N/A')}")
+                st.write(f"**Status:** :{'green' if scenario['status']=='active' else 'gray'}[{scenario['status'].capitalize()}]")
+                st.write(f"**Participants:** {scenario.get('participants', 0)}")
+                st.write(f"**Created:** {scenario['created_at']}")
+                # 注入按钮样式，保证等宽等高
+                st.markdown('''
+                <style>
+                .stButton > button {
+                    width: 100% !important;
+                    height: 2.5em !important;
+                    border-radius: 8px !important;
+                    font-weight: 600 !important;
+                    font-size: 1em !important;
+                    margin-bottom: 0.2em !important;
+                }
+                </style>
+                ''', unsafe_allow_html=True)
+                if st.session_state['role'] == 'teacher':
+                    c1, c2, c3 = st.columns(3)
+                else:
+                    c1, c2 = st.columns(2)
+                with c1:
+                    if st.button("Join Scenario", key=f"join_{scenario['id']}"):
+                        st.session_state['page'] = 'bidding'
+                        st.session_state['selected_scenario'] = scenario['id']
+                        join_scenario(scenario['id'])
+                        st.rerun()
+                with c2:
+                    if st.button("View Details", key=f"view_{scenario['id']}"):
+                        st.session_state['page'] = 'detail'
+                        st.session_state['selected_scenario'] = scenario['id']
+                        st.rerun()
+                if st.session_state['role'] == 'teacher':
+                    with c3:
+                        if st.button("Delete", key=f"delete_{scenario['id']}"):
+                            store.delete_scenario(scenario['id'])
+                            st.success("Scenario deleted!")
+                            st.rerun()
+
+def scenario_detail_page():
+    sid = st.session_state.get('selected_scenario')
+    scenario = store.get_scenario(sid)
+    is_participant = store.is_participant(sid, st.session_state['username'])
+    if st.button("← Back"):
+        set_page('scenarios')
+    if not scenario:
+        st.warning("No scenario selected or data not loaded.")
+        return
+    st.header("Scenario Details")
+    st.subheader(scenario['name'])
+    st.caption(scenario.get('description', 'No description provided'))
+    st.write(f"**Demand:** {scenario['demand']} MW")
+    st.write(f"**Status:** :{'green' if scenario['status']=='active' else 'gray'}[{scenario['status'].capitalize()}]")
+    st.write(f"**Market Type:** {scenario.get('market_type', 'N/A')}")
+    st.write(f"**Created:** {scenario['created_at']}")
+    st.write(f"**Participants:** {scenario.get('participants', 0)}")
+    st.write(f"**Experiment Type:** {'Open' if scenario.get('is_open') else 'Class Limited'}")
+    if scenario['status'] == 'active' and not is_participant:
+        if st.button("Join Scenario"):
+            join_scenario(sid)
+    if scenario['status'] == 'active' and is_participant:
+        if st.button("Submit Bids"):
+            set_page('bidding')
+    if scenario['status'] == 'completed':
+        st.button("View Results")
+    # 参与者和报价面板自动刷新：有新的加入或报价时才重新查询
+    pubsub.live_panel(f'scenario_activity_{sid}', f'scenario:{sid}',
+                      lambda: (store.get_participants(sid), store.get_bids(sid), store.get_bid_summary(sid)),
+                      render_scenario_activity)
+
+def render_scenario_activity(data):
+    import pandas as pd
+    participants, bids, summary = data
+    st.markdown("#### Participants")
+    if participants:
+        st.dataframe(pd.DataFrame(participants))
+    else:
+        st.info("No participants yet.")
+    st.markdown("#### Bids Summary")
+    if summary['count']:
+        st.write(f"**Total Bids:** {summary['count']}")
+        st.write(f"**Average Price:** ${summary['mean_price']:.2f}")
+    else:
+        st.info("No bids yet.")
+    st.markdown("#### Recent Bids")
+    if bids:
+        for bid in bids[:5]:
+            st.write(f"{bid['username']} - ${bid['price']} | {bid['quantity']} MW ({bid['bid_type']})")
+    else:
+        st.info("No bids yet.")
+
+def bidding_page():
+    sid = st.session_state.get('selected_scenario')
+    scenario = store.get_scenario(sid)
+    my_bids = store.get_bids(sid, st.session_state['username'])
+    if st.button("← Back"):
+        set_page('scenarios')
+    if not scenario:
+        st.warning("Please select a scenario.")
+        return
+    st.header(f"Bidding for: {scenario['name']}")
+    st.caption(scenario['description'])
+    with st.form("bid_form"):
+        price = st.number_input("Bid Price ($/MWh)", min_value=0, value=0, step=1, format="%d")
+        quantity = st.number_input(
+            "Bid Quantity (MW)",
+            min_value=0,
+            max_value=int(scenario['demand']),
+            value=0,
+            step=1,
+            format="%d"
+        )
+        bid_type = st.selectbox("Bid Type", ["supply", "demand"])
+        submitted = st.form_submit_button("Submit Bid")
+        if submitted:
+            if price == 0 or quantity == 0:
+                st.error("Price and Quantity must both be greater than 0!")
+            else:
+                store.add_bid(sid, st.session_state['username'], price, quantity, bid_type)
+                st.success(f"Bid submitted: ${price}/MWh, {quantity} MW, {bid_type}")
+                st.rerun()
+    st.markdown("#### Scenario Details")
+    st.write(f"**Demand:** {scenario['demand']} MW")
+    st.write(f"**Status:** {scenario['status']}")
+    st.write(f"**Participants:** {scenario.get('participants', 0)}")
+    st.write(f"**Created:** {scenario['created_at']}")
+    st.markdown("#### My Previous Bids")
+    if my_bids:
+        for bid in my_bids:
+            st.write(f"${bid['price']}/MWh - {bid['quantity']} MW ({bid['bid_type']})")
+    else:
+        st.info("No previous bids.")
+
+def classroom_page():
+    st.title("Classroom Session")
+    if st.button("← Back"):
+        set_page('scenarios')
+    username = st.session_state['username']
+    code = st.session_state.get('session_code')
+    if code and not db.session_exists(code):
+        st.session_state['session_code'] = code = None  # 会话已删除或过期归档
+    if st.session_state['role'] == 'teacher':
+        scene_id = st.selectbox("Scene", available_scenes(), format_func=lambda i: SCENE_TITLES.get(i, f"Scene {i}"))
+        if st.button("Start Session"):
+            code = db.create_session(scene_id, get_default_params(scene_id))
+            st.session_state['session_code'] = code
+        if code:
+            st.info(f"Session code: **{code}** (students join with this code)")
+            # 结果面板自动刷新：仅在有学生加入或报价时重新加载
+            live_scene_view(code, 'teacher')
+        return
+    with st.form("join_session_form"):
+        entered = st.text_input("Session Code").strip().upper()
+        if st.form_submit_button("Join Session"):
+            if not entered or not db.session_exists(entered):
+                st.error("Session not found.")
+            # join_session 对已加入的用户同样返回 None (例如退出后重新进入)
+            elif db.join_session(entered, username) is None and not db.get_user_info(entered, username):
+                st.error("This session is closed to new participants.")
+            else:
+                st.session_state['session_code'] = code = entered
+    if not code:
+        return
+    info = db.get_user_info(code, username)
+    st.write(f"**Session:** {code} | **Your MC:** ${info.get('MC', 0):g}/MWh")
+    with st.form("session_bid_form"):
+        price = st.number_input("Offer Price ($/MWh)", min_value=1, value=max(1, int(info.get('price', 1))),
+                                step=1, format="%d")
+        if st.form_submit_button("Submit Offer"):
+            try:
+                accepted = db.submit_bid(code, username, price)
+            except OSError as e:
+                st.error(f"Could not save your offer: {e}")
+            else:
+                if accepted:
+                    st.success(f"Offer submitted: ${price}/MWh")
+                else:
+                    st.error("Offer rejected: the session is closed or you have not joined it.")
+    live_scene_view(code, 'student', username)
+
+def metrics_page():
+    st.title("Performance Metrics")
+    if st.button("← Back"):
+        set_page('scenarios')
+    if not metrics.ENABLED:
+        st.info("Metrics are disabled (METRICS=0).")
+        return
+    import pandas as pd
+    rows = metrics.summary()
+    st.markdown("#### Slowest Operations")
+    if rows:
+        df = pd.DataFrame(rows).set_index('name')
+        st.dataframe(df.style.format({'total_s': '{:.3f}', 'mean_ms': '{:.2f}', 'p50_ms': '{:.2f}',
+                                      'p99_ms': '{:.2f}', 'max_ms': '{:.2f}'}))
+    else:
+        st.info("Nothing recorded yet.")
+    counters = metrics.raw()['counters']
+    if counters:
+        st.markdown("#### Counters")
+        st.dataframe(pd.Series(counters, name='count'))
+    col1, col2, col3 = st.columns(3)
+    col1.download_button("Download JSON", metrics.to_json(), file_name='metrics.json', mime='application/json')
+    col2.download_button("Download Prometheus", metrics.prometheus_text(), file_name='metrics.prom',
+                         mime='text/plain')
+    if col3.button("Reset"):
+        metrics.reset()
+        st.rerun()
+    if os.environ.get('METRICS_PORT'):
+        st.caption(f"Also served at http://127.0.0.1:{os.environ['METRICS_PORT']}/metrics (and /metrics.json).")
+
+# ------------------ 页面切换与主入口 ------------------
+def set_page(page):
+    st.session_state['page'] = page
+    if page == 'scenarios':
+        st.session_state['selected_scenario'] = None
+    st.rerun()
+
+def join_scenario(sid):
+    user = st.session_state['username']
+    if store.is_participant(sid, user):
+        return
+    # 兼容学生未注册的情况
+    full_name, role = auth.profile(user)
+    # 参与人数由 participants 表实时统计，无需回写 scenarios
+    store.add_participant(sid, user, full_name, role)
+
+# ------------------ 主入口 ------------------
+# 场景作业进程 (scenes/jobs.py) 以 __mp_main__ 导入本脚本, 只取函数定义; Streamlit 运行时 __name__ 为 '__main__'
+if __name__ == '__main__':
+    bootstrap(DATA_DIR, os.environ.get('STATE_BACKEND'), BOOTSTRAP_VERSION)
+
+    if 'logged_in' not in st.session_state:
+        st.session_state['logged_in'] = False
+    if 'page' not in st.session_state:
+        st.session_state['page'] = 'scenarios'
+    if 'selected_scenario' not in st.session_state:
+        st.session_state['selected_scenario'] = None
+    if 'username' not in st.session_state:
+        st.session_state['username'] = ''
+    if 'role' not in st.session_state:
+        st.session_state['role'] = ''
+
+    if not st.session_state['logged_in']:
+        login_page()
+        st.stop()
+
+    st.sidebar.title("Electricity Market Platform")
+    st.sidebar.write(f"User: {st.session_state['username']} ({st.session_state['role']})")
+    if st.sidebar.button("Logout"):
+        st.session_state['logged_in'] = False
+        st.session_state['username'] = ''
+        st.session_state['role'] = ''
+        st.session_state['page'] = 'scenarios'
+        st.session_state['selected_scenario'] = None
+        st.session_state['session_code'] = None
+        st.rerun()
+    if st.sidebar.button("Classroom Session"):
+        set_page('session')
+    if st.session_state['role'] == 'teacher' and st.sidebar.button("Performance Metrics"):
+        set_page('metrics')
+
+    # 每个页面的重跑耗时计入 page.<name>
+    with metrics.timer(f"page.{st.session_state['page']}"):
+        if st.session_state['page'] == 'scenarios':
+            scenarios_list_page()
+        elif st.session_state['page'] == 'detail':
+            scenario_detail_page()
+        elif st.session_state['page'] == 'bidding':
+            bidding_page()
+        elif st.session_state['page'] == 'session':
+            classroom_page()
+        elif st.session_state['page'] == 'metrics' and st.session_state['role'] == 'teacher':
+            metrics_page() 
\ No newline at end of file
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# Lightweight timing and counting for hot paths (user/session file I/O, clearing, figure
+# building, page reruns, worker jobs). Timings go into fixed-bucket histograms, so recording
+# is a dictionary lookup and a few additions under a lock. Set METRICS=0 to disable: timed()
+# then returns the function unchanged and timer() a shared no-op context.
+ENABLED = os.environ.get('METRICS', '1') != '0'
+# upper bounds in seconds (Prometheus 'le' buckets); the last bucket is +Inf
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_histograms = {}  # name -> {'count', 'sum', 'max', 'buckets': [per-bucket counts]}
+_counters = {}    # name -> value
+_lock = threading.Lock()
+_NULL = nullcontext()
+_started = time.time()
+
+def _empty():
+    return {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * (len(BUCKETS) + 1)}
+
+def observe(name, seconds):
+    """Record one duration in the histogram `name`"""
+    if not ENABLED:
+        return
+    i = bisect_left(BUCKETS, seconds)
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = _empty()
+        h['count'] += 1
+        h['sum'] += seconds
+        if seconds > h['max']:
+            h['max'] = seconds
+        h['buckets'][i] += 1
+
+def count(name, n=1):
+    """Add n to the counter `name`"""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+@contextmanager
+def _timing(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def timer(name):
+    """Context manager timing its block into the histogram `name` (also when it raises)"""
+    return _timing(name) if ENABLED else _NULL
+
+def timed(name=None):
+    """Decorator timing every call of a function (default name: module.function)"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(label, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+# ------------------ 汇总 ------------------
+def _quantile(h, q):
+    """Estimate a quantile from bucket counts (upper bound of the bucket it falls in, capped at max)"""
+    if not h['count']:
+        return 0.0
+    rank = q * h['count']
+    seen = 0
+    for bound, n in zip(BUCKETS + (h['max'],), h['buckets']):
+        seen += n
+        if seen >= rank:
+            return min(bound, h['max'])
+    return h['max']
+
+def raw():
+    """Copy of the raw histograms and counters (see merge())"""
+    with _lock:
+        return {'histograms': {name: dict(h, buckets=list(h['buckets'])) for name, h in _histograms.items()},
+                'counters': dict(_counters)}
+
+def merge(data):
+    """Add raw() output of another process (e.g. a job worker) to this one"""
+    if not ENABLED or not data:
+        return
+    with _lock:
+        for name, other in data['histograms'].items():
+            h = _histograms.get(name)
+            if h is None:
+                h = _histograms[name] = _empty()
+            h['count'] += other['count']
+            h['sum'] += other['sum']
+            h['max'] = max(h['max'], other['max'])
+            h['buckets'] = [a + b for a, b in zip(h['buckets'], other['buckets'])]
+        for name, value in data['counters'].items():
+            _counters[name] = _counters.get(name, 0) + value
+
+def reset():
+    global _started
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _started = time.time()
+
+def summary():
+    """One row per timed operation, slowest (by total time) first"""
+    rows = []
+    for name, h in raw()['histograms'].items():
+        if h['count']:
+            rows.append({'name': name, 'count': h['count'], 'total_s': h['sum'],
+                         'mean_ms': 1000 * h['sum'] / h['count'], 'p50_ms': 1000 * _quantile(h, 0.5),
+                         'p99_ms': 1000 * _quantile(h, 0.99), 'max_ms': 1000 * h['max']})
+    return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+def to_json():
+    return json.dumps({'enabled': ENABLED, 'since': _started, 'operations': summary(),
+                       'counters': raw()['counters']}, indent=2)
+
+def _metric_name(name):
+    return 'elec_' + ''.join(c if c.isalnum() else '_' for c in name)
+
+def prometheus_text():
+    """Metrics in the Prometheus text exposition format"""
+    data = raw()
+    lines = []
+    for name, h in sorted(data['histograms'].items()):
+        metric = _metric_name(name) + '_seconds'
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h['buckets']):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {h["count"]}')
+        lines.append(f"{metric}_sum {h['sum']}")
+        lines.append(f"{metric}_count {h['count']}")
+    for name, value in sorted(data['counters'].items()):
+        metric = _metric_name(name) + '_total'
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return '\n'.join(lines) + '\n'
+
+# ------------------ HTTP 导出 ------------------
+_server = None
+
+def start_http_server(port, host='127.0.0.1'):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread; idempotent"""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    with _lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics.json'):
+                    body, content_type = to_json(), 'application/json'
+                elif self.path.startswith('/metrics'):
+                    body, content_type = prometheus_text(), 'text/plain; version=0.0.4'
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+        return _server
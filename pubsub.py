@@ -0,0 +1,98 @@
+import json
+import threading
+import uuid
+from collections import defaultdict
+
+# In-process change notification: every write publishes to a channel ('scenarios',
+# 'scenario:<id>', 'session:<code>'), bumping its version counter. Pages poll the counter
+# (a dictionary lookup) and only reload data when it has moved. Writes from processes that
+# are not bridged (e.g. a standalone `python api.py`) never publish here, so the stores also
+# register a source per channel prefix that reports the version persisted with their data.
+REFRESH_SECONDS = 2
+# With a shared state backend (backend.py), publishes are relayed to the other app workers
+BRIDGE_CHANNEL = 'pubsub'
+
+_versions = defaultdict(int)
+_subscribers = defaultdict(list)
+_changed = threading.Condition()
+_bridge = {'backend': None, 'origin': uuid.uuid4().hex}
+_sources = {}  # channel prefix -> fn(channel) returning the stored version of its data
+
+def publish(channel):
+    """Bump a channel's version and notify its subscribers (in every worker, when bridged)"""
+    shared = _bridge['backend']
+    if shared is not None:
+        shared.publish(BRIDGE_CHANNEL, json.dumps({'channel': channel, 'origin': _bridge['origin']}))
+    return _publish_local(channel)
+
+def _publish_local(channel):
+    with _changed:
+        _versions[channel] += 1
+        version = _versions[channel]
+        callbacks = list(_subscribers.get(channel, ()))
+        _changed.notify_all()
+    for callback in callbacks:
+        callback(channel, version)
+    return version
+
+def connect(shared):
+    """Relay publishes to and from other workers through a shared backend (idempotent)"""
+    if shared is None or _bridge['backend'] is shared:
+        return
+    _bridge['backend'] = shared
+    shared.subscribe(BRIDGE_CHANNEL, _on_remote)
+
+def _on_remote(_, message):
+    data = json.loads(message)
+    if data['origin'] != _bridge['origin']:
+        _publish_local(data['channel'])
+
+def version(channel):
+    return _versions.get(channel, 0)
+
+def add_source(prefix, fn):
+    """Register fn(channel) -> version of the stored data, for channels starting with prefix"""
+    _sources[prefix] = fn
+
+def stamp(channel):
+    """Version of a channel that also moves on writes made by other, unbridged processes"""
+    for prefix, fn in _sources.items():
+        if channel.startswith(prefix):
+            return version(channel), fn(channel)
+    return version(channel), None
+
+def subscribe(channel, callback):
+    """Call callback(channel, version) after every publish; returns an unsubscribe function"""
+    with _changed:
+        _subscribers[channel].append(callback)
+    def unsubscribe():
+        with _changed:
+            if callback in _subscribers.get(channel, []):
+                _subscribers[channel].remove(callback)
+    return unsubscribe
+
+def wait_for_change(channel, since, timeout=None):
+    """Block until the channel's version differs from `since`; returns the current version"""
+    with _changed:
+        _changed.wait_for(lambda: _versions.get(channel, 0) != since, timeout)
+        return _versions.get(channel, 0)
+
+def live_panel(key, channel, load, render, run_every=None):
+    """Render a Streamlit fragment that re-runs on its own every few seconds.
+
+    load() is only called when the channel's stamp() changed since this browser session last
+    loaded it; otherwise render() is fed the data kept in st.session_state, so an idle
+    client costs a version lookup per tick.
+    """
+    import streamlit as st
+
+    @st.fragment(run_every=run_every or REFRESH_SECONDS)
+    def panel():
+        current = stamp(channel)
+        cached = st.session_state.get(key)
+        if cached is None or cached[0] != current:
+            cached = (current, load())
+            st.session_state[key] = cached
+        render(cached[1])
+
+    panel()
@@ -1,27 +1,111 @@
-try:
-    from . import scene1
-    SCENE1_AVAILABLE = True
-except ImportError:
-    SCENE1_AVAILABLE = False
+import importlib
+import pkgutil
+import re
+import threading
+import time
+from importlib import metadata
+
+# Scene registry: scene modules (and their pandas/plotly/scipy imports) are only loaded the
+# first time a scene is used. Built-in scenes are discovered from the scene<N>.py file names;
+# external packages can add scenes through the "elec_trading_sim.scenes" entry-point group
+# (entry point name = scene id, value = module path).
+ENTRY_POINT_GROUP = "elec_trading_sim.scenes"
 
 SCENE_TITLES = {
     1: "Single-price Clearing Market",
     # 2: "Pay-as-Bid Market",
+    3: "Transmission Constraints",
+    4: "CMSC",
+    5: "Locational Pricing",
+    6: "Fixed Costs",
+    7: "Cost Recovery Guarantees",
+    8: "Multi-Interval Optimization",
+    9: "Planning Risk",
+    10: "Day-Ahead Market + Two-Settlement",
     # ... add more as needed
 }
 
+_registry = {}      # scene id -> module path, not imported yet
+_modules = {}       # scene id -> imported module (None if its dependencies are missing)
+_import_times = {}  # scene id -> seconds spent importing
+_lock = threading.RLock()
+_discovered = False
+
+def register_scene(scene_id, module_path, title=None):
+    """Register a scene without importing it"""
+    with _lock:
+        _registry[scene_id] = module_path
+        _modules.pop(scene_id, None)
+        if title:
+            SCENE_TITLES[scene_id] = title
+
+def _discover():
+    global _discovered
+    if _discovered:
+        return
+    for info in pkgutil.iter_modules(__path__):
+        match = re.fullmatch(r'scene(\d+)', info.name)
+        if match:
+            _registry.setdefault(int(match.group(1)), f'{__name__}.{info.name}')
+    try:
+        for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+            _registry.setdefault(int(entry_point.name), entry_point.value)
+    except (TypeError, ValueError):
+        pass
+    _discovered = True
+
+def available_scenes():
+    """Ids of all registered scenes (nothing is imported)"""
+    with _lock:
+        _discover()
+        return sorted(_registry)
+
+def get_scene_module(scene_id):
+    with _lock:
+        _discover()
+        if scene_id in _modules:
+            return _modules[scene_id]
+        module_path = _registry.get(scene_id)
+        if module_path is None:
+            return None
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(module_path)
+        except ImportError:  # optional dependency missing
+            module = None
+        _import_times[scene_id] = time.perf_counter() - start
+        _modules[scene_id] = module
+        return module
+
 def get_default_params(scene_id):
-    if scene_id == 1 and SCENE1_AVAILABLE:
-        return scene1.default_params.copy()
-    # elif scene_id == 2:
-    #     return scene2.default_params.copy()
-    # ...
+    module = get_scene_module(scene_id)
+    if module is not None:
+        return module.default_params.copy()
     return {}
 
-def get_scene_module(scene_id):
-    if scene_id == 1 and SCENE1_AVAILABLE:
-        return scene1
-    # elif scene_id == 2:
-    #     return scene2
-    # ...
-    return None 
\ No newline at end of file
+def get_import_times():
+    """Seconds spent importing each scene loaded so far (for cold-start diagnostics)"""
+    with _lock:
+        return dict(_import_times)
+
+def live_scene_view(session_code, role, username=None):
+    """Teacher/student result panel that only reloads when the session's joins or bids change"""
+    import db
+    import pubsub
+
+    def load():
+        params = db.get_session_params(session_code)
+        user_info = db.get_user_info(session_code, username) | {'username': username} if username else None
+        return params, db.get_bid_table(session_code), user_info
+
+    def render(data):
+        params, bids, user_info = data
+        module = get_scene_module(params['scene_id']) if params else None
+        if module is None:
+            return
+        if role == 'teacher':
+            module.teacher_view(params, bids, session_code)
+        else:
+            module.student_view(params, bids, user_info, session_code)
+
+    pubsub.live_panel(f'scene_view_{session_code}_{role}', f'session:{session_code}', load, render)
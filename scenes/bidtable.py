@@ -0,0 +1,144 @@
+import sys
+import hashlib
+import threading
+from collections.abc import Mapping
+import numpy as np
+
+# Columnar bid table for large classes and simulated markets: one row per participant in a
+# NumPy structured array (29 bytes a row instead of a dict per bid), with usernames interned
+# once per process and stored as int32 ids. BidRecord is a __slots__ view of one row that reads
+# like the bid dicts scenes already use (b['price'], b.get('quantity', 1), 'price' in b);
+# clearing code and pandas take whole columns as array views instead of building dicts.
+DTYPE = np.dtype([('user', 'i4'), ('MC', 'f8'), ('price', 'f8'), ('quantity', 'f8'), ('bid_submitted', '?')])
+FIELDS = ('MC', 'price', 'quantity', 'bid_submitted')
+OPTIONAL = ('price', 'quantity')  # NaN = not given: the record then has no such key
+
+_names = []  # username per id, in this process
+_ids = {}    # username -> id
+_lock = threading.Lock()
+
+def intern_names(usernames):
+    """int32 ids of usernames in this process's name pool (new names are added)"""
+    with _lock:
+        ids = np.empty(len(usernames), dtype='i4')
+        for i, name in enumerate(usernames):
+            uid = _ids.get(name)
+            if uid is None:
+                uid = _ids[name] = len(_names)
+                _names.append(sys.intern(name))
+            ids[i] = uid
+        return ids
+
+class BidRecord(Mapping):
+    """Read-only view of one row; only the fields a bid dict would have are present"""
+    __slots__ = ('_rows', '_row')
+
+    def __init__(self, rows, row):
+        self._rows = rows
+        self._row = row
+
+    def __getitem__(self, key):
+        if key == 'username':
+            return _names[self._rows['user'][self._row]]
+        if key not in FIELDS:
+            raise KeyError(key)
+        value = self._rows[key][self._row].item()
+        if key in OPTIONAL and value != value:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        if key == 'username':
+            return True
+        if key in OPTIONAL:
+            return not np.isnan(self._rows[key][self._row])
+        return key in FIELDS
+
+    def __iter__(self):
+        yield 'username'
+        yield from (name for name in FIELDS if name in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __or__(self, other):
+        return dict(self) | dict(other)
+
+    def __repr__(self):
+        return f'BidRecord({dict(self)!r})'
+
+class BidTable:
+    """Bids of one session as a structured array (read-only; a new table replaces it on change)"""
+    __slots__ = ('rows',)
+
+    def __init__(self, rows):
+        rows.flags.writeable = False
+        self.rows = rows
+
+    @classmethod
+    def from_bids(cls, bids):
+        """Table from bid dicts ({'username', 'MC', 'price'?, 'quantity'?, 'bid_submitted'})"""
+        bids = list(bids)
+        rows = np.empty(len(bids), dtype=DTYPE)
+        rows['user'] = intern_names([b['username'] for b in bids])
+        for name in FIELDS:
+            missing = False if name == 'bid_submitted' else np.nan
+            rows[name] = [b.get(name, missing) for b in bids]
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return BidRecord(self.rows, range(len(self.rows))[i])
+
+    def __iter__(self):
+        return (BidRecord(self.rows, i) for i in range(len(self.rows)))
+
+    @property
+    def usernames(self):
+        return np.array([_names[i] for i in self.rows['user']], dtype=object)
+
+    def column(self, name):
+        """One field as an array view (no copy)"""
+        return self.usernames if name == 'username' else self.rows[name]
+
+    def submitted(self):
+        """True once every participant has a price"""
+        return len(self.rows) > 0 and not np.isnan(self.rows['price']).any()
+
+    def to_frame(self):
+        """DataFrame over the columns; optional fields nobody set are left out, as with dicts"""
+        import pandas as pd
+        columns = {'username': self.usernames}
+        for name in FIELDS:
+            if name not in OPTIONAL or not np.isnan(self.rows[name]).all():
+                columns[name] = self.rows[name]
+        return pd.DataFrame(columns, copy=False)
+
+    def to_dicts(self):
+        return [dict(record) for record in self]
+
+    def digest(self):
+        """Content hash for cache keys (usernames, not process-local ids)"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update('\0'.join(self.usernames).encode())
+        for name in FIELDS:
+            h.update(self.rows[name].tobytes())
+        return h.hexdigest()
+
+    def __reduce__(self):
+        # user ids are only meaningful in this process: ship the names (e.g. to worker processes)
+        return _rebuild, (self.usernames.tolist(), self.rows)
+
+def _rebuild(usernames, rows):
+    rows = rows.copy()
+    rows['user'] = intern_names(usernames)
+    return BidTable(rows)
+
+def frame(bids):
+    """DataFrame of a BidTable (column views) or of a list of bid dicts"""
+    if isinstance(bids, BidTable):
+        return bids.to_frame()
+    import pandas as pd
+    return pd.DataFrame(bids)
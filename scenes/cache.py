@@ -0,0 +1,83 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Process-wide LRU cache of clearing results and figures, shared by every Streamlit session.
+# Keys are (session code, bid-set hash, params hash, kind); db.py invalidates a session on writes.
+MAX_ENTRIES = 256
+
+_entries = OrderedDict()
+_inflight = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+def _digest(obj):
+    payload = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def make_key(session_code, bids, params, kind='clearing'):
+    bids_digest = bids.digest() if hasattr(bids, 'digest') else _digest(bids)  # BidTable hashes its arrays
+    return (session_code, bids_digest, _digest(params), kind)
+
+def get_or_compute(key, compute):
+    """Return the cached value for key, computing it once even if several reruns miss together"""
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return _entries[key]
+        key_lock = _inflight.setdefault(key, threading.Lock())
+    with key_lock:
+        with _lock:
+            if key in _entries:
+                _entries.move_to_end(key)
+                _stats['hits'] += 1
+                return _entries[key]
+            _stats['misses'] += 1
+        try:
+            value = compute()
+        except BaseException:
+            with _lock:
+                _inflight.pop(key, None)
+            raise
+        # store before dropping the in-flight lock: a caller arriving in between finds one or the other
+        with _lock:
+            _entries[key] = value
+            _inflight.pop(key, None)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+                _stats['evictions'] += 1
+    return value
+
+def lookup(key):
+    """(True, value) if key is cached, else (False, None)"""
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return True, _entries[key]
+    return False, None
+
+def put(key, value):
+    """Store a value computed elsewhere (e.g. by a worker process)"""
+    with _lock:
+        _entries[key] = value
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats['evictions'] += 1
+
+def invalidate(session_code):
+    """Drop every cached entry of a session (called after joins and bids)"""
+    with _lock:
+        for key in [k for k in _entries if k[0] == session_code]:
+            del _entries[key]
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries))
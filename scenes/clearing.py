@@ -0,0 +1,152 @@
+import numpy as np
+import metrics
+
+# Pure market clearing engine (no Streamlit / pandas), shared by the scene views.
+# All inputs are NumPy arrays; every result array is in the caller's original order.
+
+def _fill(sorted_price, sorted_qty, target):
+    """Dispatch `target` MW along a merit order; offers tied at the boundary price share pro rata.
+
+    Returns (dispatch in sorted order, index of the first tied boundary offer or -1).
+    """
+    n = len(sorted_qty)
+    dispatch = np.zeros(n)
+    if n == 0 or target <= 0:
+        return dispatch, -1
+    cum = np.cumsum(sorted_qty)
+    k = min(int(np.searchsorted(cum, target, side='left')), n - 1)
+    boundary = sorted_price[k]
+    lo = int(np.searchsorted(sorted_price, boundary, side='left'))
+    hi = int(np.searchsorted(sorted_price, boundary, side='right'))
+    dispatch[:lo] = sorted_qty[:lo]
+    residual = min(target, cum[-1]) - (cum[lo - 1] if lo > 0 else 0.0)
+    tied = sorted_qty[lo:hi]
+    total = tied.sum()
+    if total > 0:
+        dispatch[lo:hi] = tied * (residual / total)
+    return dispatch, lo
+
+def _unsort(order, sorted_values):
+    values = np.empty_like(sorted_values)
+    values[order] = sorted_values
+    return values
+
+@metrics.timed('clearing.clear_market')
+def clear_market(supply_price, supply_quantity, supply_mc, demand_quantity,
+                 demand_price=None, demand_value=None):
+    """Clear a single-price (uniform MCP) market in O(n log n).
+
+    supply_price / supply_quantity / supply_mc: one entry per supply offer.
+    demand_quantity: a scalar for inelastic demand, or one entry per demand bid
+    together with demand_price (and optionally demand_value for consumer surplus).
+
+    The MCP is the offer price of the marginal (last dispatched) seller. Offers tied
+    at the MCP are dispatched pro rata. If supply cannot cover inelastic demand,
+    every offer is dispatched and 'mcp' is None.
+    """
+    supply_price = np.asarray(supply_price, dtype=float)
+    supply_quantity = np.asarray(supply_quantity, dtype=float)
+    supply_mc = np.asarray(supply_mc, dtype=float)
+    order = np.argsort(supply_price, kind='stable')
+    sorted_price = supply_price[order]
+    sorted_qty = supply_quantity[order]
+    cum_supply = np.cumsum(sorted_qty)
+    total_supply = cum_supply[-1] if len(cum_supply) else 0.0
+
+    elastic = demand_price is not None
+    if elastic:
+        demand_price = np.asarray(demand_price, dtype=float)
+        demand_quantity = np.asarray(demand_quantity, dtype=float)
+        demand_order = np.argsort(-demand_price, kind='stable')
+        sorted_bid = demand_price[demand_order]
+        cum_demand = np.cumsum(demand_quantity[demand_order])
+        # demand willing to pay at least each offer's price (bids sorted descending)
+        n_willing = np.searchsorted(-sorted_bid, -sorted_price, side='right')
+        demand_at = np.concatenate([[0.0], cum_demand])[n_willing]
+        # accepted offers form a prefix of the merit order: demand still exceeds supply before them
+        accepted = int(np.count_nonzero(demand_at > cum_supply - sorted_qty))
+        target = float(min(cum_supply[accepted - 1], demand_at[accepted - 1])) if accepted else 0.0
+        sufficient = True
+    else:
+        target = float(demand_quantity)
+        sufficient = total_supply >= target
+
+    sorted_dispatch, lo = _fill(sorted_price, sorted_qty, target)
+    if lo >= 0 and sufficient:
+        mcp = float(sorted_price[lo])
+        marginal_index = int(order[lo])
+    else:
+        mcp = None
+        marginal_index = -1
+
+    supply_dispatch = _unsort(order, sorted_dispatch)
+    result = {
+        'mcp': mcp,
+        'cleared_quantity': float(sorted_dispatch.sum()),
+        'sufficient': bool(sufficient),
+        'order': order,
+        'cum_supply': cum_supply,
+        'marginal_index': marginal_index,
+        'supply_dispatch': supply_dispatch,
+        'supply_profit': supply_dispatch * (mcp - supply_mc) + 0.0 if mcp is not None else np.zeros(len(supply_dispatch)),
+    }
+    if elastic:
+        sorted_demand, _ = _fill(-sorted_bid, demand_quantity[demand_order], result['cleared_quantity'])
+        demand_dispatch = _unsort(demand_order, sorted_demand)
+        result['demand_dispatch'] = demand_dispatch
+        if demand_value is not None and mcp is not None:
+            result['demand_surplus'] = demand_dispatch * (np.asarray(demand_value, dtype=float) - mcp)
+    result['consumer_cost'] = result['cleared_quantity'] * mcp if mcp is not None else None
+    return result
+
+def clear_pay_as_bid(supply_price, supply_quantity, supply_mc, demand_quantity):
+    """Pay-as-Bid variant: same dispatch as clear_market, but each seller is paid its own offer"""
+    result = clear_market(supply_price, supply_quantity, supply_mc, demand_quantity)
+    supply_price = np.asarray(supply_price, dtype=float)
+    payment = result['supply_dispatch'] * supply_price
+    result['supply_profit'] = payment - result['supply_dispatch'] * np.asarray(supply_mc, dtype=float) + 0.0
+    result['consumer_cost'] = float(payment.sum())
+    cleared = result['cleared_quantity']
+    result['average_price'] = result['consumer_cost'] / cleared if cleared > 0 else None
+    return result
+
+@metrics.timed('clearing.clear_batch')
+def clear_batch(price, quantity, mc, demand, pricing='uniform'):
+    """Clear many independent rounds at once (inelastic demand).
+
+    price: (rounds, sellers) offers; quantity and mc broadcast to that shape; demand: (rounds,).
+    pricing: 'uniform' (single MCP) or 'pay_as_bid'. Rounds without enough supply get MCP NaN
+    and dispatch every offer; rounds with no positive demand get MCP NaN and dispatch nothing
+    (clear_market's None). Returns mcp, dispatch, profit and consumer_cost arrays.
+    """
+    price = np.atleast_2d(np.asarray(price, dtype=float))
+    quantity = np.broadcast_to(np.asarray(quantity, dtype=float), price.shape)
+    mc = np.broadcast_to(np.asarray(mc, dtype=float), price.shape)
+    demand = np.broadcast_to(np.asarray(demand, dtype=float), price.shape[:1])
+    order = np.argsort(price, axis=1, kind='stable')
+    sorted_price = np.take_along_axis(price, order, axis=1)
+    cum = np.cumsum(np.take_along_axis(quantity, order, axis=1), axis=1)
+    # index of the marginal offer: first position whose cumulative supply covers demand
+    k = np.count_nonzero(cum < demand[:, None], axis=1)
+    sufficient = k < price.shape[1]
+    active = demand > 0
+    priced = sufficient & active
+    mcp = np.where(priced, sorted_price[np.arange(len(k)), np.minimum(k, price.shape[1] - 1)], np.nan)
+    # dispatch in the original order: below-MCP offers in full, MCP ties share the residual
+    below = price < mcp[:, None]
+    tied = price == mcp[:, None]
+    residual = demand - (quantity * below).sum(axis=1)
+    tied_total = (quantity * tied).sum(axis=1)
+    share = np.divide(residual, tied_total, out=np.zeros_like(residual), where=tied_total > 0)
+    dispatch = quantity * below + quantity * tied * share[:, None]
+    dispatch = np.where(sufficient[:, None], dispatch, quantity)
+    dispatch = np.where(active[:, None], dispatch, 0.0)
+    paid = price if pricing == 'pay_as_bid' else np.where(priced, mcp, 0.0)[:, None]
+    profit = dispatch * (paid - mc) + 0.0
+    return {
+        'mcp': mcp,
+        'dispatch': dispatch,
+        'profit': profit,
+        'consumer_cost': (dispatch * paid).sum(axis=1),
+        'sufficient': sufficient,
+    }
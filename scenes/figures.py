@@ -0,0 +1,142 @@
+import hashlib
+import numpy as np
+import plotly.graph_objs as go
+import plotly.io as pio
+import metrics
+from . import cache
+
+# Figure builders that keep chart payloads small for large classes and simulations:
+# offers at the same price become one vertex of a step curve, long curves are downsampled
+# (keeping full detail around the clearing point), big series use WebGL traces, and
+# histograms are binned here instead of shipping every sample to the browser.
+# Builders return figure JSON, cached under a digest of their inputs; use from_json() to show it.
+MAX_POINTS = 1000    # curve vertices kept after downsampling
+WEBGL_POINTS = 500   # use Scattergl above this many vertices
+MAX_BARS = 60        # per-seller bars; larger classes get a profit distribution instead
+HIST_BINS = 60
+
+def _digest(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            h.update(str(part.dtype).encode() + str(part.shape).encode())
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+def _cached(kind, build, *parts):
+    def timed_build():
+        with metrics.timer(f'figure.{kind}'):
+            return build()
+    return cache.get_or_compute((None, _digest(*parts), kind, 'figure'), timed_build)
+
+def from_json(text):
+    """Figure for st.plotly_chart from builder output (skips re-validating every trace)"""
+    return pio.from_json(text, skip_invalid=True)
+
+def step_curve(price, quantity, descending=False):
+    """Vertices (x, y) of a supply (or descending demand) step curve, one per distinct price.
+
+    Plot with line_shape='hv': level i spans x[i]..x[i+1] at price y[i].
+    """
+    price = np.asarray(price, dtype=float)
+    quantity = np.broadcast_to(np.asarray(quantity, dtype=float), price.shape)
+    order = np.argsort(-price if descending else price, kind='stable')
+    sorted_price, sorted_qty = price[order], quantity[order]
+    if len(sorted_price) == 0:
+        return np.zeros(1), np.zeros(1)
+    start = np.flatnonzero(np.r_[True, sorted_price[1:] != sorted_price[:-1]])
+    levels = sorted_price[start]
+    totals = np.add.reduceat(sorted_qty, start)
+    x = np.concatenate([[0.0], np.cumsum(totals)])
+    y = np.concatenate([levels, levels[-1:]])
+    return x, y
+
+def downsample(x, y, max_points=MAX_POINTS, keep_x=None, window=3):
+    """Level-of-detail reduction of a step curve: keep the last vertex in each of max_points
+    equal-width quantity buckets, plus every vertex within `window` of keep_x (e.g. demand)"""
+    n = len(x)
+    if n <= max_points:
+        return x, y
+    edges = np.linspace(x[0], x[-1], max_points)
+    keep = [np.array([0, n - 1]), np.searchsorted(x, edges, side='right') - 1]
+    if keep_x is not None:
+        at = int(np.searchsorted(x, keep_x))
+        keep.append(np.arange(max(0, at - window), min(n, at + window + 1)))
+    idx = np.unique(np.clip(np.concatenate(keep), 0, n - 1))
+    return x[idx], y[idx]
+
+def _scatter(n):
+    return go.Scattergl if n > WEBGL_POINTS else go.Scatter
+
+def supply_curve_json(price, quantity, demand, mcp, cleared_quantity=None, demand_price=None,
+                      demand_quantity=None, title='Supply Curve and MCP'):
+    """Step supply curve with the demand line (or demand step curve) and the MCP marker"""
+    price = np.asarray(price, dtype=float)
+    quantity = np.broadcast_to(np.asarray(quantity, dtype=float), price.shape)
+    elastic = demand_price is not None
+
+    def build():
+        x, y = step_curve(price, quantity)
+        x, y = downsample(x, y, keep_x=None if elastic else demand)
+        fig = go.Figure()
+        fig.add_trace(_scatter(len(x))(x=x, y=y, mode='lines', line_shape='hv', name='Supply Curve'))
+        if elastic:
+            dx, dy = step_curve(demand_price, demand_quantity, descending=True)
+            dx, dy = downsample(dx, dy)
+            fig.add_trace(_scatter(len(dx))(x=dx, y=dy, mode='lines', line_shape='hv', name='Demand Curve'))
+        else:
+            top = float(y.max()) if len(price) else 0.0
+            fig.add_trace(go.Scatter(x=[demand, demand], y=[0, top], mode='lines', line=dict(dash='dash'),
+                                     name='Demand'))
+        if mcp is not None:
+            x_mcp = demand if cleared_quantity is None else cleared_quantity
+            fig.add_trace(go.Scatter(x=[x_mcp], y=[mcp], mode='markers', marker=dict(color='red', size=12),
+                                     name='MCP'))
+        fig.update_layout(xaxis_title='Cumulative Supply (MW)', yaxis_title='Price ($)', title=title)
+        return fig.to_json()
+
+    extra = (np.asarray(demand_price, dtype=float), np.asarray(demand_quantity, dtype=float)) if elastic else ()
+    return _cached('supply', build, price, np.ascontiguousarray(quantity), demand, mcp, cleared_quantity,
+                   title, *extra)
+
+def seller_profit_json(usernames, profit, mc, title='Seller Profit and MC'):
+    """Grouped profit/MC bars per seller, or a profit histogram for large classes"""
+    usernames = np.asarray(usernames, dtype=str)
+    profit = np.asarray(profit, dtype=float)
+    mc = np.asarray(mc, dtype=float)
+
+    def build():
+        fig = go.Figure()
+        if len(profit) <= MAX_BARS:
+            fig.add_trace(go.Bar(x=usernames, y=profit, name='Profit'))
+            fig.add_trace(go.Bar(x=usernames, y=mc, name='MC'))
+            fig.update_layout(barmode='group', xaxis_title='Seller', yaxis_title='Amount ($)', title=title)
+        else:
+            counts, edges = np.histogram(profit, bins=HIST_BINS)
+            fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name='Sellers'))
+            fig.update_layout(xaxis_title='Profit ($)', yaxis_title='Sellers',
+                              title=f'{title}: profit distribution of {len(profit)} sellers')
+        return fig.to_json()
+
+    return _cached('sellers', build, usernames, profit, mc, title)
+
+def histogram_json(series, xaxis_title, yaxis_title, title, bins=HIST_BINS):
+    """Overlaid histograms of {label: samples}, binned here on shared edges"""
+    series = {label: np.asarray(values, dtype=float).ravel() for label, values in series.items()}
+
+    def build():
+        finite = [v[np.isfinite(v)] for v in series.values()]
+        values = np.concatenate(finite) if finite else np.zeros(0)
+        edges = np.histogram_bin_edges(values if len(values) else [0.0], bins=bins)
+        fig = go.Figure()
+        for label, v in series.items():
+            counts, _ = np.histogram(v[np.isfinite(v)], bins=edges)
+            fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                                 name=label, opacity=0.6))
+        fig.update_layout(barmode='overlay', xaxis_title=xaxis_title, yaxis_title=yaxis_title, title=title)
+        return fig.to_json()
+
+    return _cached('histogram', build, *series.keys(), *series.values(), xaxis_title, title, bins)
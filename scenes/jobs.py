@@ -0,0 +1,232 @@
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+from . import cache, worker
+
+# Worker-process pool for clearing, solver and chart jobs, so a long solve never runs on
+# (or holds the GIL of) a Streamlit script thread. Jobs get ids, a timeout and can be
+# cancelled; a finished result is stored in the scene cache under the job's key, and every
+# view asking for the same key shares one job. Views poll with await_job().
+WORKERS = int(os.environ.get('SCENE_JOB_WORKERS', 0)) or max(1, (os.cpu_count() or 2) - 1)
+DEFAULT_TIMEOUT = 120  # seconds
+POLL_SECONDS = 0.5
+INLINE_WAIT = 0.25  # wait this long before showing progress, so quick jobs render in one pass
+JOB_TTL = 600  # finished job records are forgotten after this many seconds
+PRELOAD = ['scenes.worker', 'scenes.scene1', 'scenes.scene3', 'scenes.scene6', 'scenes.scene9']  # job functions
+
+_jobs = {}    # job id -> record
+_by_key = {}  # cache key -> id of the latest job for it
+_lock = threading.RLock()
+_ids = itertools.count(1)
+_pool = None
+_pids = None  # queue the current pool's workers put their pids on
+_abandoned = 0  # jobs given up on (timeout/cancel) while a worker may still be running them
+
+def _context():
+    # never fork the (multithreaded) app process itself: a lock held by another thread at fork
+    # time stays locked in the child. Workers are forked from a forkserver that preloads the job
+    # modules (spawn where there is none); they import the app script as __mp_main__, which
+    # main.py guards with `if __name__ == '__main__'` so only its definitions are loaded
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(PRELOAD)
+        return context
+    return multiprocessing.get_context('spawn')
+
+def _get_pool():
+    global _pool, _pids
+    with _lock:
+        if _pool is None:
+            context = _context()
+            _pids = context.SimpleQueue()
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context,
+                                        initializer=worker.init, initargs=(_pids,))
+        return _pool
+
+def _restart_pool():
+    """Replace the pool, killing workers that are stuck on abandoned jobs"""
+    global _pool, _abandoned
+    with _lock:
+        pool, pids, _pool, _abandoned = _pool, _pids, None, 0
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+        while not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except ProcessLookupError:
+                pass  # already gone
+
+def _finish(job_id, future):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job['state'] not in ('pending', 'running'):
+            return  # cancelled or timed out: the late result is dropped
+        job['finished'] = time.time()
+        if future.cancelled():
+            job['state'] = 'cancelled'
+            return
+        metrics.observe(f"job.{job['name']}", job['finished'] - job['submitted'])
+        error = future.exception()
+        if error is not None:
+            job['state'], job['error'] = 'failed', f"{type(error).__name__}: {error}"
+            metrics.count('job.failed')
+            return
+        job['state'], (job['result'], worker_metrics) = 'done', future.result()
+        metrics.merge(worker_metrics)
+    if job['key'] is not None:
+        cache.put(job['key'], job['result'])
+
+def _prune():
+    now = time.time()
+    for job_id in [j for j, job in _jobs.items() if job['finished'] and now - job['finished'] > JOB_TTL]:
+        job = _jobs.pop(job_id)
+        if _by_key.get(job['key']) == job_id:
+            del _by_key[job['key']]
+
+def submit(fn, *args, key=None, timeout=DEFAULT_TIMEOUT):
+    """Run fn(*args) in the worker pool and return a job id.
+
+    With a key, a cached result completes the job at once, and while a job for the key is
+    known (running, finished, cancelled or failed) its id is returned instead of starting a
+    new one; call forget() to allow a retry. fn and args must be picklable.
+    """
+    hit, value = cache.lookup(key) if key is not None else (False, None)
+    with _lock:
+        _prune()
+        job_id = _by_key.get(key) if key is not None else None
+        if job_id is not None and (_jobs[job_id]['state'] != 'done' or hit):
+            return job_id
+        job_id = next(_ids)
+        now = time.time()
+        job = {'id': job_id, 'key': key, 'name': getattr(fn, '__name__', 'job'),
+               'state': 'done' if hit else 'pending', 'result': value, 'error': None,
+               'submitted': now, 'finished': now if hit else None, 'timeout': timeout, 'future': None}
+        _jobs[job_id] = job
+        if key is not None:
+            _by_key[key] = job_id
+        if hit:
+            return job_id
+        try:
+            job['future'] = _get_pool().submit(worker.run_job, fn, args)
+        except BrokenProcessPool:  # a worker died (e.g. killed for memory): start a fresh pool
+            _restart_pool()
+            job['future'] = _get_pool().submit(worker.run_job, fn, args)
+    job['future'].add_done_callback(lambda future: _finish(job_id, future))
+    return job_id
+
+def _give_up(job, state):
+    global _abandoned
+    job['state'], job['finished'] = state, time.time()
+    metrics.count(f'job.{state}')
+    if not job['future'].cancel():
+        _abandoned += 1  # already running in a worker: it cannot be interrupted there
+        if _abandoned >= WORKERS:
+            _restart_pool()
+
+def status(job_id):
+    """Job state ('pending', 'running', 'done', 'failed', 'cancelled', 'timeout'), result, error and elapsed time"""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return {'id': job_id, 'state': 'unknown', 'result': None, 'error': None, 'elapsed': 0.0}
+        if job['state'] == 'pending' and job['future'].running():
+            job['state'] = 'running'
+        if job['state'] in ('pending', 'running') and job['timeout'] is not None \
+                and time.time() - job['submitted'] > job['timeout']:
+            _give_up(job, 'timeout')
+        end = job['finished'] or time.time()
+        return {'id': job_id, 'state': job['state'], 'result': job['result'], 'error': job['error'],
+                'elapsed': end - job['submitted']}
+
+def wait(job_id, timeout):
+    """Block up to timeout seconds for a job to finish; returns status()"""
+    with _lock:
+        job = _jobs.get(job_id)
+        future = job['future'] if job else None
+    if future is not None:
+        try:
+            future.result(timeout)
+        except FutureTimeout:
+            pass
+        except Exception:
+            pass  # reported by status()
+        if future.done():
+            _finish(job_id, future)  # the done-callback may not have run yet
+    return status(job_id)
+
+def cancel(job_id):
+    """Cancel a job; a job already running in a worker is abandoned and its result dropped"""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job['state'] not in ('pending', 'running'):
+            return False
+        _give_up(job, 'cancelled')
+        return True
+
+def forget(job_id):
+    """Drop a finished job so the next submit() for its key starts a fresh one"""
+    with _lock:
+        job = _jobs.pop(job_id, None)
+        if job is not None and _by_key.get(job['key']) == job_id:
+            del _by_key[job['key']]
+
+def await_job(job_id, label="Computing..."):
+    """Streamlit helper: return the job's result, or show its progress and return None.
+
+    Progress is polled in a fragment every POLL_SECONDS (with a Cancel button); the whole
+    page reruns once the job ends.
+    """
+    results = await_jobs([job_id], label)
+    return None if results is None else results[0]
+
+def await_jobs(job_ids, label="Computing..."):
+    """await_job() for jobs that run side by side: all their results (in order) once every one
+    is done, otherwise None with a single progress panel (and Retry for the ones that failed)"""
+    import streamlit as st
+    deadline = time.time() + INLINE_WAIT
+    infos = [wait(job_id, max(0.0, deadline - time.time())) for job_id in job_ids]
+    if all(info['state'] == 'done' for info in infos):
+        return [info['result'] for info in infos]
+    ended = [info for info in infos if info['state'] in ('failed', 'timeout', 'cancelled', 'unknown')]
+    if ended:
+        info = ended[0]
+        message = {'failed': f"Computation failed: {info['error']}",
+                   'timeout': f"Computation timed out after {info['elapsed']:.0f}s.",
+                   'cancelled': "Computation cancelled.",
+                   'unknown': "Computation was lost."}[info['state']]
+        st.warning(message)
+        if st.button("Retry", key=f"job_retry_{info['id']}"):
+            for job in infos:
+                if job['state'] != 'done':
+                    forget(job['id'])
+            st.rerun()
+        return None
+
+    @st.fragment(run_every=POLL_SECONDS)
+    def progress():
+        infos = [status(job_id) for job_id in job_ids]
+        if not any(info['state'] in ('pending', 'running') for info in infos):
+            st.rerun()
+        elapsed = max(info['elapsed'] for info in infos)
+        if len(infos) == 1:
+            st.info(f"{label} ({elapsed:.1f}s)")
+        else:
+            done = sum(info['state'] == 'done' for info in infos)
+            st.info(f"{label} ({done}/{len(infos)} done, {elapsed:.1f}s)")
+        if st.button("Cancel", key=f'job_cancel_{job_ids[0]}'):
+            for job_id in job_ids:
+                cancel(job_id)
+            st.rerun()
+
+    progress()
+    return None
+
+def run(key, fn, *args, label="Computing...", timeout=DEFAULT_TIMEOUT):
+    """Result of fn(*args) computed in the pool and cached under key, or None (progress shown) while it runs"""
+    return await_job(submit(fn, *args, key=key, timeout=timeout), label)
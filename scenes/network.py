@@ -0,0 +1,142 @@
+import hashlib
+import json
+import threading
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from scipy.optimize import linprog
+from .clearing import clear_market
+
+# DC power-flow clearing for the network scenes (Transmission Constraints, CMSC, Locational Pricing).
+# A network is {'buses': [names], 'lines': [{'from', 'to', 'x', 'limit'}], 'slack': name}.
+
+_networks = {}
+_networks_lock = threading.Lock()
+
+def _network_key(network):
+    payload = json.dumps(network, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+def build_network(network):
+    """Factorize the reduced susceptance matrix once and derive the (sparse) PTDF matrix.
+
+    Results are cached per topology, so repeated rounds on the same network only pay
+    for the LP itself.
+    """
+    key = _network_key(network)
+    with _networks_lock:
+        cached = _networks.get(key)
+    if cached is not None:
+        return cached
+    buses = list(network['buses'])
+    index = {b: i for i, b in enumerate(buses)}
+    lines = network['lines']
+    n_bus, n_line = len(buses), len(lines)
+    slack = index[network.get('slack', buses[0])]
+    frm = np.array([index[l['from']] for l in lines])
+    to = np.array([index[l['to']] for l in lines])
+    b = 1.0 / np.array([l.get('x', 1.0) for l in lines], dtype=float)
+    rows = np.arange(n_line)
+    # branch-bus incidence A (lines x buses), Bf = diag(b) A, Bbus = A^T diag(b) A
+    incidence = sp.csr_matrix((np.r_[np.ones(n_line), -np.ones(n_line)], (np.r_[rows, rows], np.r_[frm, to])),
+                              shape=(n_line, n_bus))
+    bf = sp.diags(b) @ incidence
+    bbus = (incidence.T @ bf).tocsc()
+    keep = np.array([i for i in range(n_bus) if i != slack])
+    ptdf = np.zeros((n_line, n_bus))
+    if len(keep):
+        lu = splu(bbus[keep][:, keep].tocsc())
+        # PTDF[:, keep] = Bf[:, keep] Bred^-1  ->  solve Bred^T X = Bf[:, keep]^T
+        ptdf[:, keep] = lu.solve(bf[:, keep].toarray().T, trans='T').T
+    ptdf[np.abs(ptdf) < 1e-10] = 0.0
+    built = {
+        'buses': buses,
+        'index': index,
+        'lines': lines,
+        'limit': np.array([l.get('limit', np.inf) for l in lines], dtype=float),
+        'ptdf': sp.csr_matrix(ptdf),
+        'active_lines': set(),
+    }
+    with _networks_lock:
+        _networks[key] = built
+    return built
+
+def solve_opf(network, offer_bus, price, quantity, mc, load):
+    """Security-constrained economic dispatch (DC-OPF, PTDF form) solved with HiGHS.
+
+    offer_bus: bus name per offer; load: {bus: MW}. Returns dispatch, nodal LMPs, line flows,
+    congestion rent, the unconstrained uniform MCP and CMSC payments per offer.
+    """
+    net = build_network(network)
+    price = np.asarray(price, dtype=float)
+    quantity = np.asarray(quantity, dtype=float)
+    mc = np.asarray(mc, dtype=float)
+    bus_of_offer = np.array([net['index'][b] for b in offer_bus], dtype=int)
+    load_vec = np.zeros(len(net['buses']))
+    for bus, mw in load.items():
+        load_vec[net['index'][bus]] += mw
+    total_load = load_vec.sum()
+
+    ptdf = net['ptdf']
+    gen_shift_all = ptdf[:, bus_of_offer].tocsr()  # line flow per MW from each offer
+    flow_of_load = ptdf @ load_vec
+    limit = net['limit']
+    # constraint generation: start from the lines that bound last time on this network and only
+    # add monitored lines the dispatch actually overloads, instead of every line in the LP
+    active = sorted(net['active_lines'] & set(np.flatnonzero(np.isfinite(limit))))
+    while True:
+        rows = np.array(active, dtype=int)
+        shift = gen_shift_all[rows]
+        a_ub = sp.vstack([shift, -shift]).tocsr() if len(rows) else None
+        b_ub = np.r_[limit[rows] + flow_of_load[rows], limit[rows] - flow_of_load[rows]] if len(rows) else None
+        res = linprog(price, A_ub=a_ub, b_ub=b_ub, A_eq=np.ones((1, len(price))), b_eq=[total_load],
+                      bounds=np.c_[np.zeros(len(price)), quantity], method='highs')
+        if res.status != 0:
+            return {'feasible': False, 'message': res.message}
+        flows = gen_shift_all @ res.x - flow_of_load
+        violated = np.flatnonzero(np.abs(flows) > limit * (1 + 1e-9) + 1e-9)
+        if len(violated) == 0:
+            break
+        active = sorted(set(active) | set(violated.tolist()))
+
+    dispatch = np.clip(res.x, 0.0, quantity) + 0.0
+    # LMP_n = d(cost)/d(load_n): energy component plus congestion through the line duals
+    mu = res.ineqlin.marginals if len(rows) else np.zeros(0)
+    mu_up, mu_down = mu[:len(rows)], mu[len(rows):]
+    lmp = res.eqlin.marginals[0] + ptdf[rows].T @ (mu_up - mu_down)
+    binding = rows[np.abs(mu_up - mu_down) > 1e-9]
+    with _networks_lock:
+        net['active_lines'] = set(binding.tolist())
+    offer_lmp = lmp[bus_of_offer]
+
+    # unconstrained clearing gives the single MCP used by the Transmission Constraints / CMSC scenes
+    unconstrained = clear_market(price, quantity, mc, total_load)
+    mcp = unconstrained['mcp']
+    delta = dispatch - unconstrained['supply_dispatch']
+    if mcp is not None:
+        # constrained-off sellers are paid (MCP - offer) per MW lost, constrained-on (offer - MCP) per MW added
+        cmsc = np.where(delta < 0, -delta * (mcp - price), delta * (price - mcp))
+        cmsc = np.maximum(cmsc, 0.0) + 0.0
+    else:
+        cmsc = np.zeros(len(price))
+    spread = lmp[[net['index'][l['to']] for l in net['lines']]] - lmp[[net['index'][l['from']] for l in net['lines']]]
+    return {
+        'feasible': True,
+        'buses': net['buses'],
+        'dispatch': dispatch,
+        'cost': float(res.fun),
+        'lmp': lmp,
+        'offer_lmp': offer_lmp,
+        'flows': flows,
+        'limit': net['limit'],
+        'congestion_rent': float(load_vec @ lmp - dispatch @ offer_lmp),
+        'line_rent': flows * spread + 0.0,
+        'mcp': mcp,
+        'unconstrained_dispatch': unconstrained['supply_dispatch'],
+        'cmsc': cmsc,
+        'profit_mcp': dispatch * ((mcp if mcp is not None else 0.0) - mc) + 0.0,
+        'profit_lmp': dispatch * (offer_lmp - mc) + 0.0,
+        'consumer_cost_mcp': total_load * mcp if mcp is not None else None,
+        'consumer_cost_cmsc': total_load * mcp + float(cmsc.sum()) if mcp is not None else None,
+        'consumer_cost_lmp': float(load_vec @ lmp),
+    }
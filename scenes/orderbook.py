@@ -0,0 +1,216 @@
+import threading
+from collections import OrderedDict
+
+# Incremental order book for live clearing while bids are still arriving.
+# Offers (and optional demand bids) are aggregated into price levels on a tick grid; a
+# Fenwick tree over the levels gives cumulative quantity below any price, so inserting or
+# revising a bid is O(log n) and the clearing price is found by an O(log n) descent instead
+# of re-sorting every offer. Results follow clear_market(): the MCP is the price of the
+# level that covers demand, and offers tied at the MCP share the residual pro rata.
+
+class _Fenwick:
+    """Prefix sums over integer keys in [base, base + size); grows when a key falls outside"""
+
+    def __init__(self, base=0, size=1024):
+        self.base, self.size = base, size
+        self.tree = [0.0] * (size + 1)
+        self.levels = {}  # key -> quantity
+
+    def _grow(self, key):
+        lo, hi = min(self.base, key), max(self.base + self.size, key + 1)
+        size = self.size
+        while size < hi - lo:
+            size *= 2
+        levels = self.levels
+        self.__init__(lo - (size - (hi - lo)) // 2, size)
+        for k, q in levels.items():
+            self.add(k, q)
+
+    def add(self, key, delta):
+        if not self.base <= key < self.base + self.size:
+            self._grow(key)
+        self.levels[key] = self.levels.get(key, 0.0) + delta
+        if abs(self.levels[key]) < 1e-12:
+            del self.levels[key]
+        i = key - self.base + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, key):
+        """Total quantity at keys <= key"""
+        i = min(key - self.base + 1, self.size)
+        total = 0.0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return self.prefix(self.base + self.size - 1)
+
+    def find(self, target):
+        """Smallest key whose prefix sum reaches target (None if the total is short)"""
+        pos, remaining = 0, target - 1e-9
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] < remaining:
+                pos = nxt
+                remaining -= self.tree[nxt]
+            step >>= 1
+        return pos + self.base if pos < self.size else None
+
+class OrderBook:
+    """Supply offers (and optional demand bids) kept clearable after every update.
+
+    demand: inelastic demand in MW, used while no demand bids are in the book.
+    """
+
+    def __init__(self, demand=0.0, tick=0.01):
+        self.demand = float(demand)
+        self.tick = tick
+        self.offers = {}  # username -> {'price', 'quantity', 'key', ...}
+        self.bids = {}
+        self._supply = _Fenwick()
+        self._demand = _Fenwick()
+        self._level_users = {}  # supply key -> {username: quantity}, in arrival order
+        self._result = None
+
+    def _key(self, price):
+        return int(round(float(price) / self.tick))
+
+    def set_offer(self, username, price, quantity=1.0, **info):
+        """Insert or revise a supply offer, O(log n)"""
+        self.remove_offer(username)
+        key = self._key(price)
+        self.offers[username] = {'price': float(price), 'quantity': float(quantity), 'key': key} | info
+        self._supply.add(key, float(quantity))
+        self._level_users.setdefault(key, {})[username] = float(quantity)
+        self._result = None
+
+    def remove_offer(self, username):
+        offer = self.offers.pop(username, None)
+        if offer is None:
+            return
+        self._supply.add(offer['key'], -offer['quantity'])
+        users = self._level_users[offer['key']]
+        del users[username]
+        if not users:
+            del self._level_users[offer['key']]
+        self._result = None
+
+    def set_bid(self, username, price, quantity):
+        """Insert or revise a demand bid (makes demand price-elastic), O(log n)"""
+        self.remove_bid(username)
+        key = self._key(price)
+        self.bids[username] = {'price': float(price), 'quantity': float(quantity), 'key': key}
+        self._demand.add(key, float(quantity))
+        self._result = None
+
+    def remove_bid(self, username):
+        bid = self.bids.pop(username, None)
+        if bid is not None:
+            self._demand.add(bid['key'], -bid['quantity'])
+            self._result = None
+
+    def set_demand(self, demand):
+        if float(demand) != self.demand:
+            self.demand = float(demand)
+            self._result = None
+
+    def _demand_at_least(self, key):
+        return self._demand.total() - self._demand.prefix(key - 1)
+
+    def _target(self):
+        """Quantity to clear and whether supply covers it"""
+        total = self._supply.total()
+        if not self.bids:
+            return min(self.demand, total), total >= self.demand - 1e-9
+        # elastic demand: the last accepted level is the highest one where demand willing to pay
+        # its price still exceeds the supply below it (monotone, so binary search on the key)
+        s, d = self._supply, self._demand
+        lo, hi = min(s.base, d.base) - 1, max(s.base + s.size, d.base + d.size) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._demand_at_least(mid) > s.prefix(mid - 1) + 1e-9:
+                lo = mid
+            else:
+                hi = mid - 1
+        covered = s.prefix(lo)
+        if covered <= 1e-9:
+            return 0.0, True
+        last = s.find(covered)
+        return min(covered, self._demand_at_least(last)), True
+
+    def clearing(self):
+        """MCP, cleared quantity and marginal offers; recomputed in O(log n) after an update"""
+        if self._result is not None:
+            return self._result
+        target, sufficient = self._target()
+        key = self._supply.find(target) if target > 1e-9 else None
+        result = {'mcp': None, 'cleared_quantity': target, 'sufficient': sufficient,
+                  'marginal': [], 'below': 0.0, 'share': 1.0, 'key': None,
+                  'offers': len(self.offers), 'supply': self._supply.total()}
+        if key is not None:
+            users = self._level_users[key]
+            below = self._supply.prefix(key - 1)
+            result.update(key=key, below=below, marginal=list(users),
+                          share=(target - below) / self._supply.levels[key])
+            if sufficient:
+                result['mcp'] = self.offers[next(iter(users))]['price']
+        self._result = result
+        return result
+
+    @property
+    def provisional_price(self):
+        """Clearing price of the offers received so far (None while supply is short)"""
+        return self.clearing()['mcp']
+
+    def dispatch(self, username):
+        """MW dispatched for one offer under the current clearing, O(1) after clearing()"""
+        result = self.clearing()
+        offer = self.offers[username]
+        if result['key'] is None:
+            return 0.0
+        if not result['sufficient'] or offer['key'] < result['key']:
+            return offer['quantity']
+        if offer['key'] == result['key']:
+            return offer['quantity'] * result['share']
+        return 0.0
+
+_books = OrderedDict()  # book key -> (lock, OrderBook)
+_books_lock = threading.Lock()
+MAX_BOOKS = 64
+
+def sync_offers(book, bids, default_quantity=1.0):
+    """Bring a book in line with a list of seller bids; only new or changed offers are touched"""
+    seen = set()
+    for bid in bids:
+        if bid.get('price') is None:
+            continue
+        username = bid['username']
+        seen.add(username)
+        quantity = float(bid.get('quantity', default_quantity))
+        offer = book.offers.get(username)
+        if offer is None or offer['price'] != float(bid['price']) or offer['quantity'] != quantity:
+            book.set_offer(username, bid['price'], quantity, MC=bid.get('MC'))
+    for username in [u for u in book.offers if u not in seen]:
+        book.remove_offer(username)
+
+def live_clearing(key, demand, bids):
+    """Provisional clearing of the bids received so far, from a book kept per key (e.g. session code)"""
+    with _books_lock:
+        entry = _books.get(key)
+        if entry is None:
+            entry = _books[key] = (threading.Lock(), OrderBook(demand))
+            while len(_books) > MAX_BOOKS:
+                _books.popitem(last=False)
+        _books.move_to_end(key)
+    lock, book = entry
+    with lock:
+        book.set_demand(demand)
+        sync_offers(book, bids)
+        result = dict(book.clearing())
+        result['dispatch'] = {u: book.dispatch(u) for u in result['marginal']}
+        return result
@@ -0,0 +1,114 @@
+import math
+import numpy as np
+import pandas as pd
+from .clearing import clear_batch
+
+# Stochastic capacity planning: each participant builds some capacity (MW) at a fixed cost per
+# MW, then the market clears in thousands of sampled scenarios of demand, fuel price and unit
+# outages. All scenarios of a chunk clear in one (scenarios x units) clear_batch call; chunks
+# keep memory bounded, and only running sums plus each unit's worst-tail profits are kept.
+CHUNK = 10000       # scenarios cleared per pass
+PRICE_SAMPLE = 5000  # scenario prices/profits kept for charts
+
+default_planning_params = {
+    'demand_mean': 7.0,    # MW
+    'demand_sd': 1.0,      # MW
+    'fuel_sigma': 0.2,     # log-normal spread of the fuel price multiplier on every MC
+    'outage_prob': 0.1,    # each unit independently unavailable
+    'fixed_cost': 10.0,    # $ per MW of capacity built
+    'price_cap': 100.0,    # $/MWh paid to backup supply when units cannot cover demand
+    'n_scenarios': 10000,
+    'alpha': 0.95,         # CVaR level: mean profit of the worst (1 - alpha) of scenarios
+}
+
+def _streams(seed):
+    """Separate generators per random input, so results do not depend on the chunk size"""
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(3)]
+
+def sample_scenarios(params, n, streams, n_units):
+    """Demand (n,), fuel price multiplier (n,) and unit availability (n, n_units)"""
+    demand_rng, fuel_rng, outage_rng = streams
+    demand = np.maximum(params['demand_mean'] + params['demand_sd'] * demand_rng.standard_normal(n), 0.0)
+    fuel = np.exp(params['fuel_sigma'] * fuel_rng.standard_normal(n) - params['fuel_sigma'] ** 2 / 2)
+    available = outage_rng.random((n, n_units)) >= params['outage_prob']
+    return demand, fuel, available
+
+def clear_scenarios(mc, capacity, demand, fuel, available, price_cap):
+    """Cost-based clearing of every scenario at once; returns (price, dispatch, unit cost per MWh)"""
+    cost = mc[None, :] * fuel[:, None]
+    quantity = capacity[None, :] * available
+    result = clear_batch(cost, quantity, cost, demand)
+    short = quantity.sum(axis=1) < demand
+    price = np.where(short, price_cap, np.nan_to_num(result['mcp']))  # no demand: nothing to pay for
+    return price, result['dispatch'], cost
+
+def evaluate(mc, capacity, params=None, seed=None, chunk=CHUNK):
+    """Profit statistics of each unit over params['n_scenarios'] sampled scenarios.
+
+    mc / capacity: one entry per unit (participant). Returns per-unit expected_profit,
+    variance, std, var (value at risk) and cvar at params['alpha'], loss_prob, plus system
+    statistics and a sample of scenario prices/profits for charts.
+    """
+    params = default_planning_params | (params or {})
+    mc = np.asarray(mc, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+    n_units, n_total = len(mc), int(params['n_scenarios'])
+    tail = max(1, math.ceil((1 - params['alpha']) * n_total))
+    streams = _streams(seed)
+    fixed = params['fixed_cost'] * capacity
+    count, mean, m2 = 0, np.zeros(n_units), np.zeros(n_units)
+    worst = np.empty((0, n_units))
+    losses = np.zeros(n_units)
+    price_sum = shortage = unserved = 0.0
+    sample_prices, sample_profit = [], []
+    for start in range(0, n_total, chunk):
+        n = min(chunk, n_total - start)
+        demand, fuel, available = sample_scenarios(params, n, streams, n_units)
+        price, dispatch, cost = clear_scenarios(mc, capacity, demand, fuel, available, params['price_cap'])
+        profit = dispatch * (price[:, None] - cost) - fixed[None, :]
+        # merge running mean / sum of squared deviations (Chan et al.)
+        chunk_mean = profit.mean(axis=0)
+        chunk_m2 = ((profit - chunk_mean) ** 2).sum(axis=0)
+        delta = chunk_mean - mean
+        total = count + n
+        mean = mean + delta * n / total
+        m2 = m2 + chunk_m2 + delta ** 2 * count * n / total
+        count = total
+        # keep only the `tail` worst profits of each unit seen so far
+        merged = np.concatenate([worst, profit])
+        worst = np.partition(merged, tail - 1, axis=0)[:tail] if len(merged) > tail else merged
+        losses += (profit < 0).sum(axis=0)
+        price_sum += price.sum()
+        supply = (capacity[None, :] * available).sum(axis=1)
+        shortage += np.count_nonzero(supply < demand)
+        unserved += np.maximum(demand - supply, 0.0).sum()
+        kept = sum(len(p) for p in sample_prices)
+        if kept < PRICE_SAMPLE:
+            sample_prices.append(price[:PRICE_SAMPLE - kept])
+            sample_profit.append(profit[:PRICE_SAMPLE - kept])
+    variance = m2 / max(count - 1, 1)
+    worst.sort(axis=0)
+    return {
+        'expected_profit': mean,
+        'variance': variance,
+        'std': np.sqrt(variance),
+        'var': worst[-1] if len(worst) else np.zeros(n_units),
+        'cvar': worst.mean(axis=0) if len(worst) else np.zeros(n_units),
+        'loss_prob': losses / max(count, 1),
+        'mean_price': price_sum / max(count, 1),
+        'shortage_prob': shortage / max(count, 1),
+        'expected_unserved': unserved / max(count, 1),
+        'n_scenarios': count,
+        'sample_prices': np.concatenate(sample_prices)[:PRICE_SAMPLE] if sample_prices else np.zeros(0),
+        'sample_profit': np.concatenate(sample_profit)[:PRICE_SAMPLE] if sample_profit else np.zeros((0, n_units)),
+    }
+
+def evaluate_bids(params, bids, seed=0, chunk=CHUNK):
+    """evaluate() for submitted capacity decisions; returns (per-participant DataFrame, result)"""
+    df = pd.DataFrame(bids)
+    capacity = df['capacity'] if 'capacity' in df else df['price']
+    df['capacity'] = np.clip(capacity.to_numpy(float), 0.0, None)
+    result = evaluate(df['MC'].to_numpy(float), df['capacity'].to_numpy(float), params, seed, chunk)
+    for name in ('expected_profit', 'std', 'var', 'cvar', 'loss_prob'):
+        df[name] = result[name]
+    return df, result
@@ -1,58 +1,136 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objs as go
+from .clearing import clear_market
+from . import cache, jobs, figures, bidtable
+from .orderbook import live_clearing
+from .simulation import STRATEGIES, run_seed, combine_seeds
 
 default_params = {
     'demand': 5,  # MW
 }
 
-def teacher_view(params, bids):
+def clear_bids(params, bids):
+    """Clear the submitted bids once; returns (result, merit-order DataFrame) shared by both views"""
+    df = bidtable.frame(bids)
+    if 'quantity' not in df:
+        df['quantity'] = 1  # each seller offers 1 MW unless the bid says otherwise
+    result = clear_market(df['price'].to_numpy(float), df['quantity'].to_numpy(float),
+                          df['MC'].to_numpy(float), params['demand'])
+    df['dispatch'] = result['supply_dispatch']
+    df['dispatched'] = df['dispatch'] > 0
+    df['profit'] = result['supply_profit']
+    df = df.iloc[result['order']].reset_index(drop=True)
+    df['cum_supply'] = result['cum_supply']
+    return result, df
+
+def _build_figures(params, result, df):
+    """Supply curve and seller profit charts as (cached) figure JSON"""
+    fig = figures.supply_curve_json(df['price'].to_numpy(float), df['quantity'].to_numpy(float),
+                                    params['demand'], result['mcp'])
+    fig2 = figures.seller_profit_json(df['username'].to_numpy(str), df['profit'].to_numpy(float),
+                                      df['MC'].to_numpy(float))
+    return fig, fig2
+
+def _clear_and_plot(params, bids):
+    """Worker job for the teacher view: clearing plus both figures"""
+    result, df = clear_bids(params, bids)
+    figures = _build_figures(params, result, df) if result['mcp'] is not None else (None, None)
+    return result, df, figures
+
+def cached_clearing(params, bids, session_code=None):
+    """clear_bids() memoized per (session, bid set, params); shared across browser tabs"""
+    key = cache.make_key(session_code, bids, params)
+    return cache.get_or_compute(key, lambda: clear_bids(params, bids))
+
+def simulation_view(params):
+    """Teacher panel: Monte-Carlo comparison of Single-price vs Pay-as-Bid with automated bidders"""
+    with st.expander("Monte-Carlo Simulation (automated bidders)"):
+        with st.form("sim_form"):
+            c1, c2, c3 = st.columns(3)
+            n_bidders = c1.number_input("Bidders", min_value=2, max_value=500, value=10, step=1)
+            n_rounds = c2.number_input("Rounds per seed", min_value=10, max_value=100000, value=1000, step=100)
+            n_seeds = c3.number_input("Seeds", min_value=1, max_value=64, value=8, step=1)
+            strategy = st.selectbox("Bidder Strategy", STRATEGIES)
+            markup = st.slider("Markup over MC", 0.0, 1.0, 0.2, 0.05)
+            submitted = st.form_submit_button("Run Simulation")
+        if submitted:
+            # kept across reruns: the job's progress poll reruns the page without the form submit
+            st.session_state['sim_request'] = ({'demand': params['demand'], 'n_bidders': int(n_bidders),
+                                                'markup': markup}, int(n_rounds), int(n_seeds), strategy)
+        request = st.session_state.get('sim_request')
+        if request is None:
+            return
+        sim_params, n_rounds, n_seeds, strategy = request
+        # one job per seed, spread over the worker pool; combined here once all are done
+        job_ids = [jobs.submit(run_seed, sim_params, n_rounds, strategy, seed,
+                               key=cache.make_key(None, [], [request, seed], 'simulation'))
+                   for seed in range(n_seeds)]
+        per_seed = jobs.await_jobs(job_ids, label="Simulating...")
+        if per_seed is None:
+            return
+        results = combine_seeds(per_seed)
+        summary = pd.DataFrame({name: r['summary'] for name, r in results.items()})
+        summary.columns = ['Single-price', 'Pay-as-Bid']
+        st.dataframe(summary)
+        labels = (('uniform', 'Single-price'), ('pay_as_bid', 'Pay-as-Bid'))
+        fig = figures.histogram_json({label: results[name]['consumer_cost'] for name, label in labels},
+                                     'Consumer Cost per Round ($)', 'Rounds', 'Consumer Cost Distribution')
+        st.plotly_chart(figures.from_json(fig), use_container_width=True)
+        fig2 = figures.histogram_json({label: results[name]['profit'].sum(axis=2) for name, label in labels},
+                                      'Total Seller Profit per Round ($)', 'Rounds', 'Seller Profit Distribution')
+        st.plotly_chart(figures.from_json(fig2), use_container_width=True)
+
+def provisional_view(params, bids, session_code=None):
+    """Teacher panel during a round: clearing of the offers received so far (incremental order book)"""
+    submitted = sum('price' in b for b in bids)
+    st.info(f"Waiting for all students to submit bids... ({submitted}/{len(bids)} submitted)")
+    if not submitted:
+        return
+    live = live_clearing(session_code, params['demand'], bids)
+    if live['mcp'] is None:
+        st.write(f"**Provisional MCP:** not enough supply yet ({live['supply']:g} of {params['demand']} MW offered)")
+        return
+    marginal = ', '.join(f"{u} ({live['dispatch'][u]:g} MW)" for u in live['marginal'])
+    st.write(f"**Provisional MCP: ${live['mcp']:g}** (marginal: {marginal})")
+
+def teacher_view(params, bids, session_code=None):
     st.subheader("Single-price Clearing Market Result")
+    simulation_view(params)
     if not bids or not all('price' in b for b in bids):
-        st.info("Waiting for all students to submit bids...")
+        if bids:
+            provisional_view(params, bids, session_code)
+        else:
+            st.info("Waiting for all students to submit bids...")
         return
-    df = pd.DataFrame(bids)
-    df = df.sort_values(by='price')
-    df['cum_supply'] = range(1, len(df)+1)
-    mcp_row = df[df['cum_supply'] >= params['demand']].head(1)
-    if mcp_row.empty:
+    # clearing and figures run in the worker pool; this rerun polls until they are ready
+    out = jobs.run(cache.make_key(session_code, bids, params, 'teacher'), _clear_and_plot, params, bids,
+                   label="Clearing the market...")
+    if out is None:
+        return
+    result, df, (fig, fig2) = out
+    if result['mcp'] is None:
         st.warning("Not enough supply to meet demand!")
         return
-    mcp = mcp_row['price'].values[0]
-    df['dispatched'] = df['cum_supply'] <= params['demand']
-    df['profit'] = (mcp - df['MC']).where(df['dispatched'], 0)
-    st.write(f"**Market Clearing Price (MCP): ${mcp}**")
-    st.dataframe(df[['username','MC','price','dispatched','profit']])
-    # Supply curve plot
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df['cum_supply'], y=df['price'], mode='lines+markers', name='Supply Curve'))
-    fig.add_trace(go.Scatter(x=[params['demand']], y=[mcp], mode='markers', marker=dict(color='red', size=12), name='MCP'))
-    fig.update_layout(xaxis_title='Cumulative Supply (MW)', yaxis_title='Price ($)', title='Supply Curve and MCP')
-    st.plotly_chart(fig, use_container_width=True)
-    # Profit bar chart
-    fig2 = go.Figure()
-    fig2.add_trace(go.Bar(x=df['username'], y=df['profit'], name='Profit'))
-    fig2.add_trace(go.Bar(x=df['username'], y=df['MC'], name='MC'))
-    fig2.update_layout(barmode='group', xaxis_title='Seller', yaxis_title='Amount ($)', title='Seller Profit and MC')
-    st.plotly_chart(fig2, use_container_width=True)
-
-def student_view(params, bids, user_info):
+    mcp = result['mcp']
+    st.write(f"**Market Clearing Price (MCP): ${mcp:g}**")
+    st.dataframe(df[['username','MC','price','quantity','dispatch','dispatched','profit']])
+    st.plotly_chart(figures.from_json(fig), use_container_width=True)
+    st.plotly_chart(figures.from_json(fig2), use_container_width=True)
+
+def student_view(params, bids, user_info, session_code=None):
     st.subheader("Market Status")
     if not bids or not all('price' in b for b in bids):
         st.info("Waiting for all students to submit bids...")
         return
-    df = pd.DataFrame(bids)
-    df = df.sort_values(by='price')
-    df['cum_supply'] = range(1, len(df)+1)
-    mcp_row = df[df['cum_supply'] >= params['demand']].head(1)
-    if mcp_row.empty:
+    result, df = cached_clearing(params, bids, session_code)
+    if result['mcp'] is None:
         st.warning("Not enough supply to meet demand!")
         return
-    mcp = mcp_row['price'].values[0]
-    st.write(f"**Market Clearing Price (MCP): ${mcp}**")
-    dispatched = df[df['username'] == user_info['username']]['cum_supply'].values[0] <= params['demand']
-    if dispatched:
-        st.success(f"You are DISPATCHED! Your profit: ${mcp - user_info['MC']}")
+    mcp = result['mcp']
+    st.write(f"**Market Clearing Price (MCP): ${mcp:g}**")
+    me = df[df['username'] == user_info['username']].iloc[0]
+    if me['dispatched']:
+        st.success(f"You are DISPATCHED ({me['dispatch']:g} MW)! Your profit: ${me['profit']:g}")
     else:
         st.info("You are NOT dispatched.")
-    st.dataframe(df[['username','MC','price','cum_supply']]) 
\ No newline at end of file
+    st.dataframe(df[['username','MC','price','cum_supply']])
@@ -0,0 +1,80 @@
+import streamlit as st
+import plotly.graph_objs as go
+from . import cache, settlement
+
+# Day-Ahead Market + Two-Settlement: DA positions are financially binding, RT deviations settle at P_RT.
+default_params = {
+    'da_demand': 7,    # MW, day-ahead forecast
+    'rt_demand': 8,    # MW, realized in real time
+    'capacity': 1,     # MW per seller unless the bid says otherwise
+    'price_cap': settlement.PRICE_CAP,  # $/MWh, backup supply when offers run short
+}
+
+SETTLEMENT_COLUMNS = ['username', 'MC', 'price', 'da_quantity', 'rt_quantity', 'deviation',
+                      'da_revenue', 'rt_revenue', 'revenue', 'profit', 'single_revenue']
+
+def settle(params, bids, session_code=None):
+    """Settlement of one session, memoized per (session, bid set, params)"""
+    key = cache.make_key(session_code, bids, params, 'settlement')
+    return cache.get_or_compute(key, lambda: settlement.settle_sessions([(params, bids)], default_params,
+                                                                         [session_code]))
+
+def _settlement_figure(sellers):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=sellers['username'], y=sellers['da_revenue'], name='Day-Ahead Revenue'))
+    fig.add_trace(go.Bar(x=sellers['username'], y=sellers['rt_revenue'], name='Real-Time Adjustment'))
+    fig.add_trace(go.Scatter(x=sellers['username'], y=sellers['single_revenue'], mode='markers',
+                             marker=dict(color='red', size=10, symbol='diamond'), name='RT-only Revenue'))
+    fig.update_layout(barmode='relative', xaxis_title='Seller', yaxis_title='Revenue ($)',
+                      title='Two-Settlement Revenue vs Real-Time Only')
+    return fig
+
+def _prices(summary):
+    row = summary.iloc[0]
+    st.write(f"**Day-Ahead Price (P_DAM): ${row['da_price']:g}** for {row['da_demand']:g} MW  |  "
+             f"**Real-Time Price (P_RTM): ${row['rt_price']:g}** for {row['rt_demand']:g} MW")
+    if row['rt_shortfall'] > 0 or row['da_shortfall'] > 0:
+        st.warning(f"Offers did not cover demand; backup supply set the price at ${row['rt_price']:g}.")
+
+def class_settlement_view():
+    """Teacher panel: settle every Day-Ahead session of the class in one batch"""
+    with st.expander("Settle All Sessions"):
+        archived = st.checkbox("Include archived sessions", key='settle_all_archived')
+        if not st.button("Run Settlement", key='settle_all'):
+            return
+        sellers, summary = settlement.settle_class(10, default_params, archived=archived)
+        if summary.empty:
+            st.info("No Day-Ahead sessions to settle.")
+            return
+        st.dataframe(summary)
+        st.dataframe(sellers)
+        st.download_button("Download CSV", sellers.to_csv(index=False), file_name='settlement.csv',
+                           mime='text/csv')
+
+def teacher_view(params, bids, session_code=None):
+    st.subheader("Day-Ahead Market + Two-Settlement Result")
+    class_settlement_view()
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit bids...")
+        return
+    sellers, summary = settle(params, bids, session_code)
+    _prices(summary)
+    st.dataframe(sellers[SETTLEMENT_COLUMNS])
+    st.plotly_chart(_settlement_figure(sellers), use_container_width=True)
+
+def student_view(params, bids, user_info, session_code=None):
+    st.subheader("Market Status")
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit bids...")
+        return
+    sellers, summary = settle(params, bids, session_code)
+    _prices(summary)
+    mine = sellers[sellers['username'] == user_info['username']]
+    if mine.empty:
+        return
+    me = mine.iloc[0]
+    st.write(f"Day-ahead position: {me['da_quantity']:g} MW → ${me['da_revenue']:g}")
+    st.write(f"Real-time output: {me['rt_quantity']:g} MW (deviation {me['deviation']:+g} MW) → "
+             f"${me['rt_revenue']:g}")
+    st.success(f"Total revenue: ${me['revenue']:g} (profit ${me['profit']:g}); "
+               f"settling everything in real time would pay ${me['single_revenue']:g}")
@@ -0,0 +1,125 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from .network import solve_opf
+from . import cache, jobs, figures, bidtable
+
+# Transmission Constraints: West/East zones joined by a capacity-limited line.
+default_params = {
+    'buses': ['West', 'East'],
+    'lines': [{'from': 'West', 'to': 'East', 'x': 1.0, 'limit': 3}],  # MW
+    'load': {'West': 3, 'East': 5},  # MW
+}
+
+MECHANISM_TITLES = {
+    'constrained': "Transmission-Constrained Market Result",
+    'cmsc': "Congestion Management Settlement Credits (CMSC) Result",
+    'lmp': "Locational Marginal Pricing (LMP) Result",
+}
+
+def assign_nodes(params, bids):
+    """Bus of each seller: the bid's 'node' if set, otherwise cheapest sellers go to the first bus"""
+    buses = params['buses']
+    order = np.argsort([b['MC'] for b in bids], kind='stable')
+    nodes = [None] * len(bids)
+    for bus, group in zip(buses, np.array_split(order, len(buses))):
+        for i in group:
+            nodes[i] = bids[i].get('node', bus)
+    return nodes
+
+def clear_network(params, bids):
+    df = bidtable.frame(bids)
+    if 'quantity' not in df:
+        df['quantity'] = 1  # each seller offers 1 MW unless the bid says otherwise
+    df['node'] = assign_nodes(params, bids)
+    network = {'buses': params['buses'], 'lines': params['lines']}
+    result = solve_opf(network, df['node'], df['price'].to_numpy(float), df['quantity'].to_numpy(float),
+                       df['MC'].to_numpy(float), params['load'])
+    if not result['feasible'] or result['mcp'] is None:
+        return result, df
+    df['unconstrained'] = result['unconstrained_dispatch']
+    df['dispatch'] = result['dispatch']
+    df['status'] = np.select([df['dispatch'] > df['unconstrained'] + 1e-9, df['dispatch'] < df['unconstrained'] - 1e-9],
+                             ['constrained on', 'constrained off'], '')
+    df['LMP'] = result['offer_lmp']
+    df['CMSC'] = result['cmsc']
+    df['profit_mcp'] = result['profit_mcp']
+    df['profit_cmsc'] = result['profit_mcp'] + result['cmsc']
+    df['profit_lmp'] = result['profit_lmp']
+    return result, df
+
+def cached_network(params, bids, session_code=None):
+    """(result, df) solved in the worker pool and cached; None (with progress shown) while solving"""
+    key = cache.make_key(session_code, bids, params, 'network')
+    return jobs.run(key, clear_network, params, bids, label="Solving the network dispatch...")
+
+def _profit_column(mechanism):
+    return {'constrained': 'profit_mcp', 'cmsc': 'profit_cmsc', 'lmp': 'profit_lmp'}[mechanism]
+
+def network_teacher_view(params, bids, mechanism, session_code=None):
+    st.subheader(MECHANISM_TITLES[mechanism])
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit bids...")
+        return
+    out = cached_network(params, bids, session_code)
+    if out is None:
+        return
+    result, df = out
+    if not result['feasible'] or result['mcp'] is None:
+        st.warning("Not enough supply to meet demand within the transmission limits!")
+        return
+    lines = pd.DataFrame(params['lines'])[['from', 'to', 'limit']]
+    lines['flow'] = result['flows']
+    lines['congestion rent'] = result['line_rent']
+    if mechanism == 'lmp':
+        prices = pd.DataFrame({'bus': result['buses'], 'LMP': result['lmp']})
+        st.dataframe(prices)
+        st.write(f"**Consumer Cost:** ${result['consumer_cost_lmp']:.2f} "
+                 f"(congestion rent ${result['congestion_rent']:.2f})")
+    else:
+        st.write(f"**Market Clearing Price (MCP, unconstrained): ${result['mcp']:g}**")
+        cost = result['consumer_cost_cmsc'] if mechanism == 'cmsc' else result['consumer_cost_mcp']
+        st.write(f"**Consumer Cost:** ${cost:.2f}")
+        if mechanism == 'cmsc':
+            st.write(f"**Total CMSC:** ${result['cmsc'].sum():.2f}")
+    st.dataframe(lines)
+    columns = ['username', 'node', 'MC', 'price', 'unconstrained', 'dispatch', 'status']
+    columns += {'constrained': [], 'cmsc': ['CMSC'], 'lmp': ['LMP']}[mechanism]
+    profit = _profit_column(mechanism)
+    st.dataframe(df[columns + [profit]].rename(columns={profit: 'profit'}))
+    fig = figures.seller_profit_json(df['username'].to_numpy(str), df[profit].to_numpy(float),
+                                     df['MC'].to_numpy(float))
+    st.plotly_chart(figures.from_json(fig), use_container_width=True)
+
+def network_student_view(params, bids, user_info, mechanism, session_code=None):
+    st.subheader("Market Status")
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit bids...")
+        return
+    out = cached_network(params, bids, session_code)
+    if out is None:
+        return
+    result, df = out
+    if not result['feasible'] or result['mcp'] is None:
+        st.warning("Not enough supply to meet demand within the transmission limits!")
+        return
+    me = df[df['username'] == user_info['username']].iloc[0]
+    if mechanism == 'lmp':
+        st.write(f"**Your Zone:** {me['node']} | **LMP: ${me['LMP']:.2f}**")
+    else:
+        st.write(f"**Your Zone:** {me['node']} | **Market Clearing Price (MCP): ${result['mcp']:g}**")
+    profit = me[_profit_column(mechanism)]
+    if me['dispatch'] > 0:
+        st.success(f"You are DISPATCHED ({me['dispatch']:g} MW)! Your profit: ${profit:.2f}")
+    else:
+        st.info("You are NOT dispatched.")
+    if me['status']:
+        st.write(f"Transmission limits left you **{me['status']}**.")
+    if mechanism == 'cmsc' and me['CMSC'] > 0:
+        st.write(f"**CMSC received:** ${me['CMSC']:.2f}")
+
+def teacher_view(params, bids, session_code=None):
+    network_teacher_view(params, bids, 'constrained', session_code)
+
+def student_view(params, bids, user_info, session_code=None):
+    network_student_view(params, bids, user_info, 'constrained', session_code)
@@ -0,0 +1,11 @@
+from .scene3 import network_teacher_view, network_student_view
+from .scene3 import default_params as _network_params
+
+# CMSC: constrained-off and constrained-on sellers are compensated relative to the unconstrained MCP.
+default_params = dict(_network_params)
+
+def teacher_view(params, bids, session_code=None):
+    network_teacher_view(params, bids, 'cmsc', session_code)
+
+def student_view(params, bids, user_info, session_code=None):
+    network_student_view(params, bids, user_info, 'cmsc', session_code)
@@ -0,0 +1,11 @@
+from .scene3 import network_teacher_view, network_student_view
+from .scene3 import default_params as _network_params
+
+# Locational Pricing: each zone is settled at its own LMP.
+default_params = dict(_network_params)
+
+def teacher_view(params, bids, session_code=None):
+    network_teacher_view(params, bids, 'lmp', session_code)
+
+def student_view(params, bids, user_info, session_code=None):
+    network_student_view(params, bids, user_info, 'lmp', session_code)
@@ -0,0 +1,139 @@
+import threading
+import streamlit as st
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from .unit_commitment import solve_unit_commitment, solve_sequential
+from . import cache, jobs, bidtable
+
+# Fixed Costs: non-fast-start units (start-up cost, minimum run time) cleared one period at a time.
+default_params = {
+    'demand_profile': [3, 5],  # MW per period
+    'n_slow': 2,               # cheapest sellers become non-fast-start units
+    'startup_cost': 50,        # $ per start
+    'min_up': 2,               # periods
+    'time_limit': 5,           # seconds per clearing
+}
+
+MECHANISM_TITLES = {
+    'sequential': "Fixed Costs Market Result (period-by-period clearing)",
+    'guarantee': "Cost Recovery Guarantee Result",
+    'multi': "Multi-Interval Optimization Result",
+}
+
+_warm = {}  # session code -> last multi-interval commitment, kept in the app process
+_warm_lock = threading.Lock()
+
+def build_units(params, bids):
+    """Unit data per seller; a bid may override 'startup_cost', 'min_up', 'pmin' or 'ramp'"""
+    df = bidtable.frame(bids)
+    if 'quantity' not in df:
+        df['quantity'] = 1  # each seller offers 1 MW unless the bid says otherwise
+    slow = np.zeros(len(df), dtype=bool)
+    slow[np.argsort(df['MC'].to_numpy(), kind='stable')[:params.get('n_slow', 0)]] = True
+    df['type'] = np.where(slow, 'non-fast-start', 'fast-start')
+    def column(name, slow_value, fast_value):
+        default = np.where(slow, slow_value, fast_value)
+        if name in df:
+            return df[name].fillna(pd.Series(default, index=df.index)).to_numpy(float)
+        return default.astype(float)
+    units = {
+        'price': df['price'].to_numpy(float),
+        'pmax': df['quantity'].to_numpy(float),
+        'pmin': column('pmin', df['quantity'].to_numpy(float), 0.0),
+        'startup_cost': column('startup_cost', params['startup_cost'], 0.0),
+        'min_up': column('min_up', params['min_up'], 1),
+        'ramp': column('ramp', np.inf, np.inf),
+    }
+    return units, df
+
+def clear_intervals(params, bids, mechanism, previous=None):
+    """(result, df) for one mechanism; previous: last round's commitment to warm-start 'multi'"""
+    units, df = build_units(params, bids)
+    demand = params['demand_profile']
+    if mechanism == 'multi':
+        result = solve_unit_commitment(units, demand, params['time_limit'], previous)
+    else:
+        result = solve_sequential(units, demand, params['time_limit'])
+    if not result['feasible']:
+        return result, df
+    mc = df['MC'].to_numpy(float)
+    startups = result['startup'].sum(axis=1)
+    df['MWh'] = result['dispatch'].sum(axis=1)
+    df['startups'] = startups
+    df['revenue'] = result['revenue']
+    df['cost'] = (result['dispatch'] * mc[:, None]).sum(axis=1) + startups * units['startup_cost']
+    df['uplift'] = result['uplift'] if mechanism != 'sequential' else 0.0
+    df['profit'] = df['revenue'] + df['uplift'] - df['cost']
+    if mechanism == 'multi':
+        result['sequential_cost'] = solve_sequential(units, demand, params['time_limit']).get('cost')
+    return result, df
+
+def cached_intervals(params, bids, mechanism, session_code=None):
+    """(result, df) solved in the worker pool and cached; None (with progress shown) while solving"""
+    key = cache.make_key(session_code, bids, params, 'intervals-' + mechanism)
+    # workers keep no state between jobs: the warm start travels with the job
+    with _warm_lock:
+        previous = _warm.get(session_code) if mechanism == 'multi' and session_code is not None else None
+    out = jobs.run(key, clear_intervals, params, bids, mechanism, previous,
+                   label="Solving the unit commitment...", timeout=4 * params['time_limit'] + 30)
+    if out is not None and mechanism == 'multi' and session_code is not None and out[0]['feasible']:
+        with _warm_lock:
+            _warm[session_code] = out[0]['commitment']
+    return out
+
+def intervals_teacher_view(params, bids, mechanism, session_code=None):
+    st.subheader(MECHANISM_TITLES[mechanism])
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit bids...")
+        return
+    out = cached_intervals(params, bids, mechanism, session_code)
+    if out is None:
+        return
+    result, df = out
+    if not result['feasible']:
+        st.warning("No feasible schedule: not enough capacity to meet demand in every period!")
+        return
+    if result['timed_out']:
+        st.caption("Time budget reached; showing the best schedule found.")
+    periods = [f"T{t + 1}" for t in range(len(result['prices']))]
+    st.dataframe(pd.DataFrame({'period': periods, 'demand': params['demand_profile'], 'price': result['prices']}))
+    st.write(f"**Total As-Bid Cost:** ${result['cost']:.2f} | **Total Uplift:** ${df['uplift'].sum():.2f}")
+    if mechanism == 'multi' and result.get('sequential_cost') is not None:
+        st.write(f"**Period-by-period clearing would cost:** ${result['sequential_cost']:.2f}")
+    st.dataframe(df[['username', 'type', 'MC', 'price', 'MWh', 'startups', 'revenue', 'cost', 'uplift', 'profit']])
+    fig = go.Figure(go.Heatmap(z=result['dispatch'], x=periods, y=df['username'], colorscale='Greens',
+                               colorbar=dict(title='MW')))
+    fig.update_layout(xaxis_title='Period', yaxis_title='Seller', title='Dispatch Schedule')
+    st.plotly_chart(fig, use_container_width=True)
+
+def intervals_student_view(params, bids, user_info, mechanism, session_code=None):
+    st.subheader("Market Status")
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit bids...")
+        return
+    out = cached_intervals(params, bids, mechanism, session_code)
+    if out is None:
+        return
+    result, df = out
+    if not result['feasible']:
+        st.warning("No feasible schedule: not enough capacity to meet demand in every period!")
+        return
+    i = df.index[df['username'] == user_info['username']][0]
+    me = df.loc[i]
+    st.write(f"**Your Unit:** {me['type']} | **Prices:** " + ", ".join(f"${p:g}" for p in result['prices']))
+    schedule = pd.DataFrame({'period': [f"T{t + 1}" for t in range(len(result['prices']))],
+                             'dispatch (MW)': result['dispatch'][i], 'price': result['prices']})
+    st.dataframe(schedule)
+    if me['MWh'] > 0:
+        st.success(f"You produced {me['MWh']:g} MWh. Your profit: ${me['profit']:.2f}")
+    else:
+        st.info("You are NOT dispatched.")
+    if me['uplift'] > 0:
+        st.write(f"**Make-whole uplift received:** ${me['uplift']:.2f}")
+
+def teacher_view(params, bids, session_code=None):
+    intervals_teacher_view(params, bids, 'sequential', session_code)
+
+def student_view(params, bids, user_info, session_code=None):
+    intervals_student_view(params, bids, user_info, 'sequential', session_code)
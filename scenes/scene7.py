@@ -0,0 +1,11 @@
+from .scene6 import intervals_teacher_view, intervals_student_view
+from .scene6 import default_params as _interval_params
+
+# Cost Recovery Guarantees: same clearing as scene 6, plus make-whole uplift for unrecovered as-bid costs.
+default_params = dict(_interval_params)
+
+def teacher_view(params, bids, session_code=None):
+    intervals_teacher_view(params, bids, 'guarantee', session_code)
+
+def student_view(params, bids, user_info, session_code=None):
+    intervals_student_view(params, bids, user_info, 'guarantee', session_code)
@@ -0,0 +1,13 @@
+from .scene6 import intervals_teacher_view, intervals_student_view
+from .scene6 import default_params as _interval_params
+
+# Multi-Interval Optimization: all 24 hours cleared jointly (MILP), warm-started from the previous round.
+default_params = dict(_interval_params) | {
+    'demand_profile': [3, 3, 3, 3, 3, 4, 5, 6, 6, 5, 5, 5, 5, 5, 5, 6, 7, 8, 8, 7, 6, 5, 4, 3],  # MW per hour
+}
+
+def teacher_view(params, bids, session_code=None):
+    intervals_teacher_view(params, bids, 'multi', session_code)
+
+def student_view(params, bids, user_info, session_code=None):
+    intervals_student_view(params, bids, user_info, 'multi', session_code)
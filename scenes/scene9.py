@@ -0,0 +1,63 @@
+import streamlit as st
+from . import cache, jobs, figures, planning
+
+# Planning Risk: the submitted number is the capacity (MW) a student builds; its profit is
+# evaluated over sampled demand, fuel-price and outage scenarios.
+default_params = planning.default_planning_params | {
+    'max_capacity': 5.0,  # MW a single student may build
+}
+
+MAX_PROFIT_SERIES = 10  # participants overlaid in the profit distribution chart
+
+def _capacity_bids(params, bids):
+    return [b | {'capacity': min(max(float(b['price']), 0.0), params['max_capacity'])} for b in bids]
+
+def planning_result(params, bids, session_code=None):
+    """Scenario evaluation of the submitted capacities, run in the worker pool (None while running)"""
+    return jobs.run(cache.make_key(session_code, bids, params, 'planning'), planning.evaluate_bids, params,
+                    _capacity_bids(params, bids), label=f"Evaluating {int(params['n_scenarios'])} scenarios...")
+
+def _system_summary(result):
+    st.write(f"**Expected price:** ${result['mean_price']:.2f}  |  "
+             f"**Shortage probability:** {result['shortage_prob']:.1%}  |  "
+             f"**Expected unserved demand:** {result['expected_unserved']:.2f} MW")
+
+def teacher_view(params, bids, session_code=None):
+    st.subheader("Planning Risk Result")
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit their capacity...")
+        return
+    out = planning_result(params, bids, session_code)
+    if out is None:
+        return
+    df, result = out
+    _system_summary(result)
+    cvar_label = f"CVaR {params['alpha']:.0%}"
+    table = df[['username', 'MC', 'capacity', 'expected_profit', 'std', 'var', 'cvar', 'loss_prob']]
+    st.dataframe(table.rename(columns={'var': f"VaR {params['alpha']:.0%}", 'cvar': cvar_label}))
+    fig = figures.histogram_json({'Price': result['sample_prices']}, 'Price ($/MWh)', 'Scenarios',
+                                 'Scenario Price Distribution')
+    st.plotly_chart(figures.from_json(fig), use_container_width=True)
+    shown = df['expected_profit'].abs().to_numpy().argsort()[::-1][:MAX_PROFIT_SERIES]
+    fig2 = figures.histogram_json({df['username'].iloc[i]: result['sample_profit'][:, i] for i in shown},
+                                  'Profit ($)', 'Scenarios', 'Profit Distribution by Participant')
+    st.plotly_chart(figures.from_json(fig2), use_container_width=True)
+
+def student_view(params, bids, user_info, session_code=None):
+    st.subheader("Market Status")
+    if not bids or not all('price' in b for b in bids):
+        st.info("Waiting for all students to submit their capacity...")
+        return
+    out = planning_result(params, bids, session_code)
+    if out is None:
+        return
+    df, result = out
+    _system_summary(result)
+    mine = df[df['username'] == user_info['username']]
+    if mine.empty:
+        return
+    me = mine.iloc[0]
+    st.write(f"You built {me['capacity']:g} MW (MC ${me['MC']:g}/MWh).")
+    st.write(f"**Expected profit:** ${me['expected_profit']:.2f} (std ${me['std']:.2f})")
+    st.write(f"**Worst {1 - params['alpha']:.0%} of scenarios (CVaR):** ${me['cvar']:.2f}  |  "
+             f"**Probability of a loss:** {me['loss_prob']:.1%}")
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from .clearing import clear_batch
+
+# Two-settlement engine (Day-Ahead + Real-Time). The DA market clears the offers against the
+# forecast demand and fixes positions Q_DA at P_DA; the RT market re-clears against realized
+# demand (and the capacity still available) at P_RT, and only deviations settle at P_RT:
+#     revenue = Q_DA * P_DA + (Q_RT - Q_DA) * P_RT
+# Every array is (sessions, sellers); sessions with fewer sellers are padded with NaN offers,
+# so a whole class, or a semester of archived sessions, settles in one vectorized call.
+PRICE_CAP = 100.0  # $/MWh: price of backup supply when offers cannot cover demand
+
+def _clear(price, quantity, mc, demand, price_cap):
+    """Uniform-price clearing of padded offers; rounds short of supply are priced at price_cap"""
+    offered = np.isfinite(price)
+    quantity = np.where(offered, quantity, 0.0)
+    result = clear_batch(np.where(offered, price, np.inf), quantity, np.nan_to_num(mc), demand)
+    supply = quantity.sum(axis=1)
+    short = supply < demand
+    mcp = np.where(short, price_cap, np.nan_to_num(result['mcp']))  # no demand: nothing to pay for
+    return mcp, result['dispatch'], np.maximum(demand - supply, 0.0)
+
+def settle_batch(price, mc, capacity, da_demand, rt_demand, available=1.0, rt_price=None, price_cap=PRICE_CAP):
+    """Clear and settle the DA and RT rounds of many sessions at once.
+
+    price / mc: (sessions, sellers) offers and marginal costs (NaN = no seller in that slot).
+    capacity and available (fraction of capacity left in RT, 0 = outage) broadcast to that shape;
+    da_demand, rt_demand and price_cap to (sessions,). rt_price: RT offers (default: the DA offers).
+    Returns prices per session and quantities, payments and profit per seller; 'single_*' is
+    what the seller would get if everything settled at P_RT (no day-ahead market).
+    """
+    price = np.atleast_2d(np.asarray(price, dtype=float))
+    shape = price.shape
+    mc = np.broadcast_to(np.asarray(mc, dtype=float), shape)
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=float), shape)
+    available = np.broadcast_to(np.asarray(available, dtype=float), shape)
+    da_demand = np.broadcast_to(np.asarray(da_demand, dtype=float), shape[:1])
+    rt_demand = np.broadcast_to(np.asarray(rt_demand, dtype=float), shape[:1])
+    price_cap = np.broadcast_to(np.asarray(price_cap, dtype=float), shape[:1])
+    rt_price = price if rt_price is None else np.broadcast_to(np.asarray(rt_price, dtype=float), shape)
+
+    p_da, q_da, da_shortfall = _clear(price, capacity, mc, da_demand, price_cap)
+    p_rt, q_rt, rt_shortfall = _clear(rt_price, capacity * available, mc, rt_demand, price_cap)
+    seller = np.isfinite(price)
+    deviation = q_rt - q_da
+    da_revenue = q_da * p_da[:, None]
+    rt_revenue = deviation * p_rt[:, None]
+    cost = q_rt * np.nan_to_num(mc)
+    single_revenue = q_rt * p_rt[:, None]
+    return {
+        'da_price': p_da,
+        'rt_price': p_rt,
+        'da_shortfall': da_shortfall,
+        'rt_shortfall': rt_shortfall,
+        'seller': seller,
+        'da_quantity': q_da,
+        'rt_quantity': q_rt,
+        'deviation': deviation,
+        'da_revenue': da_revenue,
+        'rt_revenue': rt_revenue,
+        'revenue': da_revenue + rt_revenue,
+        'cost': cost,
+        'profit': da_revenue + rt_revenue - cost,
+        'single_revenue': single_revenue,
+        'single_profit': single_revenue - cost,
+    }
+
+def pack(sessions, default_params):
+    """Padded (sessions, sellers) arrays from [(params, bids)]; bids without a price are left out"""
+    offers = [[b for b in bids if b.get('price') is not None] for _, bids in sessions]
+    width = max((len(o) for o in offers), default=0)
+    shape = (len(sessions), max(width, 1))
+    arrays = {name: np.full(shape, np.nan) for name in ('price', 'mc', 'capacity', 'available')}
+    usernames = np.full(shape, None, dtype=object)
+    for i, session_offers in enumerate(offers):
+        n = len(session_offers)
+        arrays['price'][i, :n] = [b['price'] for b in session_offers]
+        arrays['mc'][i, :n] = [b['MC'] for b in session_offers]
+        arrays['capacity'][i, :n] = [b.get('quantity', 1) for b in session_offers]
+        arrays['available'][i, :n] = [b.get('available', 1) for b in session_offers]
+        usernames[i, :n] = [b['username'] for b in session_offers]
+    params = [default_params | p for p, _ in sessions]
+    for name in ('da_demand', 'rt_demand', 'price_cap'):
+        arrays[name] = np.array([p[name] for p in params], dtype=float)
+    # per-session capacity default (a bid's 'quantity' overrides it)
+    per_session = np.array([p.get('capacity', 1) for p in params], dtype=float)[:, None]
+    explicit = np.array([[b.get('quantity') is not None for b in o] + [False] * (shape[1] - len(o))
+                         for o in offers], dtype=bool).reshape(shape)
+    arrays['capacity'] = np.where(explicit, arrays['capacity'], per_session)
+    return arrays, usernames
+
+def settle_sessions(sessions, default_params, labels=None):
+    """Settle [(params, bids)] in one batch; returns (per-seller DataFrame, per-session DataFrame)"""
+    labels = list(range(len(sessions))) if labels is None else list(labels)
+    if not sessions:
+        return pd.DataFrame(), pd.DataFrame()
+    arrays, usernames = pack(sessions, default_params)
+    result = settle_batch(arrays['price'], arrays['mc'], arrays['capacity'], arrays['da_demand'],
+                          arrays['rt_demand'], np.nan_to_num(arrays['available'], nan=1.0),
+                          price_cap=arrays['price_cap'])
+    rows, cols = np.nonzero(result['seller'])
+    sellers = pd.DataFrame({
+        'session': np.asarray(labels, dtype=object)[rows],
+        'username': usernames[rows, cols],
+        'MC': arrays['mc'][rows, cols],
+        'price': arrays['price'][rows, cols],
+        **{name: result[name][rows, cols] for name in ('da_quantity', 'rt_quantity', 'deviation', 'da_revenue',
+                                                       'rt_revenue', 'revenue', 'cost', 'profit',
+                                                       'single_revenue', 'single_profit')},
+    })
+    summary = pd.DataFrame({
+        'session': labels,
+        'da_demand': arrays['da_demand'],
+        'rt_demand': arrays['rt_demand'],
+        'da_price': result['da_price'],
+        'rt_price': result['rt_price'],
+        'da_shortfall': result['da_shortfall'],
+        'rt_shortfall': result['rt_shortfall'],
+        'sellers': result['seller'].sum(axis=1),
+    })
+    return sellers, summary
+
+def _load_live(scene_id):
+    import db
+    for session in db.get_all_sessions():
+        if session['scene_id'] == scene_id:
+            params = db.get_session_params(session['code'])
+            if params is not None:
+                yield session['code'], params, db.get_bids(session['code'])
+
+def _load_archived(scene_id):
+    import db
+    import expiry
+    for code in expiry.archived('sessions'):
+        document = expiry.load_archive('sessions', code)
+        if document is None or document.get('scene_id') != scene_id:
+            continue
+        bids = {}
+        for _, table in db.replay_session(code):
+            bids = table
+        yield code, document['params'], [dict(username=user, **info) for user, info in bids.items()]
+
+def settle_class(scene_id, default_params, archived=False):
+    """Settle every live session of a scene (and with archived=True, every archived one) in one batch"""
+    loaded = list(_load_live(scene_id))
+    if archived:
+        loaded += list(_load_archived(scene_id))
+    return settle_sessions([(params, bids) for _, params, bids in loaded], default_params,
+                           labels=[code for code, _, _ in loaded])
@@ -0,0 +1,118 @@
+import numpy as np
+from .clearing import clear_batch
+
+# Headless Monte-Carlo runner: automated sellers play many rounds of a scene without the UI.
+
+STRATEGIES = ['truthful', 'markup', 'learning']
+MARKUP_GRID = np.array([0.0, 0.1, 0.2, 0.3, 0.5, 0.8, 1.0])  # actions available to learning bidders
+
+default_sim_params = {
+    'demand': 5,            # MW, used when no demand distribution is given
+    'demand_levels': None,  # e.g. [2, 3, 4] (off-peak in the scene 1 design)
+    'demand_probs': None,   # e.g. [0.2, 0.6, 0.2]
+    'n_bidders': 10,
+    'mc_low': 20,
+    'mc_high': 80,
+    'markup': 0.2,          # fraction above MC for the 'markup' strategy
+    'epsilon': 0.1,         # exploration rate of 'learning' bidders
+}
+
+def _sample_demand(params, rng, rounds):
+    levels = params.get('demand_levels')
+    if levels:
+        return rng.choice(np.asarray(levels, dtype=float), size=rounds, p=params.get('demand_probs'))
+    return np.full(rounds, float(params['demand']))
+
+def _strategy_array(strategy, n_bidders):
+    if isinstance(strategy, str):
+        strategy = [strategy] * n_bidders
+    strategy = np.asarray(strategy)
+    unknown = set(strategy) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategy: {', '.join(sorted(unknown))}")
+    return strategy
+
+def run_simulation(params, n_rounds, strategy='truthful', pricing='uniform', seed=None):
+    """Play n_rounds of scene 1 with automated bidders; returns per-round arrays.
+
+    strategy: one name from STRATEGIES for everyone, or one name per bidder.
+    pricing: 'uniform' (Single-price) or 'pay_as_bid'.
+    """
+    params = default_sim_params | params
+    rng = np.random.default_rng(seed)
+    n = params['n_bidders']
+    strategy = _strategy_array(strategy, n)
+    mc = rng.integers(params['mc_low'], params['mc_high'] + 1, size=n).astype(float)
+    demand = _sample_demand(params, rng, n_rounds)
+    markup = np.where(strategy == 'markup', params['markup'], 0.0)
+    learners = np.flatnonzero(strategy == 'learning')
+
+    if len(learners) == 0:
+        # no state between rounds: every round clears in one batched call
+        result = clear_batch(np.tile(mc * (1 + markup), (n_rounds, 1)), 1.0, mc, demand, pricing)
+        chosen = np.tile(markup, (n_rounds, 1))
+    else:
+        # learning bidders: epsilon-greedy over MARKUP_GRID, vectorized across bidders
+        value = np.zeros((len(learners), len(MARKUP_GRID)))
+        count = np.zeros_like(value)
+        rows = np.arange(len(learners))
+        chosen = np.tile(markup, (n_rounds, 1))
+        result = {'mcp': np.empty(n_rounds), 'profit': np.empty((n_rounds, n)),
+                  'consumer_cost': np.empty(n_rounds), 'dispatch': np.empty((n_rounds, n)),
+                  'sufficient': np.empty(n_rounds, dtype=bool)}
+        for r in range(n_rounds):
+            greedy = value.argmax(axis=1)
+            explore = rng.random(len(learners)) < params['epsilon']
+            action = np.where(explore, rng.integers(len(MARKUP_GRID), size=len(learners)), greedy)
+            chosen[r, learners] = MARKUP_GRID[action]
+            round_result = clear_batch(mc * (1 + chosen[r]), 1.0, mc, demand[r:r + 1], pricing)
+            for key in result:
+                result[key][r] = round_result[key][0]
+            reward = round_result['profit'][0, learners]
+            count[rows, action] += 1
+            value[rows, action] += (reward - value[rows, action]) / count[rows, action]
+
+    return {
+        'mc': mc,
+        'strategy': strategy,
+        'demand': demand,
+        'markup': chosen,
+        'mcp': result['mcp'],
+        'profit': result['profit'],
+        'dispatch': result['dispatch'],
+        'consumer_cost': result['consumer_cost'],
+        'sufficient': result['sufficient'],
+    }
+
+def run_seed(params, n_rounds, strategy, seed):
+    """Both pricing rules for one seed (same MCs and demand draws); one scenes.jobs job per seed"""
+    runs = {}
+    for pricing in ('uniform', 'pay_as_bid'):
+        run = run_simulation(params, n_rounds, strategy, pricing, seed)
+        runs[pricing] = {k: run[k] for k in ('mcp', 'profit', 'consumer_cost', 'markup', 'sufficient')}
+    return runs
+
+def run_monte_carlo(params, n_rounds=1000, n_seeds=8, strategy='truthful'):
+    """Compare Single-price and Pay-as-Bid over independent seeds, all in this process.
+
+    Views instead submit one run_seed() job per seed to the scenes.jobs pool and combine the
+    results with combine_seeds().
+    """
+    return combine_seeds([run_seed(params, n_rounds, strategy, seed) for seed in range(n_seeds)])
+
+def combine_seeds(per_seed):
+    """Per pricing rule: run_seed() arrays stacked over seeds x rounds plus a summary dict"""
+    results = {}
+    for pricing in ('uniform', 'pay_as_bid'):
+        stacked = {k: np.stack([s[pricing][k] for s in per_seed]) for k in per_seed[0][pricing]}
+        profit_per_seller = stacked['profit'].mean(axis=1)  # seeds x sellers
+        stacked['summary'] = {
+            'mcp_mean': float(np.nanmean(stacked['mcp'])),
+            'mcp_p5': float(np.nanpercentile(stacked['mcp'], 5)),
+            'mcp_p95': float(np.nanpercentile(stacked['mcp'], 95)),
+            'consumer_cost_mean': float(stacked['consumer_cost'].mean()),
+            'seller_profit_mean': float(profit_per_seller.sum(axis=1).mean()),
+            'shortage_rounds': int((~stacked['sufficient']).sum()),
+        }
+        results[pricing] = stacked
+    return results
@@ -0,0 +1,195 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, linprog, LinearConstraint, Bounds
+
+# Time-coupled clearing for the Fixed Costs / Cost Recovery / Multi-Interval scenes.
+# units: dict of equal-length arrays
+#   price (offer $/MWh), pmax, pmin, startup_cost, no_load_cost, min_up (periods),
+#   ramp (MW per period), initial_on (bool), initial_up (periods already on)
+
+def _unit_arrays(units):
+    n = len(units['price'])
+    def col(name, default):
+        return np.broadcast_to(np.asarray(units.get(name, default), dtype=float), (n,)).copy()
+    pmax = col('pmax', 1.0)
+    return {
+        'price': col('price', 0.0),
+        'pmax': pmax,
+        'pmin': col('pmin', 0.0),
+        'startup_cost': col('startup_cost', 0.0),
+        'no_load_cost': col('no_load_cost', 0.0),
+        'min_up': col('min_up', 1).astype(int),
+        'ramp': np.where(np.isfinite(col('ramp', np.inf)), col('ramp', np.inf), pmax),
+        'initial_on': col('initial_on', 0).astype(bool),
+        'initial_up': col('initial_up', 0).astype(int),
+        'initial_p': col('initial_p', 0.0),
+    }
+
+def _build_model(u, demand):
+    """Constraint matrices over x = [commit (n*T), startup (n*T), output (n*T)], index i*T + t"""
+    n, T = len(u['price']), len(demand)
+    nt = n * T
+    U, V, P = 0, nt, 2 * nt
+    idx = np.arange(nt).reshape(n, T)
+    rows, cols, vals, lo, hi = [], [], [], [], []
+    r = 0
+
+    def add(entries, lower, upper):
+        nonlocal r
+        for c, v in entries:
+            rows.append(r)
+            cols.append(c)
+            vals.append(v)
+        lo.append(lower)
+        hi.append(upper)
+        r += 1
+
+    for t in range(T):  # power balance (first T rows; their duals are the hourly prices)
+        add([(P + idx[i, t], 1.0) for i in range(n)], demand[t], demand[t])
+    for i in range(n):
+        for t in range(T):
+            # output limits: pmin*commit <= output <= pmax*commit
+            add([(P + idx[i, t], 1.0), (U + idx[i, t], -u['pmax'][i])], -np.inf, 0.0)
+            add([(P + idx[i, t], 1.0), (U + idx[i, t], -u['pmin'][i])], 0.0, np.inf)
+            # startup indicator: startup >= commit_t - commit_{t-1}
+            if t == 0:
+                add([(V + idx[i, t], 1.0), (U + idx[i, t], -1.0)], -float(u['initial_on'][i]), np.inf)
+            else:
+                add([(V + idx[i, t], 1.0), (U + idx[i, t], -1.0), (U + idx[i, t - 1], 1.0)], 0.0, np.inf)
+            # minimum up time: startups in the last min_up periods <= commit_t
+            window = range(max(0, t - u['min_up'][i] + 1), t + 1)
+            add([(V + idx[i, s], 1.0) for s in window] + [(U + idx[i, t], -1.0)], -np.inf, 0.0)
+            # ramp limits (a unit may jump to pmax on the period it starts, and drop to 0 when it stops)
+            if t == 0:
+                prev = u['initial_p'][i] if u['initial_on'][i] else 0.0
+                add([(P + idx[i, t], 1.0), (V + idx[i, t], -u['pmax'][i])], -np.inf, prev + u['ramp'][i])
+            else:
+                add([(P + idx[i, t], 1.0), (P + idx[i, t - 1], -1.0), (U + idx[i, t - 1], -u['ramp'][i]),
+                     (V + idx[i, t], -u['pmax'][i])], -np.inf, 0.0)
+                add([(P + idx[i, t - 1], 1.0), (P + idx[i, t], -1.0),
+                     (U + idx[i, t], u['pmax'][i] - u['ramp'][i])], -np.inf, u['pmax'][i])
+    matrix = sp.csr_matrix((vals, (rows, cols)), shape=(r, 3 * nt))
+    # a tiny commitment cost breaks ties so zero-cost units are not committed when idle
+    commit_cost = np.repeat(u['no_load_cost'], T) + 1e-6
+    cost = np.concatenate([commit_cost, np.repeat(u['startup_cost'], T), np.repeat(u['price'], T)])
+    lower = np.zeros(3 * nt)
+    upper = np.concatenate([np.ones(2 * nt), np.repeat(u['pmax'], T)])
+    # units still inside their minimum up time at the start of the horizon must stay on
+    for i in range(n):
+        if u['initial_on'][i]:
+            lower[U + idx[i, :max(0, min(T, u['min_up'][i] - u['initial_up'][i]))]] = 1.0
+    return matrix, np.array(lo), np.array(hi), cost, lower, upper
+
+def _pricing_run(matrix, lo, hi, cost, lower, upper, commit, T):
+    """Fix the commitment and re-solve as an LP; balance duals give the hourly prices"""
+    nt = len(commit.ravel())
+    lower, upper = lower.copy(), upper.copy()
+    lower[:nt] = upper[:nt] = commit.ravel()
+    eq = np.isclose(lo, hi)
+    a_ub = sp.vstack([matrix[~eq & np.isfinite(hi)], -matrix[~eq & np.isfinite(lo)]])
+    b_ub = np.r_[hi[~eq & np.isfinite(hi)], -lo[~eq & np.isfinite(lo)]]
+    res = linprog(cost, A_ub=a_ub, b_ub=b_ub, A_eq=matrix[eq], b_eq=lo[eq],
+                  bounds=np.c_[lower, upper], method='highs')
+    if res.status != 0:
+        return None, None
+    return res, res.eqlin.marginals[:T]
+
+def solve_unit_commitment(units, demand, time_limit=5.0, previous=None, mip_gap=1e-4):
+    """Clear all periods jointly as a MILP (HiGHS) and price them with a fixed-commitment LP.
+
+    previous: the previous round's commitment (units x periods), re-evaluated first; when still
+    feasible its cost bounds the search and it is the fallback if the time budget runs out. Returns commitment, dispatch, hourly prices, per-unit revenue, as-bid cost and
+    make-whole uplift (as-bid cost not covered by market revenue).
+    """
+    u = _unit_arrays(units)
+    demand = np.asarray(demand, dtype=float)
+    n, T = len(u['price']), len(demand)
+    nt = n * T
+    matrix, lo, hi, cost, lower, upper = _build_model(u, demand)
+    integrality = np.concatenate([np.ones(nt), np.zeros(2 * nt)])
+
+    incumbent = None
+    previous = np.asarray(previous, dtype=float) if previous is not None else None
+    constraints = [LinearConstraint(matrix, lo, hi)]
+    if previous is not None and previous.shape == (n, T):
+        res, _ = _pricing_run(matrix, lo, hi, cost, lower, upper, previous, T)
+        if res is not None:
+            incumbent = res
+            # objective cut: only schedules at least as cheap as last round's are explored
+            constraints.append(LinearConstraint(cost[None, :], -np.inf, res.fun * (1 + 1e-9) + 1e-6))
+
+    result = milp(cost, integrality=integrality, bounds=Bounds(lower, upper), constraints=constraints,
+                  options={'time_limit': time_limit, 'mip_rel_gap': mip_gap})
+    if result.x is not None:
+        commit = np.round(result.x[:nt]).reshape(n, T)
+        timed_out = result.status == 1
+    elif incumbent is not None:
+        commit = previous
+        timed_out = True
+    else:
+        return {'feasible': False, 'message': result.message}
+
+    res, prices = _pricing_run(matrix, lo, hi, cost, lower, upper, commit, T)
+    if res is None:
+        return {'feasible': False, 'message': "Pricing run infeasible"}
+    startup = res.x[nt:2 * nt].reshape(n, T)
+    output = res.x[2 * nt:].reshape(n, T) + 0.0
+    revenue = (output * prices).sum(axis=1)
+    as_bid_cost = (output * u['price'][:, None]).sum(axis=1) + startup.sum(axis=1) * u['startup_cost'] \
+        + commit.sum(axis=1) * u['no_load_cost']
+    uplift = np.maximum(as_bid_cost - revenue, 0.0) + 0.0
+    return {
+        'feasible': True,
+        'timed_out': timed_out,
+        'commitment': commit.astype(bool),
+        'startup': startup > 0.5,
+        'dispatch': output,
+        'prices': prices,
+        'cost': float(res.fun),
+        'revenue': revenue,
+        'as_bid_cost': as_bid_cost,
+        'uplift': uplift,
+    }
+
+def solve_sequential(units, demand, time_limit=5.0):
+    """Myopic benchmark: clear each period on its own, carrying commitments forward.
+
+    This is what a single-interval market does with non-fast-start units; compare it with
+    solve_unit_commitment to show the value of multi-interval optimization.
+    """
+    u = _unit_arrays(units)
+    demand = np.asarray(demand, dtype=float)
+    n, T = len(u['price']), len(demand)
+    state = {k: u[k].copy() for k in u}
+    keys = ('commitment', 'startup', 'dispatch')
+    out = {k: np.zeros((n, T)) for k in keys}
+    prices = np.zeros(T)
+    for t in range(T):
+        step = solve_unit_commitment(state, demand[t:t + 1], time_limit=time_limit / T)
+        if not step['feasible']:
+            return step
+        for k in keys:
+            out[k][:, t] = step[k][:, 0]
+        prices[t] = step['prices'][0]
+        on = step['commitment'][:, 0]
+        state['initial_up'] = np.where(on, np.where(state['initial_on'], state['initial_up'] + 1, 1), 0)
+        state['initial_on'] = on
+        state['initial_p'] = step['dispatch'][:, 0]
+    commit = out['commitment'].astype(bool)
+    startup = out['startup'].astype(bool)
+    output = out['dispatch']
+    revenue = (output * prices).sum(axis=1)
+    as_bid_cost = (output * u['price'][:, None]).sum(axis=1) + startup.sum(axis=1) * u['startup_cost'] \
+        + commit.sum(axis=1) * u['no_load_cost']
+    return {
+        'feasible': True,
+        'timed_out': False,
+        'commitment': commit,
+        'startup': startup,
+        'dispatch': output,
+        'prices': prices,
+        'cost': float(as_bid_cost.sum()),
+        'revenue': revenue,
+        'as_bid_cost': as_bid_cost,
+        'uplift': np.maximum(as_bid_cost - revenue, 0.0) + 0.0,
+    }
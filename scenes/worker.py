@@ -0,0 +1,16 @@
+import os
+import metrics
+
+# Entry module of the scene job workers (scenes.jobs). Workers are forked from a single-threaded
+# forkserver that has imported this module and the job modules, not from the app process, so
+# they start with clean state (no app threads, locks or metrics) and no fork-time deadlocks.
+
+def init(pids):
+    """Pool initializer: report this worker's pid so the app can stop it if a job gets stuck"""
+    pids.put(os.getpid())
+
+def run_job(fn, args):
+    """Run one job and hand the metrics it recorded back to the app process"""
+    metrics.reset()  # a worker runs many jobs: report this one's only
+    result = fn(*args)
+    return result, metrics.raw()
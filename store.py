@@ -0,0 +1,565 @@
+import sqlite3
+import threading
+import json
+import os
+from datetime import datetime
+import pubsub
+import eventlog
+import metrics
+import expiry
+import backend
+
+# SQLite storage for scenarios, participants and bids (shared by all Streamlit sessions).
+# Joins, bids and closes are also appended to the scenario's event log ('scenario-<id>'),
+# so a finished scenario can be replayed step by step after class. With a shared state
+# backend (backend.py) they are kept there instead, so every app host sees the same markets.
+DATA_DIR = 'data'
+DB_FILE = os.path.join(DATA_DIR, 'market.db')
+SCENARIO_TTL = 30 * 24 * 3600  # seconds after creation before a scenario is archived to cold storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    demand INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    created_at TEXT,
+    market_type TEXT,
+    is_open INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS participants (
+    scenario_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    full_name TEXT,
+    role TEXT,
+    join_time TEXT,
+    PRIMARY KEY (scenario_id, username)
+);
+CREATE TABLE IF NOT EXISTS bids (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scenario_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    price NUMERIC NOT NULL,
+    quantity NUMERIC NOT NULL,
+    bid_type TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_bids_scenario_user ON bids (scenario_id, username);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_local = threading.local()
+
+def _stream(sid):
+    return f'scenario-{sid}'
+
+def _initial_view():
+    return {'participants': {}, 'bids': {}, 'closed': False}
+
+def _apply_event(view, event):
+    kind = event['type']
+    if kind == 'join':
+        view['participants'][event['user']] = event.get('role')
+    elif kind in ('bid', 'revise'):
+        view['bids'][event['user']] = view['bids'].get(event['user'], 0) + 1
+    elif kind == 'close':
+        view['closed'] = True
+
+eventlog.register_reducer('scenario-', _initial_view, _apply_event)
+
+def get_conn():
+    """Return this thread's connection, opening it in WAL mode on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != DB_FILE:
+        os.makedirs(os.path.dirname(DB_FILE) or '.', exist_ok=True)
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+        _local.path = DB_FILE
+        _local.data_version = None
+    return conn
+
+# ------------------ 内存索引 ------------------
+# Pages read from in-memory hash indexes instead of SQLite:
+#   scenarios[sid] -> record, participants[sid] -> {username: participant},
+#   user_bids[(sid, username)] -> [bids], scenario_bids[sid] -> [bids], stats[sid] -> aggregates
+# Every write bumps meta.write_seq in its transaction and applies itself to the index; a reader
+# that finds the index behind write_seq (e.g. a write from another process) rebuilds it.
+# write_seq is only read again once PRAGMA data_version shows that another connection has
+# committed since this thread last looked, so most reads never touch the database.
+_index = {'seq': None, 'path': None}
+_index_lock = threading.RLock()
+
+def _numeric(value):
+    """Match how SQLite's NUMERIC affinity stores a number (40.0 -> 40)"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+def _bump_seq(conn):
+    conn.execute("INSERT INTO meta (key, value) VALUES ('write_seq', 1) "
+                 "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+    return int(conn.execute("SELECT value FROM meta WHERE key = 'write_seq'").fetchone()[0])
+
+def _stored_seq(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'write_seq'").fetchone()
+    return int(row[0]) if row else 0
+
+def _empty_stats():
+    return {'participants': 0, 'bids': 0, 'price_sum': 0.0}
+
+def _index_bid(index, sid, bid):
+    index['scenario_bids'].setdefault(sid, []).append(bid)
+    index['user_bids'].setdefault((sid, bid['username']), []).append(bid)
+    stats = index['stats'].setdefault(sid, _empty_stats())
+    stats['bids'] += 1
+    stats['price_sum'] += bid['price']
+
+@metrics.timed('store.rebuild_index')
+def _rebuild(conn, seq):
+    index = {'seq': seq, 'path': DB_FILE, 'scenarios': {}, 'participants': {}, 'user_bids': {},
+             'scenario_bids': {}, 'stats': {}}
+    for row in conn.execute('SELECT * FROM scenarios ORDER BY id'):
+        scenario = dict(row)
+        scenario['is_open'] = bool(scenario['is_open'])
+        index['scenarios'][scenario['id']] = scenario
+        index['participants'][scenario['id']] = {}
+        index['stats'][scenario['id']] = _empty_stats()
+    for row in conn.execute('SELECT * FROM participants ORDER BY rowid'):
+        participant = dict(row)
+        sid = participant.pop('scenario_id')
+        index['participants'].setdefault(sid, {})[participant['username']] = participant
+        index['stats'].setdefault(sid, _empty_stats())['participants'] += 1
+    for row in conn.execute('SELECT scenario_id, username, price, quantity, bid_type, created_at FROM bids ORDER BY id'):
+        bid = dict(row)
+        _index_bid(index, bid.pop('scenario_id'), bid)
+    _index.clear()
+    _index.update(index)
+
+def _view():
+    """The index, rebuilt first if some write has not been applied to it"""
+    shared = backend.get_backend()
+    if shared is not None:
+        return _shared_view(shared)
+    conn = get_conn()
+    # read before write_seq, so a commit landing in between is noticed on the next read
+    data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+    with _index_lock:
+        if _local.data_version == data_version and _index['path'] == DB_FILE:
+            return _index  # only this connection wrote since, and its writes are applied
+        seq = _stored_seq(conn)
+        if _index['seq'] != seq or _index['path'] != DB_FILE:
+            _rebuild(conn, seq)
+        _local.data_version = data_version
+        return _index
+
+def _apply(seq, update):
+    """Apply one committed write to the index, unless the index missed an earlier one"""
+    with _index_lock:
+        if _index['seq'] == seq - 1 and _index['path'] == DB_FILE:
+            update(_index)
+            _index['seq'] = seq
+
+def _drop_scenario(index, sid):
+    for bid in index['scenario_bids'].pop(sid, []):
+        index['user_bids'].pop((sid, bid['username']), None)
+    for table in ('scenarios', 'participants', 'stats'):
+        index[table].pop(sid, None)
+
+def _stored_version(channel):
+    return _view()['seq']  # write_seq: also moves when another process (or host) writes
+
+pubsub.add_source('scenario', _stored_version)  # 'scenarios' and 'scenario:<id>'
+
+# ------------------ 场景 ------------------
+def _scenario_dict(index, sid):
+    return index['scenarios'][sid] | {'participants': index['stats'][sid]['participants']}
+
+def list_scenarios():
+    index = _view()
+    return [_scenario_dict(index, sid) for sid in sorted(index['scenarios'])]
+
+def get_scenario(sid):
+    index = _view()
+    return _scenario_dict(index, sid) if sid in index['scenarios'] else None
+
+def create_scenario(name, description, demand, market_type, is_open=True, status='active'):
+    """Create a scenario and return its id"""
+    sid = int(datetime.now().timestamp())
+    scenario = {'name': name, 'description': description, 'demand': demand, 'status': status,
+                'created_at': datetime.now().strftime('%Y-%m-%d'), 'market_type': market_type, 'is_open': is_open}
+    shared = backend.get_backend()
+    if shared is not None:
+        sid = _shared_create_scenario(shared, sid, scenario)
+        _schedule_expiry(sid, scenario)
+        pubsub.publish('scenarios')
+        return sid
+    conn = get_conn()
+    while True:
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO scenarios (id, name, description, demand, status, created_at, market_type, is_open) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (sid, name, description, demand, status, scenario['created_at'], market_type, int(is_open))
+                )
+                seq = _bump_seq(conn)
+            break
+        except sqlite3.IntegrityError:
+            # ids are creation timestamps; the primary key rejects an id another writer (or
+            # process) already took, so bump it instead of overwriting
+            sid += 1
+
+    def update(index):
+        index['scenarios'][sid] = {'id': sid} | scenario
+        index['participants'][sid] = {}
+        index['stats'][sid] = _empty_stats()
+    _apply(seq, update)
+    _schedule_expiry(sid, scenario)
+    pubsub.publish('scenarios')
+    return sid
+
+def delete_scenario(sid):
+    """Delete a scenario with its participants and bids; they are moved to cold storage with its event history"""
+    document = {'scenario': get_scenario(sid), 'participants': get_participants(sid), 'bids': get_bids(sid)}
+    shared = backend.get_backend()
+    if shared is not None:
+        deleted = _shared_delete_scenario(shared, sid)
+        if deleted:
+            document['events'] = _scenario_events(document['participants'], document['bids']) + [{'type': 'close'}]
+            expiry.archive('scenarios', sid, document)
+    else:
+        conn = get_conn()
+        with conn:
+            conn.execute('DELETE FROM bids WHERE scenario_id = ?', (sid,))
+            conn.execute('DELETE FROM participants WHERE scenario_id = ?', (sid,))
+            deleted = conn.execute('DELETE FROM scenarios WHERE id = ?', (sid,)).rowcount > 0
+            seq = _bump_seq(conn)
+        _apply(seq, lambda index: _drop_scenario(index, sid))
+        if deleted:
+            eventlog.append(_stream(sid), 'close')
+            document['events'] = list(eventlog.read_events(_stream(sid)))
+            expiry.archive('scenarios', sid, document)
+            eventlog.remove(_stream(sid))
+    expiry.cancel(('scenario', sid))
+    pubsub.publish('scenarios')
+    pubsub.publish(f'scenario:{sid}')
+    return deleted
+
+# ------------------ 参与者 ------------------
+def get_participants(sid):
+    return [dict(p) for p in _view()['participants'].get(sid, {}).values()]
+
+def is_participant(sid, username):
+    return username in _view()['participants'].get(sid, {})
+
+def add_participant(sid, username, full_name, role):
+    """Add a participant; returns False if the user had already joined"""
+    participant = {'username': username, 'full_name': full_name, 'role': role,
+                   'join_time': datetime.now().strftime('%Y-%m-%d')}
+    shared = backend.get_backend()
+    if shared is not None:
+        if not _shared_add_participant(shared, sid, participant):
+            return False
+        pubsub.publish('scenarios')
+        pubsub.publish(f'scenario:{sid}')
+        return True
+    conn = get_conn()
+    with conn:
+        cur = conn.execute(
+            'INSERT OR IGNORE INTO participants (scenario_id, username, full_name, role, join_time) VALUES (?, ?, ?, ?, ?)',
+            (sid, username, full_name, role, participant['join_time'])
+        )
+        if cur.rowcount == 0:
+            return False
+        seq = _bump_seq(conn)
+
+    def update(index):
+        index['participants'].setdefault(sid, {})[username] = participant
+        index['stats'].setdefault(sid, _empty_stats())['participants'] += 1
+    _apply(seq, update)
+    eventlog.append(_stream(sid), 'join', user=username, role=role)
+    pubsub.publish('scenarios')  # participant count shown on the list page
+    pubsub.publish(f'scenario:{sid}')
+    return True
+
+# ------------------ 报价 ------------------
+def get_bids(sid, username=None):
+    index = _view()
+    bids = index['scenario_bids'].get(sid, []) if username is None else index['user_bids'].get((sid, username), [])
+    return [dict(b) for b in bids]
+
+def get_bid_summary(sid):
+    """Bid count and mean price of a scenario (maintained on every write, O(1))"""
+    stats = _view()['stats'].get(sid, _empty_stats())
+    return {
+        'count': stats['bids'],
+        'mean_price': stats['price_sum'] / stats['bids'] if stats['bids'] else None,
+    }
+
+def add_bid(sid, username, price, quantity, bid_type):
+    """Append a bid (a single INSERT, independent of how many bids exist)"""
+    add_bids(sid, [{'username': username, 'price': price, 'quantity': quantity, 'bid_type': bid_type}])
+
+def add_bids(sid, bids):
+    """Append many bids [{'username', 'price', 'quantity', 'bid_type'}] in one transaction, one
+    event-log append and one notification; returns how many were added"""
+    if not bids:
+        return 0
+    created_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+    rows = [{'username': b['username'], 'price': _numeric(b['price']), 'quantity': _numeric(b['quantity']),
+             'bid_type': b['bid_type'], 'created_at': created_at} for b in bids]
+    shared = backend.get_backend()
+    if shared is not None:
+        _shared_add_bids(shared, sid, rows)
+        pubsub.publish(f'scenario:{sid}')
+        return len(rows)
+    conn = get_conn()
+    with conn:
+        conn.executemany(
+            'INSERT INTO bids (scenario_id, username, price, quantity, bid_type, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            [(sid, b['username'], b['price'], b['quantity'], b['bid_type'], created_at) for b in bids]
+        )
+        seq = _bump_seq(conn)
+
+    def update(index):
+        for bid in rows:
+            _index_bid(index, sid, bid)
+    _apply(seq, update)
+
+    eventlog.transact(_stream(sid), lambda view: _bid_events(set(view['bids']), bids))
+    pubsub.publish(f'scenario:{sid}')
+    return len(rows)
+
+def _bid_events(seen, bids):
+    """Event-log records of bids, given the users who had bid before (updated in place)"""
+    events = []
+    for b in bids:
+        events.append({'type': 'revise' if b['username'] in seen else 'bid', 'user': b['username'],
+                       'price': b['price'], 'quantity': b['quantity'], 'bid_type': b['bid_type']})
+        seen.add(b['username'])
+    return events
+
+def _scenario_events(participants, bids):
+    """The event history of a scenario rebuilt from its records (the shared backend keeps no event log)"""
+    joins = [{'type': 'join', 'user': p['username'], 'role': p.get('role')} for p in participants]
+    return joins + _bid_events(set(), bids)
+
+def get_latest_bids(sid):
+    """Each user's latest bid per bid type (a later bid revises the earlier one)"""
+    latest = {}
+    for bid in get_bids(sid):
+        latest[(bid['username'], bid['bid_type'])] = bid
+    return list(latest.values())
+
+def replay_scenario(sid):
+    """Step through a scenario's recorded history (also once archived): yields (event, view after the event)"""
+    archived = expiry.load_archive('scenarios', sid)
+    events = archived.get('events') if archived is not None and not eventlog.exists(_stream(sid)) else None
+    if events is None and backend.get_backend() is not None and get_scenario(sid) is not None:
+        events = _scenario_events(get_participants(sid), get_bids(sid))
+    return eventlog.replay(_stream(sid), events)
+
+# ------------------ 过期归档 ------------------
+def _deadline(sid, scenario):
+    try:
+        created = datetime.fromisoformat(scenario['created_at']).timestamp()
+    except (TypeError, ValueError):
+        created = sid  # ids are creation timestamps
+    return created + SCENARIO_TTL
+
+def _schedule_expiry(sid, scenario):
+    expiry.schedule(('scenario', sid), _deadline(sid, scenario), delete_scenario, sid)
+
+_expiry_started = False
+
+def start_expiry():
+    """Schedule every scenario for archival at its deadline (idempotent; overdue ones go at once)"""
+    global _expiry_started
+    with _index_lock:
+        if _expiry_started:
+            return
+        _expiry_started = True
+        scenarios = list(_view()['scenarios'].items())
+    for sid, scenario in scenarios:
+        _schedule_expiry(sid, scenario)
+
+# ------------------ 共享后端 ------------------
+# Keys: scenario:<id> (record JSON), scenarios (set of ids), scenario:<id>:participant:<user>
+# (JSON, added once), scenario:<id>:users (set), scenario:<id>:bid:<n> (bid JSON, n taken from
+# the scenario:<id>:bid_count counter), scenario:<id>:version (bumped by every write to the
+# scenario) and scenarios:write_seq (bumped by every write). A worker reads write_seq on each
+# access and, when it moved, reloads only the scenarios whose version changed.
+SHARED = 'backend'  # _index['path'] while the index mirrors the shared backend
+WRITE_SEQ_KEY = 'scenarios:write_seq'
+
+def _shared_bump(shared, sid):
+    shared.incr(f'scenario:{sid}:version')
+    shared.incr(WRITE_SEQ_KEY)
+
+def _shared_load(shared, index, sid, version):
+    _drop_scenario(index, sid)
+    index['versions'].pop(sid, None)
+    record = shared.get(f'scenario:{sid}')
+    if record is None:
+        return  # deleted meanwhile
+    index['scenarios'][sid] = json.loads(record)
+    index['participants'][sid] = {}
+    index['stats'][sid] = stats = _empty_stats()
+    users = sorted(shared.members(f'scenario:{sid}:users'))
+    for value in shared.get_many([f'scenario:{sid}:participant:{user}' for user in users]):
+        if value is not None:
+            participant = json.loads(value)
+            index['participants'][sid][participant['username']] = participant
+            stats['participants'] += 1
+    count = int(shared.get(f'scenario:{sid}:bid_count') or 0)
+    for value in shared.get_many([f'scenario:{sid}:bid:{n}' for n in range(1, count + 1)]):
+        if value is not None:  # number taken, bid not written yet: the version bump follows
+            _index_bid(index, sid, json.loads(value))
+    index['versions'][sid] = version
+
+def _shared_view(shared):
+    seq = int(shared.get(WRITE_SEQ_KEY) or 0)  # read before the data: the index is never newer than its tag
+    with _index_lock:
+        if _index['path'] == SHARED and _index['seq'] == seq:
+            return _index
+        if _index['path'] != SHARED:
+            _index.clear()
+            _index.update(path=SHARED, scenarios={}, participants={}, user_bids={}, scenario_bids={},
+                          stats={}, versions={})
+        sids = sorted(int(sid) for sid in shared.members('scenarios'))
+        versions = shared.get_many([f'scenario:{sid}:version' for sid in sids])
+        for sid in set(_index['scenarios']) - set(sids):
+            _drop_scenario(_index, sid)
+            _index['versions'].pop(sid, None)
+        with metrics.timer('store.refresh_shared'):
+            for sid, version in zip(sids, versions):
+                version = int(version or 0)
+                if _index['versions'].get(sid) != version:
+                    _shared_load(shared, _index, sid, version)
+        _index['seq'] = seq
+        return _index
+
+def _shared_create_scenario(shared, sid, scenario):
+    # ids are creation timestamps: SET NX takes the next free one when another host has it
+    while not shared.add(f'scenario:{sid}', json.dumps({'id': sid} | scenario)):
+        sid += 1
+    shared.add_member('scenarios', str(sid))
+    _shared_bump(shared, sid)
+    return sid
+
+def _shared_add_participant(shared, sid, participant):
+    username = participant['username']
+    if not shared.add(f'scenario:{sid}:participant:{username}', json.dumps(participant)):
+        return False  # already joined
+    shared.add_member(f'scenario:{sid}:users', username)
+    _shared_bump(shared, sid)
+    return True
+
+def _shared_add_bids(shared, sid, rows):
+    last = shared.incr(f'scenario:{sid}:bid_count', len(rows))  # numbers for the whole batch
+    for n, bid in enumerate(rows, last - len(rows) + 1):
+        shared.set(f'scenario:{sid}:bid:{n}', json.dumps(bid))
+    _shared_bump(shared, sid)
+
+def _shared_delete_scenario(shared, sid):
+    current = shared.get(f'scenario:{sid}')
+    # compare-and-set: when several workers expire the scenario, exactly one deletes it
+    if current is None or not shared.cas(f'scenario:{sid}', current, None):
+        return False
+    count = int(shared.get(f'scenario:{sid}:bid_count') or 0)
+    users = shared.members(f'scenario:{sid}:users')
+    shared.delete(*[f'scenario:{sid}:participant:{user}' for user in users],
+                  *[f'scenario:{sid}:bid:{n}' for n in range(1, count + 1)],
+                  f'scenario:{sid}:users', f'scenario:{sid}:bid_count', f'scenario:{sid}:version')
+    shared.remove_member('scenarios', str(sid))
+    shared.incr(WRITE_SEQ_KEY)
+    return True
+
+def _shared_import(shared, scenarios, participants, bids):
+    """import_json_dir() into the backend; scenarios that already exist there are left alone"""
+    for s in scenarios:
+        sid = int(s['id'])
+        record = {'id': sid, 'name': s['name'], 'description': s.get('description', ''), 'demand': s['demand'],
+                  'status': s.get('status', 'active'), 'created_at': s.get('created_at'),
+                  'market_type': s.get('market_type'), 'is_open': bool(s.get('is_open', True))}
+        if not shared.add(f'scenario:{sid}', json.dumps(record)):
+            continue
+        shared.add_member('scenarios', str(sid))
+        for p in participants.get(str(sid), []):
+            _shared_add_participant(shared, sid, {'username': p['username'], 'full_name': p.get('full_name', p['username']),
+                                                  'role': p.get('role', 'student'), 'join_time': p.get('join_time')})
+        rows = [{'username': b['username'], 'price': _numeric(b['price']), 'quantity': _numeric(b['quantity']),
+                 'bid_type': b['bid_type'], 'created_at': b.get('created_at')} for b in bids.get(str(sid), [])]
+        if rows:
+            _shared_add_bids(shared, sid, rows)
+        _shared_bump(shared, sid)
+
+# ------------------ 旧 JSON 数据导入 ------------------
+def import_json_dir(data_dir=DATA_DIR, force=False):
+    """One-shot import of scenarios.json / participants.json / bids.json into SQLite (or the shared backend)"""
+    shared = backend.get_backend()
+    if shared is not None:
+        if not shared.add('scenarios:json_imported', datetime.now().isoformat()) and not force:
+            return False
+    else:
+        conn = get_conn()
+        if not force and conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return False
+
+    def read(filename, default):
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            return default
+
+    scenarios = read('scenarios.json', [])
+    participants = read('participants.json', {})
+    bids = read('bids.json', {})
+    if shared is not None:
+        _shared_import(shared, scenarios, participants, bids)
+        pubsub.publish('scenarios')
+        return True
+    with conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO scenarios (id, name, description, demand, status, created_at, market_type, is_open) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(s['id'], s['name'], s.get('description', ''), s['demand'], s.get('status', 'active'),
+              s.get('created_at'), s.get('market_type'), int(s.get('is_open', True))) for s in scenarios]
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO participants (scenario_id, username, full_name, role, join_time) VALUES (?, ?, ?, ?, ?)',
+            [(int(sid), p['username'], p.get('full_name', p['username']), p.get('role', 'student'), p.get('join_time'))
+             for sid, plist in participants.items() for p in plist]
+        )
+        if force and bids:
+            conn.execute('DELETE FROM bids WHERE scenario_id IN (%s)' % ','.join('?' * len(bids)), [int(s) for s in bids])
+        conn.executemany(
+            'INSERT INTO bids (scenario_id, username, price, quantity, bid_type, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            [(int(sid), b['username'], b['price'], b['quantity'], b['bid_type'], b.get('created_at'))
+             for sid, blist in bids.items() for b in blist]
+        )
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (datetime.now().isoformat(),))
+        _bump_seq(conn)  # bulk change: the index rebuilds on next read
+    pubsub.publish('scenarios')
+    return True
+
+if __name__ == '__main__':
+    import sys
+    args = [a for a in sys.argv[1:] if a != '--force']
+    source = args[0] if args else DATA_DIR
+    if import_json_dir(source, force='--force' in sys.argv):
+        print(f"Imported {source} into {DB_FILE}")
+    else:
+        print("JSON data already imported (use --force to re-import)")
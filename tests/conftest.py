@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in a scratch directory: the stores keep their files relative to the working directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def shared_backend():
+    """An in-memory shared state backend, as if every worker were pointed at one Redis"""
+    shared = backend.configure('memory')
+    yield shared
+    backend.configure(None)
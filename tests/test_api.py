@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+import auth
+import db
+import store
+
+@pytest.fixture
+def stores(workdir, monkeypatch):
+    monkeypatch.setattr(store, 'DB_FILE', str(workdir / 'market.db'))
+    monkeypatch.setattr(auth, 'USER_DB_FILE', str(workdir / 'users.json'))
+    monkeypatch.setattr(auth, '_index', {'path': None, 'stamp': None, 'users': {}})
+
+def _call(method, path, body=None, token=None):
+    headers = {'authorization': f'Bearer {token}'} if token else {}
+    raw = body if isinstance(body, str) else json.dumps(body) if body is not None else ''
+    return asyncio.run(api._dispatch(method, path, headers, raw.encode()))
+
+def test_token_is_required_when_set(stores, monkeypatch):
+    monkeypatch.setattr(api, 'API_TOKEN', 's3cret')
+    sid = store.create_scenario('Peak', '', 5, 'uniform')
+    assert _call('POST', f'/scenarios/{sid}/join', {'username': 'alice'})[0] == 401
+    assert _call('POST', f'/scenarios/{sid}/join', {'username': 'alice'}, token='s3cre')[0] == 401
+    assert _call('POST', f'/scenarios/{sid}/join', {'username': 'alice'}, token='s3cret!')[0] == 401
+    assert not store.is_participant(sid, 'alice')
+    assert _call('GET', '/health') == (200, {'status': 'ok'})  # load balancer probes need no token
+    status, reply = _call('POST', f'/scenarios/{sid}/join', {'username': 'alice'}, token='s3cret')
+    assert (status, reply['joined']) == (200, True)
+
+def test_token_is_checked_over_http(stores, monkeypatch):
+    monkeypatch.setattr(api, 'API_TOKEN', 's3cret')
+
+    async def request(auth_header):
+        server = await asyncio.start_server(api._handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET /sessions/NOPE/clearing HTTP/1.1\r\n{auth_header}Connection: close\r\n\r\n'.encode())
+        status_line = await reader.readline()
+        writer.close()
+        server.close()
+        return status_line
+    assert asyncio.run(request('')).startswith(b'HTTP/1.1 401')
+    assert asyncio.run(request('Authorization: Bearer s3cret\r\n')).startswith(b'HTTP/1.1 404')
+
+@pytest.mark.parametrize('price', ['1e999', '-1e999', 'NaN', 'Infinity', str(10 ** 400), '0', '-5', 'true', '"40"'])
+def test_scenario_bids_reject_non_finite_and_non_positive_numbers(stores, price):
+    sid = store.create_scenario('Peak', '', 5, 'uniform')
+    store.add_participant(sid, 'alice', 'Alice', 'student')
+    body = '{"bids": [{"username": "alice", "price": %s, "quantity": 1}, ' \
+           '{"username": "alice", "price": 40, "quantity": %s}]}' % (price, price)
+    status, reply = _call('POST', f'/scenarios/{sid}/bids', body)
+    assert status == 200 and reply['accepted'] == 0
+    assert [r['index'] for r in reply['rejected']] == [0, 1]
+    assert store.get_bids(sid) == []
+
+@pytest.mark.parametrize('price', ['1e999', 'NaN', str(10 ** 400), '0'])
+def test_session_bids_reject_non_finite_and_non_positive_prices(stores, price):
+    code = db.create_session(1, {'demand': 5})
+    db.join_session(code, 'alice')
+    status, reply = _call('POST', f'/sessions/{code}/bids', '{"username": "alice", "price": %s}' % price)
+    assert status == 200 and reply['accepted'] == 0
+    assert not db.get_user_info(code, 'alice')['bid_submitted']
+
+def test_valid_bids_are_accepted(stores):
+    sid = store.create_scenario('Peak', '', 5, 'uniform')
+    store.add_participant(sid, 'alice', 'Alice', 'student')
+    status, reply = _call('POST', f'/scenarios/{sid}/bids', {'username': 'alice', 'price': 40.5, 'quantity': 2})
+    assert (status, reply['accepted'], reply['rejected']) == (200, 1, [])
+    assert [b['price'] for b in store.get_bids(sid)] == [40.5]
@@ -0,0 +1,82 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+
+import auth
+
+@pytest.fixture
+def users_file(workdir, monkeypatch):
+    monkeypatch.setattr(auth, 'USER_DB_FILE', str(workdir / 'users.json'))
+    monkeypatch.setattr(auth, 'SCRYPT_N', 2 ** 8)  # keep hashing fast in tests
+    monkeypatch.setattr(auth, '_index', {'path': None, 'stamp': None, 'users': {}})
+    return auth.USER_DB_FILE
+
+def test_shared_save_keeps_users_added_by_another_worker(users_file, shared_backend):
+    auth.register_users([('alice', '', 'student')])
+
+    def add(users):
+        # another worker registers bob after this one took its snapshot
+        record = {'password_hash': None, 'role': 'student', 'full_name': 'bob'}
+        shared_backend.add('user:bob', json.dumps(record))
+        shared_backend.add_member('users', 'bob')
+        shared_backend.incr('users:version')
+        users['carol'] = {'password_hash': None, 'role': 'student', 'full_name': 'carol'}
+    auth._update_users(add)
+
+    assert set(auth.load_users()) == {'alice', 'bob', 'carol'}
+    assert shared_backend.members('users') == {'alice', 'bob', 'carol'}
+
+def test_scrypt_hash_is_salted_and_verifies(users_file):
+    auth.register_user('alice', 'secret1', 'teacher')
+    stored = auth.get_user('alice')['password_hash']
+    assert stored.startswith(f'scrypt${auth.SCRYPT_N}$')
+    assert auth.hash_password('secret1') != auth.hash_password('secret1')  # fresh salt each time
+    assert auth.verify_user('alice', 'secret1') == (True, 'teacher')
+    assert auth.verify_user('alice', 'secret2') == (False, None)
+    assert auth.verify_user('nobody', 'secret1') == (False, None)
+    assert auth.get_user('alice')['password_hash'] == stored  # nothing to upgrade
+
+@pytest.mark.parametrize('record', [
+    {'password_hash': hashlib.sha256(b'secret1').hexdigest()},  # legacy unsalted SHA-256
+    {'password': 'secret1'},                                   # legacy plain text
+])
+def test_legacy_passwords_are_upgraded_on_login(users_file, record):
+    with open(users_file, 'w') as f:
+        json.dump({'bob': record | {'role': 'student', 'full_name': 'Bob'}}, f)
+    assert auth.verify_user('bob', 'wrong') == (False, None)
+    assert auth.get_user('bob') == record | {'role': 'student', 'full_name': 'Bob'}  # no upgrade on failure
+
+    assert auth.verify_user('bob', 'secret1') == (True, 'student')
+    upgraded = auth.get_user('bob')
+    assert upgraded['password_hash'].startswith('scrypt$') and 'password' not in upgraded
+    assert auth.verify_user('bob', 'secret1') == (True, 'student')
+
+def test_hashes_with_an_old_cost_are_rehashed(users_file, monkeypatch):
+    auth.register_user('alice', 'secret1', 'student')
+    monkeypatch.setattr(auth, 'SCRYPT_N', 2 ** 9)
+    assert auth.needs_rehash(auth.get_user('alice'))
+    assert auth.verify_user('alice', 'secret1') == (True, 'student')
+    assert auth.get_user('alice')['password_hash'].startswith('scrypt$512$')
+
+@pytest.mark.parametrize('legacy', [None, 'sha256', 'plain'])
+def test_every_format_compares_in_constant_time(users_file, monkeypatch, legacy):
+    record = {None: {'password_hash': auth.hash_password('secret1')},
+              'sha256': {'password_hash': hashlib.sha256(b'secret1').hexdigest()},
+              'plain': {'password': 'secret1'}}[legacy]
+    calls, compare_digest = [], hmac.compare_digest
+
+    def spy(a, b):
+        calls.append((a, b))
+        return compare_digest(a, b)
+    monkeypatch.setattr(auth.hmac, 'compare_digest', spy)
+    assert auth._check(record, 'secret1')
+    assert not auth._check(record, 'secret2')
+    assert len(calls) == 2
+
+def test_unknown_users_are_hashed_too(users_file, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(auth, 'hash_password', lambda password: hashed.append(password))
+    assert auth.verify_password('nobody', 'secret1') is None
+    assert hashed == ['secret1']  # same work as a known user, so timing does not reveal who exists
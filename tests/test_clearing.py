@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from scenes.clearing import clear_batch, clear_market, clear_pay_as_bid
+
+@pytest.mark.parametrize('pricing', ['uniform', 'pay_as_bid'])
+def test_clear_batch_matches_clear_market(pricing):
+    rng = np.random.default_rng(0)
+    price = rng.integers(10, 60, size=(200, 6)).astype(float)  # integer prices: plenty of ties
+    quantity = rng.integers(1, 20, size=(200, 6)).astype(float)
+    mc = price - rng.uniform(0, 10, size=price.shape)
+    # short, zero and negative demand alongside ordinary rounds
+    demand = rng.uniform(-20, 140, size=200)
+    demand[:5] = [0.0, -5.0, quantity[2].sum(), quantity[3].sum() + 1, 0.0]
+
+    batch = clear_batch(price, quantity, mc, demand, pricing=pricing)
+    single = clear_pay_as_bid if pricing == 'pay_as_bid' else clear_market
+    for r in range(len(demand)):
+        result = single(price[r], quantity[r], mc[r], demand[r])
+        if result['mcp'] is None:
+            assert np.isnan(batch['mcp'][r])
+        else:
+            assert batch['mcp'][r] == pytest.approx(result['mcp'])
+        assert batch['sufficient'][r] == result['sufficient']
+        np.testing.assert_allclose(batch['dispatch'][r], result['supply_dispatch'], atol=1e-9)
+        if result['mcp'] is not None or pricing == 'pay_as_bid':
+            # short rounds are priced by the caller (price cap), so only priced rounds compare
+            np.testing.assert_allclose(batch['profit'][r], result['supply_profit'], atol=1e-9)
+            assert batch['consumer_cost'][r] == pytest.approx(result['consumer_cost'])
+
+def test_clear_batch_without_demand_dispatches_nothing():
+    batch = clear_batch([[30.0, 20.0], [30.0, 20.0]], 10.0, 5.0, [0.0, -3.0])
+    assert np.isnan(batch['mcp']).all()
+    assert not batch['dispatch'].any()
+    assert not batch['profit'].any()
+    assert not batch['consumer_cost'].any()
+    assert batch['sufficient'].all()
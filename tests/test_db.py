@@ -0,0 +1,50 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import db
+
+def _in_other_processes(fn, *calls):
+    with ProcessPoolExecutor(len(calls), mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(fn, *zip(*calls)))
+
+def _bump_counter(directory, times):
+    os.chdir(directory)
+    for _ in range(times):
+        with db._update_record('counter') as holder:
+            holder[0]['n'] += 1
+
+def _join_and_bid(directory, code, users):
+    os.chdir(directory)
+    for user in users:
+        db.join_session(code, user)
+        db.submit_bid(code, user, 30)
+
+def test_locked_updates_from_several_processes_are_not_lost(workdir):
+    db._write_record('counter', {'n': 0})
+    _in_other_processes(_bump_counter, *[(str(workdir), 25)] * 4)
+    assert db._read_record('counter') == {'n': 100}
+    assert [f for f in os.listdir(db.DB_DIR) if f.endswith('.tmp')] == []
+
+def test_failed_write_keeps_the_old_record(workdir, monkeypatch):
+    db._write_record('s', {'v': 1})
+
+    def broken_dump(data, f, **kwargs):
+        f.write('{"v": ')
+        raise OSError('disk full')
+    with monkeypatch.context() as patch, pytest.raises(OSError):
+        patch.setattr(json, 'dump', broken_dump)
+        db._write_record('s', {'v': 2})
+    assert db._read_record('s') == {'v': 1}  # the rename never happened
+    assert sorted(os.listdir(db.DB_DIR)) == ['s.json']
+
+def test_concurrent_joins_and_bids_keep_every_student(workdir):
+    code = db.create_session(1, {'demand': 5})
+    groups = [[f's{worker}_{i}' for i in range(5)] for worker in range(3)]
+    _in_other_processes(_join_and_bid, *[(str(workdir), code, users) for users in groups])
+    bids = {b['username']: b for b in db.get_bids(code)}
+    assert set(bids) == {user for users in groups for user in users}
+    assert all(b['bid_submitted'] and b['price'] == 30 for b in bids.values())
@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import eventlog
+
+def _count(state, event):
+    state[event['worker']] = state.get(event['worker'], 0) + 1
+
+eventlog.register_reducer('test-', dict, _count)
+
+def _in_other_processes(fn, *calls):
+    with ProcessPoolExecutor(len(calls), mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(fn, *zip(*calls)))
+
+def _append_many(directory, worker, times):
+    os.chdir(directory)
+    eventlog.COMPACT_EVERY = 30  # compact while the other processes keep appending
+    for _ in range(times):
+        eventlog.append('test-shared', 'tick', worker=str(worker))
+    eventlog.flush()
+
+def _fresh_process_view(stream):
+    """The view as a process that has never read the stream builds it"""
+    eventlog._streams.pop(stream, None)
+    return eventlog.view(stream)
+
+def test_appends_from_several_processes_replay_in_order(workdir):
+    eventlog.append('test-shared', 'tick', worker='parent')  # this process's view goes stale
+    _in_other_processes(_append_many, *[(str(workdir), worker, 50) for worker in range(4)])
+
+    events = list(eventlog.read_events('test-shared'))
+    assert [e['seq'] for e in events] == list(range(1, 202))  # every append, none twice
+    expected = {'parent': 1} | {str(worker): 50 for worker in range(4)}
+    assert eventlog.view('test-shared') == expected  # caught up across the other processes' compactions
+    assert eventlog.version('test-shared') == 201
+    *_, (_, replayed) = eventlog.replay('test-shared')
+    assert replayed == expected
+    assert os.path.exists(eventlog._paths('test-shared')[2])  # compacted history went to the archive
+
+def test_compaction_keeps_state_and_history(workdir):
+    for worker in 'aab':
+        eventlog.append('test-compact', 'tick', worker=worker)
+    eventlog.compact('test-compact')
+    log_path, snapshot_path, archive_path, _ = eventlog._paths('test-compact')
+    assert not os.path.exists(log_path) and os.path.exists(snapshot_path) and os.path.exists(archive_path)
+    assert _fresh_process_view('test-compact') == {'a': 2, 'b': 1}  # from the snapshot alone
+
+    eventlog.append('test-compact', 'tick', worker='b')
+    assert eventlog.version('test-compact') == 4
+    assert [e['worker'] for e in eventlog.read_events('test-compact')] == ['a', 'a', 'b', 'b']
+    assert _fresh_process_view('test-compact') == {'a': 2, 'b': 2}
+
+    eventlog.remove('test-compact')
+    assert not eventlog.exists('test-compact')
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from scenes.clearing import clear_market
+from scenes.orderbook import OrderBook, live_clearing
+
+def _assert_matches_clear_market(book):
+    users = list(book.offers)
+    offers = [book.offers[u] for u in users]
+    kwargs = {}
+    if book.bids:
+        kwargs = {'demand_price': [b['price'] for b in book.bids.values()]}
+        demand = [b['quantity'] for b in book.bids.values()]
+    else:
+        demand = book.demand
+    expected = clear_market([o['price'] for o in offers], [o['quantity'] for o in offers],
+                            [o['price'] for o in offers], demand, **kwargs)
+    result = book.clearing()
+    assert book.provisional_price == expected['mcp']
+    assert result['sufficient'] == expected['sufficient']
+    assert result['cleared_quantity'] == pytest.approx(expected['cleared_quantity'], abs=1e-9)
+    for user, dispatch in zip(users, expected['supply_dispatch']):
+        assert book.dispatch(user) == pytest.approx(dispatch, abs=1e-9)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_book_matches_clear_market(seed):
+    rng = np.random.default_rng(seed)
+    book = OrderBook(demand=20, tick=0.5)
+    for _ in range(300):
+        user = f'seller{rng.integers(30)}'
+        action = rng.random()
+        if action < 0.6:  # new offer or revision; half-unit prices on the tick grid, plenty of ties
+            book.set_offer(user, rng.integers(20, 160) / 2, float(rng.integers(1, 6)))
+        elif action < 0.8:
+            book.remove_offer(user)
+        else:
+            book.set_demand(float(rng.integers(0, 120)))
+        _assert_matches_clear_market(book)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_book_with_demand_bids_matches_clear_market(seed):
+    rng = np.random.default_rng(100 + seed)
+    book = OrderBook()  # default 0.01 tick: keys far past the initial tree, so it grows
+    for _ in range(200):
+        user = f'u{rng.integers(15)}'
+        action = rng.random()
+        if action < 0.5:
+            book.set_offer(user, float(rng.integers(10, 90)), float(rng.integers(1, 8)))
+        elif action < 0.6:
+            book.remove_offer(user)
+        elif action < 0.9:
+            book.set_bid(user, float(rng.integers(10, 90)), float(rng.integers(1, 8)))
+        else:
+            book.remove_bid(user)
+        _assert_matches_clear_market(book)
+
+def test_live_clearing_follows_revisions():
+    bids = [{'username': 'a', 'price': 30}, {'username': 'b', 'price': 50}, {'username': 'c', 'price': None}]
+    assert live_clearing('test-session', 1, bids)['mcp'] == 30
+    bids[0]['price'] = 60  # a revises above b
+    result = live_clearing('test-session', 1, bids)
+    assert result['mcp'] == 50 and result['dispatch'] == {'b': 1.0}
+    assert live_clearing('test-session', 3, bids)['mcp'] is None  # two offers cannot cover 3 MW
@@ -0,0 +1,103 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import store
+
+@pytest.fixture
+def sqlite_store(workdir, monkeypatch):
+    monkeypatch.setattr(store, 'DB_FILE', str(workdir / 'market.db'))
+    return store.DB_FILE
+
+def _new_worker(monkeypatch):
+    """Forget this process's index, as a freshly started worker would have none"""
+    monkeypatch.setattr(store, '_index', {'seq': None, 'path': None})
+
+def _create_and_bid(db_file, worker):
+    store.DB_FILE = db_file
+    sid = store.create_scenario(f'market {worker}', '', 5, 'uniform')
+    store.add_participant(sid, f'user{worker}', '', 'student')
+    for price in range(10):
+        store.add_bid(sid, f'user{worker}', 20 + price, 1, 'supply')
+    return sid
+
+def _in_other_processes(fn, *calls):
+    with ProcessPoolExecutor(len(calls), mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(fn, *zip(*calls)))
+
+def test_sqlite_index_matches_a_rebuild(sqlite_store):
+    sid = store.create_scenario('Peak', 'evening', 5, 'uniform', is_open=False)
+    assert store.add_participant(sid, 'alice', 'Alice', 'student')
+    assert not store.add_participant(sid, 'alice', 'Alice', 'student')
+    store.add_bid(sid, 'alice', 40.0, 2, 'supply')
+    store.add_bid(sid, 'alice', 50, 1, 'supply')
+    applied = (store.list_scenarios(), store.get_participants(sid), store.get_bids(sid), store.get_bid_summary(sid))
+
+    store._index['path'] = None  # next read rebuilds from the database
+    assert (store.list_scenarios(), store.get_participants(sid), store.get_bids(sid),
+            store.get_bid_summary(sid)) == applied
+    assert store.get_scenario(sid)['is_open'] is False
+    assert [b['price'] for b in store.get_bids(sid, 'alice')] == [40, 50]
+    assert store.get_bid_summary(sid) == {'count': 2, 'mean_price': 45}
+
+def test_sqlite_concurrent_processes_get_distinct_ids_and_keep_every_bid(sqlite_store):
+    sids = _in_other_processes(_create_and_bid, *[(sqlite_store, worker) for worker in range(4)])
+    assert len(set(sids)) == 4  # ids are creation timestamps: collisions were bumped, not overwritten
+    for worker, sid in enumerate(sids):
+        assert store.get_scenario(sid)['name'] == f'market {worker}'
+        assert len(store.get_bids(sid, f'user{worker}')) == 10
+
+def test_sqlite_index_sees_writes_from_another_process(sqlite_store):
+    sid = store.create_scenario('Peak', '', 5, 'uniform')
+    stamp = store._stored_version('scenarios')
+    assert store.get_bids(sid) == []
+    (other,) = _in_other_processes(_create_and_bid, (sqlite_store, 1))
+    # PRAGMA data_version moved, so the next read checks write_seq and rebuilds
+    assert store._stored_version('scenarios') != stamp
+    assert len(store.get_bids(other)) == 10
+    assert store.is_participant(other, 'user1')
+
+def test_shared_backend_holds_scenarios_participants_and_bids(sqlite_store, shared_backend, monkeypatch):
+    sid = store.create_scenario('Peak', '', 5, 'uniform')
+    assert store.add_participant(sid, 'alice', 'Alice', 'student')
+    assert not store.add_participant(sid, 'alice', 'Alice', 'student')
+    store.add_bids(sid, [{'username': 'alice', 'price': 40, 'quantity': 2, 'bid_type': 'supply'},
+                         {'username': 'alice', 'price': 45, 'quantity': 1, 'bid_type': 'supply'}])
+
+    _new_worker(monkeypatch)
+    assert store.get_scenario(sid)['name'] == 'Peak'
+    assert store.is_participant(sid, 'alice')
+    assert [b['price'] for b in store.get_bids(sid, 'alice')] == [40, 45]
+    assert store.get_bid_summary(sid)['count'] == 2
+    assert not os.path.exists(sqlite_store)  # nothing went to the local SQLite file
+
+def test_shared_backend_writes_from_another_worker_are_seen(sqlite_store, shared_backend, monkeypatch):
+    sid = store.create_scenario('Peak', '', 5, 'uniform')
+    other = store.create_scenario('Off-peak', '', 3, 'uniform')
+    seen = store.get_bids(sid)
+    stamp = store._stored_version(f'scenario:{sid}')
+
+    # another host writes straight to the backend
+    store._shared_add_participant(shared_backend, sid, {'username': 'bob', 'full_name': 'Bob', 'role': 'student',
+                                                        'join_time': None})
+    store._shared_add_bids(shared_backend, sid, [{'username': 'bob', 'price': 30, 'quantity': 1,
+                                                  'bid_type': 'supply', 'created_at': None}])
+    assert seen == []
+    assert store._stored_version(f'scenario:{sid}') != stamp
+    assert store.is_participant(sid, 'bob')
+    assert [b['username'] for b in store.get_bids(sid)] == ['bob']
+
+    assert store.delete_scenario(sid)
+    assert not store.delete_scenario(sid)  # only one worker deletes it
+    assert store.get_scenario(sid) is None
+    assert [s['id'] for s in store.list_scenarios()] == [other]
+    assert shared_backend.get(f'scenario:{sid}:bid:1') is None
+    assert [event['type'] for event, _ in store.replay_scenario(sid)] == ['join', 'bid', 'close']
+
+def test_shared_create_takes_the_next_free_id(sqlite_store, shared_backend):
+    first = store._shared_create_scenario(shared_backend, 100, {'name': 'a'})
+    second = store._shared_create_scenario(shared_backend, 100, {'name': 'b'})
+    assert (first, second) == (100, 101)
+    assert shared_backend.members('scenarios') == {'100', '101'}